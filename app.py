@@ -1,12 +1,41 @@
 import streamlit as st
-import pandas as pd
 import os
-from utils.file_reader import read_file, read_file_from_upload
-from utils.search_engine import search_keywords, highlight_text
+import tempfile
+from importlib.util import find_spec
+from contextlib import nullcontext
+from utils.file_reader import (
+    ASSET_EXTENSIONS, document_extensions, read_asset_columns_from_upload, read_asset_keywords_from_upload,
+    read_file_from_upload, read_text_from_upload
+)
+from utils.search_engine import FUZZY_MODES, highlight_page, page_count, page_of_match
+from utils.incremental_search import IncrementalSearch
+from utils.search_jobs import SearchJob
+from utils.export import EXPORT_FORMATS, EXPORT_MIME_TYPES, export_results
+from utils.document_store import content_key, derived_key, document_store_stats, shared_store
+from utils.instrumentation import collect, profile, profile_data, span
 
 # 设置页面配置
 st.set_page_config(page_title="文本资产快速定位与高亮工具", layout="wide")
 
+# 高亮文本每段字符数，以及原文查看器每页包含的段数
+CHUNK_SIZE = 1000
+PAGE_SIZE = CHUNK_SIZE * 5
+
+# 后台搜索进行中时刷新进度的间隔
+JOB_POLL_INTERVAL = "0.5s"
+# 后台搜索进行中显示的最新匹配数，以及每个匹配前后的上下文字符数
+PARTIAL_PREVIEW_ROWS = 10
+PARTIAL_CONTEXT_CHARS = 20
+
+# 共享存储中各种条目的名称
+STORE_KIND_LABELS = {
+    'document': "文稿",
+    'keywords': "资产关键词",
+    'results': "搜索结果",
+    'search': "增量搜索中间结果",
+    'page': "高亮页面"
+}
+
 # 自定义CSS样式和JavaScript
 st.markdown("""
 <style>
@@ -189,51 +218,261 @@ if (window.location.hash.startsWith('#match_')) {
 st.title("文本资产快速定位与高亮工具")
 
 # 初始化会话状态
-if 'text_content' not in st.session_state:
-    st.session_state.text_content = ""
-if 'df_assets' not in st.session_state:
-    st.session_state.df_assets = None
-if 'matches' not in st.session_state:
-    st.session_state.matches = []
-if 'keyword_counts' not in st.session_state:
-    st.session_state.keyword_counts = {}
+if 'document_ref' not in st.session_state:
+    # 文稿、资产关键词和搜索结果保存在服务器内共享的存储中（相同内容只保存一份），
+    # 会话只持有引用，会话结束或内容更换时释放
+    st.session_state.document_ref = None
+    st.session_state.document_id = None
+    st.session_state.keywords_ref = None
+    st.session_state.results_ref = None
+    # 当前搜索结果所属文稿的键（导出时取这份文稿，与结果中的位置对应）
+    st.session_state.results_document_key = None
+if 'asset_columns' not in st.session_state:
+    st.session_state.asset_columns = None
 if 'selected_keyword' not in st.session_state:
     st.session_state.selected_keyword = None
 if 'current_match_index' not in st.session_state:
     st.session_state.current_match_index = 0
-if 'highlighted_text' not in st.session_state:
-    st.session_state.highlighted_text = ""
+if 'search_done' not in st.session_state:
+    st.session_state.search_done = False
+if 'viewer_page' not in st.session_state:
+    st.session_state.viewer_page = 0
+if 'viewer_match_index' not in st.session_state:
+    st.session_state.viewer_match_index = None
+if 'search_options' not in st.session_state:
+    st.session_state.search_options = None
+if 'perf_events' not in st.session_state:
+    # 最近一次搜索各阶段的耗时与计数
+    st.session_state.perf_events = []
+if 'profile_data' not in st.session_state:
+    st.session_state.profile_data = None
+if 'search_job' not in st.session_state:
+    # 正在后台进行的搜索及其搜索参数
+    st.session_state.search_job = None
+    st.session_state.job_options = None
+    st.session_state.job_keys = None
+    # 后台搜索已确定的匹配，每次刷新只追加新确定的部分
+    st.session_state.job_partial = []
+    # 后台搜索使用的文稿在搜索结束前钉在内存中（任务持有它，溢出腾不出内存）
+    st.session_state.job_document_ref = None
+
+# 侧边栏：性能面板与剖析模式
+show_perf = st.sidebar.checkbox("显示性能面板", value=False, key="show_perf")
+profile_search = st.sidebar.checkbox("剖析下一次搜索（cProfile）", value=False, key="profile_search")
+
+
+def perf_scope():
+    """开启性能面板时收集 with 块内各阶段的事件"""
+    return collect() if show_perf else nullcontext([])
+
+
+def replace_ref(name, ref):
+    """让会话改为持有共享存储条目的引用 ref（可以为 None），释放原来的引用"""
+    old_ref = st.session_state.get(name)
+    st.session_state[name] = ref
+    if old_ref is not None:
+        old_ref.release()
+
+
+def results_key(document_key, keywords_key, search_options):
+    """搜索结果在共享存储中的键：由文稿、关键词和搜索选项确定"""
+    return derived_key('results', document_key, keywords_key, search_options)
+
+
+def search_state_key(document_key, keywords_key, search_options):
+    """增量搜索中间结果的键：文稿、关键词、大小写、规范化和整词选项相同的会话共用"""
+    return derived_key(
+        'search', document_key, keywords_key, search_options['case_sensitive'], search_options['normalization'],
+        search_options['whole_word']
+    )
+
+
+def export_data(document_key, results_key, export_format, title):
+    """下载按钮的数据回调：点击时才从共享存储取出文稿和结果，流式写入临时文件，再整体交给下载"""
+    def generate():
+        text = shared_store.get(document_key)
+        matches, _ = shared_store.get(results_key)
+        with tempfile.TemporaryFile() as out:
+            export_results(text, matches, out, export_format, title=title)
+            out.seek(0)
+            return out.read()
+    return generate
+
+
+def apply_search_results(results_ref, search_options, document_key):
+    """让会话引用新的搜索结果（results_ref 指向 (matches, keyword_counts)，由文稿 document_key 得到），
+    高亮页面在查看时按需生成"""
+    replace_ref('results_ref', results_ref)
+    st.session_state.results_document_key = document_key
+    st.session_state.selected_keyword = None
+    st.session_state.current_match_index = 0
+    st.session_state.search_done = True
+    st.session_state.search_options = search_options
+    st.session_state.viewer_page = 0
+    st.session_state.viewer_match_index = None
+
+
+def clear_search_results():
+    """丢弃当前的搜索结果（更换文稿后旧结果的位置对新文稿不再有效）"""
+    replace_ref('results_ref', None)
+    st.session_state.results_document_key = None
+    st.session_state.selected_keyword = None
+    st.session_state.current_match_index = 0
+    st.session_state.search_done = False
+    st.session_state.viewer_page = 0
+    st.session_state.viewer_match_index = None
+
+
+def replace_document(document_ref):
+    """让会话改为持有文稿 document_ref（可以为 None）；文稿内容变化时一并释放旧文稿的搜索结果"""
+    old_ref = st.session_state.document_ref
+    if document_ref is None or old_ref is None or old_ref.key != document_ref.key:
+        clear_search_results()
+    replace_ref('document_ref', document_ref)
+
+
+def clear_search_job():
+    """不再跟踪后台搜索（已结束或已取消），释放它钉住的文稿"""
+    st.session_state.search_job = None
+    st.session_state.job_partial = []
+    replace_ref('job_document_ref', None)
+
+
+def finish_search_job(job):
+    """后台搜索结束后采用其结果（文稿已更换时丢弃）"""
+    clear_search_job()
+    document_key, keywords_key = st.session_state.job_keys
+    document_ref = st.session_state.document_ref
+    if job.state == 'failed':
+        st.error(f"搜索失败: {job.error}")
+    elif job.state == 'done' and document_ref is not None and document_ref.key == document_key:
+        matches, keyword_counts = job.result()
+        search_options = st.session_state.job_options
+        # 之后只调整搜索选项时复用这次的精确匹配结果（同一文稿和关键词的会话共用）
+        search_session = IncrementalSearch()
+        search_session.adopt(
+            job.text, job.keywords, job.case_sensitive, matches, job.normalization, job.whole_word
+        )
+        shared_store.put(
+            search_state_key(document_key, keywords_key, search_options), search_session, 'search',
+            holds=(document_key,)
+        )
+        apply_search_results(
+            shared_store.share(
+                results_key(document_key, keywords_key, search_options), (matches, keyword_counts), 'results'
+            ),
+            search_options,
+            document_key
+        )
+        st.session_state.perf_events = st.session_state.perf_events + job.events
+        if job.profile_data is not None:
+            st.session_state.profile_data = job.profile_data
+        st.success(f"搜索完成！找到 {len(matches)} 个匹配项（用时 {job.progress()['seconds']:.1f} 秒）")
+
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def show_search_progress():
+    """后台搜索进行中：定时刷新进度和已找到的部分结果，结束后刷新整个页面显示结果"""
+    job = st.session_state.search_job
+    if job is None:
+        return
+    if job.finished:
+        st.rerun()
+    progress = job.progress()
+    total = progress['chars_total']
+    st.progress(
+        progress['chars_scanned'] / total if total else 0.0,
+        text=f"搜索中... 已扫描 {progress['chars_scanned']:,} / {total:,} 字符，用时 {progress['seconds']:.1f} 秒"
+    )
+    st.caption(f"已找到 {progress['matches']} 个匹配，涉及 {progress['keywords_found']} / {progress['keywords']} 个关键词")
+    partial_counts = sorted(
+        ((keyword, count) for keyword, count in job.keyword_counts().items() if count),
+        key=lambda x: x[1], reverse=True
+    )
+    if partial_counts:
+        st.dataframe(
+            [{'关键词': keyword, '已找到次数': count} for keyword, count in partial_counts[:20]], hide_index=True
+        )
+    partial = st.session_state.job_partial
+    partial.extend(job.partial_matches(len(partial)))
+    if partial:
+        st.caption("最新找到的匹配")
+        text = job.text
+        rows = []
+        for match in sorted(partial[-PARTIAL_PREVIEW_ROWS:], key=lambda m: m['start']):
+            start, end = match['start'], match['end']
+            context = (
+                text[max(0, start - PARTIAL_CONTEXT_CHARS):start] + '【' + text[start:end] + '】'
+                + text[end:end + PARTIAL_CONTEXT_CHARS]
+            )
+            rows.append({
+                '关键词': match['keyword'],
+                '类型': "精确" if match['type'] == 'exact' else f"模糊 {match['similarity']}",
+                '位置': start,
+                '上下文': ' '.join(context.split())
+            })
+        st.dataframe(rows, hide_index=True)
+    if st.button("取消搜索", key="cancel_search_button"):
+        job.cancel()
+        clear_search_job()
+        st.toast("已取消搜索")
+        st.rerun()
+
+
+# 本次运行中收集到的读取与渲染事件
+run_events = []
 
 # 文件上传区
 col1, col2 = st.columns(2)
 
 with col1:
     st.subheader("上传文稿")
-    text_file = st.file_uploader("支持 .txt 或 .docx 格式", type=["txt", "docx"], key="text_uploader")
+    # 支持的格式来自读取器注册表（见 utils/file_reader.register_reader）
+    text_extensions = document_extensions()
+    text_file = st.file_uploader(
+        f"支持 {' 或 '.join(text_extensions)} 格式", type=[ext[1:] for ext in text_extensions], key="text_uploader"
+    )
 
 with col2:
     st.subheader("上传资产列表")
-    asset_file = st.file_uploader("支持 .xlsx 或 .csv 格式", type=["xlsx", "csv"], key="asset_uploader")
+    asset_file = st.file_uploader(
+        f"支持 {' 或 '.join(ASSET_EXTENSIONS)} 格式", type=[ext[1:] for ext in ASSET_EXTENSIONS], key="asset_uploader"
+    )
 
 # 处理文件上传
-if text_file is not None:
-    try:
-        # 直接从上传文件读取内容，无需创建临时文件
-        st.session_state.text_content = read_file_from_upload(text_file)
-        st.success("文稿读取成功！")
-    except Exception as e:
-        st.error(f"读取文稿失败: {e}")
-
-if asset_file is not None:
-    try:
-        # 直接从上传文件读取内容，无需创建临时文件
-        st.session_state.df_assets = read_file_from_upload(asset_file)
-        st.success("资产列表读取成功！")
-    except Exception as e:
-        st.error(f"读取资产列表失败: {e}")
+with perf_scope() as events:
+    # 同一个上传文件只读取一次
+    document_id = getattr(text_file, 'file_id', None) or getattr(text_file, 'name', None)
+    if text_file is not None and document_id != st.session_state.document_id:
+        try:
+            # 直接从上传文件读取内容，无需创建临时文件
+            if text_file.name.lower().endswith('.txt'):
+                # 文本文稿自动识别编码（UTF-8、GBK/GB18030、Big5 等）
+                text, encoding = read_text_from_upload(text_file)
+                message = f"文稿读取成功！（编码：{encoding}）"
+            else:
+                text = read_file_from_upload(text_file)
+                message = "文稿读取成功！"
+            # 内容相同的文稿（如多人打开同一份稿件）在共享存储中只保存一份
+            replace_document(shared_store.share(content_key('document', text), text, 'document'))
+            st.session_state.document_id = document_id
+            st.success(message)
+        except Exception as e:
+            st.error(f"读取文稿失败: {e}")
+
+    if asset_file is not None:
+        try:
+            # 先只读取表头供选择关键词列，搜索时再读取选中的列
+            st.session_state.asset_columns = read_asset_columns_from_upload(asset_file)
+            st.success("资产列表读取成功！")
+        except Exception as e:
+            st.error(f"读取资产列表失败: {e}")
+    else:
+        st.session_state.asset_columns = None
+run_events.extend(events)
 
 # 搜索参数设置
-if st.session_state.df_assets is not None:
+if st.session_state.asset_columns is not None:
     st.subheader("搜索参数设置")
     
     col1, col2, col3, col4 = st.columns(4)
@@ -242,13 +481,25 @@ if st.session_state.df_assets is not None:
         # 选择关键词列
         keyword_columns = st.multiselect(
             "选择关键词列",
-            options=st.session_state.df_assets.columns.tolist(),
+            options=st.session_state.asset_columns,
             key="keyword_columns"
         )
     
     with col2:
         # 大小写敏感开关
         case_sensitive = st.checkbox("大小写敏感", value=False, key="case_sensitive")
+        # 全角/半角、兼容字符总是统一后再比较；繁简转换需要安装 opencc
+        has_opencc = find_spec('opencc') is not None
+        match_t2s = st.checkbox(
+            "繁简体通用",
+            value=False,
+            key="match_t2s",
+            disabled=not has_opencc,
+            help=None if has_opencc else "需要安装 opencc（pip install opencc-python-reimplemented）"
+        )
+        normalization = 'nfkc_t2s' if match_t2s and has_opencc else 'nfkc'
+        # 整词匹配：英文等以空格分词的文字不从单词中间开始或结束；中文不受影响
+        whole_word = st.checkbox("全词匹配", value=False, key="whole_word")
     
     with col3:
         # 模糊匹配开关
@@ -258,58 +509,181 @@ if st.session_state.df_assets is not None:
         # 模糊匹配阈值
         if use_fuzzy:
             fuzzy_threshold = st.slider("模糊匹配阈值", min_value=50, max_value=100, value=80, key="fuzzy_threshold")
+            fuzzy_mode = st.selectbox(
+                "模糊匹配方式",
+                options=list(FUZZY_MODES),
+                format_func={"auto": "自动", "token": "按词（空格分词）", "substring": "按字符（适合中文）"}.get,
+                key="fuzzy_mode"
+            )
         else:
             fuzzy_threshold = 80
+            fuzzy_mode = "auto"
     
     # 搜索按钮
-    if st.button("开始搜索", key="search_button"):
+    search_clicked = st.button("开始搜索", key="search_button")
+    search_options = {
+        'keyword_columns': tuple(keyword_columns),
+        'case_sensitive': case_sensitive,
+        'use_fuzzy': use_fuzzy,
+        'fuzzy_threshold': fuzzy_threshold,
+        'fuzzy_mode': fuzzy_mode,
+        'normalization': normalization,
+        'whole_word': whole_word
+    }
+    # 已有搜索结果时，调整大小写、模糊匹配等选项后自动刷新结果（增量计算）；
+    # 后台搜索进行中时不自动刷新，等它结束后再比较
+    options_changed = (
+        st.session_state.search_done
+        and st.session_state.search_job is None
+        and st.session_state.search_options is not None
+        and st.session_state.search_options['keyword_columns'] == search_options['keyword_columns']
+        and st.session_state.search_options != search_options
+    )
+    if search_clicked or options_changed:
         if not keyword_columns:
             st.error("请选择至少一个关键词列")
-        elif not st.session_state.text_content:
+        elif st.session_state.document_ref is None:
             st.error("请先上传文稿")
         else:
-            with st.spinner("搜索中..."):
-                # 提取关键词
-                keywords = []
-                for col in keyword_columns:
-                    keywords.extend(st.session_state.df_assets[col].dropna().astype(str).tolist())
-                
-                # 去重
-                keywords = list(set(keywords))
-                
-                # 搜索关键词
-                matches, keyword_counts = search_keywords(
-                    st.session_state.text_content,
+            with perf_scope() as search_events:
+                # 只读取选中的关键词列并去重（同一资产文件和关键词列只提取一次）
+                asset_id = getattr(asset_file, 'file_id', None) or asset_file.name
+                keywords_key = (asset_id, tuple(keyword_columns))
+                with span('extract_keywords', columns=len(keyword_columns)) as counters:
+                    counters['cache_hit'] = st.session_state.get('keywords_key') == keywords_key
+                    if not counters['cache_hit']:
+                        keywords = read_asset_keywords_from_upload(asset_file, keyword_columns)
+                        replace_ref(
+                            'keywords_ref', shared_store.share(content_key('keywords', keywords), keywords, 'keywords')
+                        )
+                        st.session_state.keywords_key = keywords_key
+                    keywords = st.session_state.keywords_ref.get()
+                    counters['keywords'] = len(keywords)
+            
+            document_key = st.session_state.document_ref.key
+            shared_results = shared_store.acquire(
+                results_key(document_key, st.session_state.keywords_ref.key, search_options)
+            )
+            if shared_results is not None:
+                # 同一文稿、关键词和选项已经搜索过（可能是其他会话），直接采用已有结果
+                if st.session_state.search_job is not None:
+                    st.session_state.search_job.cancel()
+                    clear_search_job()
+                apply_search_results(shared_results, search_options, document_key)
+                st.session_state.perf_events = run_events + search_events
+                st.success(f"搜索完成！找到 {len(shared_results.get()[0])} 个匹配项（复用已有结果）")
+            elif search_clicked:
+                # 在后台搜索，页面不被阻塞；新的搜索取代仍在进行的搜索
+                if st.session_state.search_job is not None:
+                    st.session_state.search_job.cancel()
+                st.session_state.search_job = SearchJob(
+                    st.session_state.document_ref.get(),
                     keywords,
                     case_sensitive=case_sensitive,
                     use_fuzzy=use_fuzzy,
-                    fuzzy_threshold=fuzzy_threshold
+                    fuzzy_threshold=fuzzy_threshold,
+                    fuzzy_mode=fuzzy_mode,
+                    collect_events=show_perf,
+                    profile_search=profile_search,
+                    normalization=normalization,
+                    whole_word=whole_word
+                ).start()
+                st.session_state.job_options = search_options
+                st.session_state.job_keys = (document_key, st.session_state.keywords_ref.key)
+                st.session_state.job_partial = []
+                replace_ref('job_document_ref', shared_store.pin(document_key))
+                st.session_state.perf_events = run_events + search_events
+            else:
+                # 只调整搜索选项：复用上一次的中间结果（关键词自动机等预处理结果和增量搜索的
+                # 中间结果都在服务器内跨会话共享），通常很快，直接在本次运行中完成；
+                # 剖析模式下只剖析这一次搜索
+                state_key = search_state_key(document_key, st.session_state.keywords_ref.key, search_options)
+                search_session = shared_store.get(state_key)
+                if search_session is None:
+                    search_session = IncrementalSearch()
+                profiler_scope = profile() if profile_search else nullcontext()
+                with st.spinner("搜索中..."), perf_scope() as events, profiler_scope as profiler:
+                    matches, keyword_counts = search_session.search(
+                        st.session_state.document_ref.get(),
+                        keywords,
+                        case_sensitive=case_sensitive,
+                        use_fuzzy=use_fuzzy,
+                        fuzzy_threshold=fuzzy_threshold,
+                        fuzzy_mode=fuzzy_mode,
+                        as_store=True,
+                        normalization=normalization,
+                        whole_word=whole_word
+                    )
+                # 中间结果增长后重新估算占用（已被淘汰时重新存入）
+                shared_store.put(state_key, search_session, 'search', holds=(document_key,))
+                apply_search_results(
+                    shared_store.share(
+                        results_key(document_key, st.session_state.keywords_ref.key, search_options),
+                        (matches, keyword_counts), 'results'
+                    ),
+                    search_options,
+                    document_key
                 )
-                
-                # 更新会话状态
-                st.session_state.matches = matches
-                st.session_state.keyword_counts = keyword_counts
-                st.session_state.selected_keyword = None
-                st.session_state.current_match_index = 0
-                
-                # 生成高亮文本
-                st.session_state.highlighted_text = highlight_text(st.session_state.text_content, matches)
+                st.session_state.perf_events = run_events + search_events + events
+                if profiler is not None:
+                    st.session_state.profile_data = profile_data(profiler)
                 
                 st.success(f"搜索完成！找到 {len(matches)} 个匹配项")
 
+    # 后台搜索的进度与部分结果
+    if st.session_state.search_job is not None:
+        if st.session_state.search_job.finished:
+            finish_search_job(st.session_state.search_job)
+        else:
+            show_search_progress()
+
 # 结果展示区
-if st.session_state.highlighted_text:
+if st.session_state.search_done:
     st.subheader("搜索结果")
+    # 从共享存储取出文稿和搜索结果（已溢出到磁盘的条目此时载入）
+    text_content = st.session_state.document_ref.get()
+    matches, keyword_counts = st.session_state.results_ref.get()
+    
+    # 当前匹配项变化时翻到它所在的页
+    if matches and st.session_state.viewer_match_index != st.session_state.current_match_index:
+        st.session_state.viewer_match_index = st.session_state.current_match_index
+        st.session_state.viewer_page = page_of_match(
+            matches, st.session_state.current_match_index, PAGE_SIZE
+        )
+    total_pages = page_count(text_content, PAGE_SIZE)
     
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown("### 原文（高亮显示）")
         
-        # 文本容器
-        text_container = st.container()
-        with text_container:
-            st.markdown(f'<div class="text-container">{st.session_state.highlighted_text}</div>', unsafe_allow_html=True)
+        # 文本容器：只渲染当前页
+        page = st.session_state.viewer_page
+        with perf_scope() as events:
+            # 高亮页面按需生成，在共享存储中缓存（查看同一结果的会话共用，不被引用，可随时淘汰）
+            page_key = derived_key('page', st.session_state.results_ref.key, page, PAGE_SIZE, CHUNK_SIZE)
+            page_html = shared_store.get(page_key)
+            if page_html is None:
+                page_html = shared_store.put(
+                    page_key, highlight_page(text_content, matches, page, PAGE_SIZE, CHUNK_SIZE), 'page'
+                )
+            text_container = st.container()
+            with text_container, span('render', chars=len(page_html)):
+                st.markdown(f'<div class="text-container">{page_html}</div>', unsafe_allow_html=True)
+        run_events.extend(events)
+        
+        # 翻页按钮
+        page_col1, page_col2, page_col3 = st.columns(3)
+        with page_col1:
+            if st.button("上一页", key="prev_page_button", disabled=page == 0):
+                st.session_state.viewer_page -= 1
+                st.rerun()
+        with page_col2:
+            st.write(f"第 {page + 1} / {total_pages} 页")
+        with page_col3:
+            if st.button("下一页", key="next_page_button", disabled=page >= total_pages - 1):
+                st.session_state.viewer_page += 1
+                st.rerun()
         
         # 导航按钮
         with st.container():
@@ -323,17 +697,17 @@ if st.session_state.highlighted_text:
                         st.rerun()
             
             with nav_col2:
-                if st.session_state.matches:
-                    st.write(f"匹配项 {st.session_state.current_match_index + 1} / {len(st.session_state.matches)}")
+                if matches:
+                    st.write(f"匹配项 {st.session_state.current_match_index + 1} / {len(matches)}")
             
             with nav_col3:
                 if st.button("下一个 ⬇️", key="next_button"):
-                    if st.session_state.current_match_index < len(st.session_state.matches) - 1:
+                    if st.session_state.current_match_index < len(matches) - 1:
                         st.session_state.current_match_index += 1
                         st.rerun()
         
         # 添加JavaScript实现滚动到当前匹配项并触发蓝色高亮
-        if st.session_state.matches:
+        if matches:
             current_match_id = f"match_{st.session_state.current_match_index}"
             st.markdown(f"""
             <script>
@@ -364,18 +738,19 @@ if st.session_state.highlighted_text:
         
         # 提取并排序资产
         asset_list = []
-        for keyword, count in st.session_state.keyword_counts.items():
+        for keyword, count in keyword_counts.items():
             if count > 0:
                 asset_list.append((keyword, count))
         asset_list.sort(key=lambda x: x[1], reverse=True)
         
         # 显示当前高亮资产信息
-        if st.session_state.matches and 0 <= st.session_state.current_match_index < len(st.session_state.matches):
-            current_match = st.session_state.matches[st.session_state.current_match_index]
+        if matches and 0 <= st.session_state.current_match_index < len(matches):
+            current_match = matches[st.session_state.current_match_index]
             current_keyword = current_match['keyword']
-            current_count = st.session_state.keyword_counts.get(current_keyword, 0)
+            current_count = keyword_counts.get(current_keyword, 0)
+            occurrence = matches.occurrence_number(st.session_state.current_match_index)
             
-            st.info(f"📌 当前高亮：**{current_keyword}** (出现 {current_count} 次)")
+            st.info(f"📌 当前高亮：**{current_keyword}** (第 {occurrence + 1} 处，共出现 {current_count} 次)")
         
         # 使用selectbox展示资产列表
         asset_options = [f"{keyword} (出现 {count} 次)" for keyword, count in asset_list]
@@ -393,10 +768,9 @@ if st.session_state.highlighted_text:
                 if selected_keyword != st.session_state.selected_keyword:
                     st.session_state.selected_keyword = selected_keyword
                     
-                    for i, match in enumerate(st.session_state.matches):
-                        if match['keyword'] == selected_keyword:
-                            st.session_state.current_match_index = i
-                            break
+                    first_index = matches.first_index(selected_keyword)
+                    if first_index is not None:
+                        st.session_state.current_match_index = first_index
                     
                     st.rerun()
         
@@ -405,10 +779,9 @@ if st.session_state.highlighted_text:
         for i, (keyword, count) in enumerate(asset_list):
             if st.button(f"📍 {keyword} ({count}次)", key=f"asset_btn_{i}"):
                 st.session_state.selected_keyword = keyword
-                for j, match in enumerate(st.session_state.matches):
-                    if match['keyword'] == keyword:
-                        st.session_state.current_match_index = j
-                        break
+                first_index = matches.first_index(keyword)
+                if first_index is not None:
+                    st.session_state.current_match_index = first_index
                 st.rerun()
         
         # 显示资产统计信息
@@ -416,13 +789,95 @@ if st.session_state.highlighted_text:
         st.markdown(f"**资产总数：** {len(asset_list)}")
         st.markdown(f"**匹配总数：** {sum(count for _, count in asset_list)}")
 
+    # 导出：匹配表（关键词、位置、上下文）和标注后的文稿，点击下载时才生成
+    st.markdown("### 导出")
+    export_title = os.path.splitext(text_file.name)[0] if text_file is not None else "文稿"
+    export_labels = {
+        'csv': "下载匹配表 (CSV)",
+        'xlsx': "下载匹配表 (Excel)",
+        'html': "下载标注文稿 (HTML)",
+        'docx': "下载标注文稿 (Word)"
+    }
+    for export_col, export_format in zip(st.columns(len(EXPORT_FORMATS)), EXPORT_FORMATS):
+        with export_col:
+            suffix = "匹配表" if export_format in ('csv', 'xlsx') else "标注"
+            st.download_button(
+                export_labels[export_format],
+                data=export_data(
+                    st.session_state.results_document_key, st.session_state.results_ref.key, export_format,
+                    export_title
+                ),
+                file_name=f"{export_title}_{suffix}.{export_format}",
+                mime=EXPORT_MIME_TYPES[export_format],
+                on_click='ignore',
+                key=f"export_{export_format}"
+            )
+
+# 性能面板：最近一次搜索与本次页面渲染各阶段的耗时（按结束顺序，depth 为嵌套层级）
+if show_perf:
+    st.sidebar.markdown("### 性能")
+    perf_rows = [
+        dict(event, stage='搜索') for event in st.session_state.perf_events
+    ] + [
+        dict(event, stage='本次运行') for event in run_events
+    ]
+    if perf_rows:
+        # 只在打开性能面板时导入 pandas，缩短页面首次加载时间
+        import pandas as pd
+        df_perf = pd.DataFrame(perf_rows)
+        df_perf['ms'] = (df_perf.pop('seconds') * 1000).round(2)
+        df_perf['name'] = ['  ' * depth + name for name, depth in zip(df_perf['name'], df_perf.pop('depth'))]
+        leading = ['stage', 'name', 'ms']
+        st.sidebar.dataframe(df_perf[leading + [col for col in df_perf.columns if col not in leading]])
+    else:
+        st.sidebar.caption("上传文件并搜索后显示各阶段耗时")
+
+# 共享存储用量：所有会话共用的文稿、资产关键词、搜索结果与高亮页面
+with st.sidebar.expander("共享存储"):
+    store_stats = document_store_stats()
+    max_bytes = store_stats['max_bytes']
+    st.caption(
+        f"内存 {store_stats['memory_bytes'] / 2 ** 20:.1f} MB / "
+        f"{'不限' if max_bytes is None else f'{max_bytes / 2 ** 20:.0f} MB'}，"
+        f"已溢出到磁盘 {store_stats['spilled_bytes'] / 2 ** 20:.1f} MB"
+    )
+    st.caption(
+        f"{store_stats['entries']} 个条目，会话引用 {store_stats['references']} 个；"
+        f"命中 {store_stats['hits']} 次，未命中 {store_stats['misses']} 次，"
+        f"淘汰 {store_stats['evictions']} 次，溢出 {store_stats['spills']} 次，载入 {store_stats['loads']} 次"
+    )
+    if store_stats['kinds']:
+        st.dataframe([
+            {
+                '种类': STORE_KIND_LABELS.get(kind, kind),
+                '条目': usage['entries'],
+                '引用': usage['references'],
+                '内存 (MB)': round(usage['memory_bytes'] / 2 ** 20, 2),
+                '磁盘 (MB)': round(usage['spilled_bytes'] / 2 ** 20, 2)
+            }
+            for kind, usage in store_stats['kinds'].items()
+        ], hide_index=True)
+if st.session_state.profile_data is not None:
+    st.sidebar.download_button(
+        "下载剖析结果 (.prof)",
+        data=st.session_state.profile_data,
+        file_name="search.prof",
+        mime="application/octet-stream",
+        key="profile_download"
+    )
+    st.sidebar.caption("可用 snakeviz 查看，或用 flameprof 转换为火焰图")
+
 # 重置按钮
 if st.button("重置", key="reset_button"):
-    st.session_state.text_content = ""
-    st.session_state.df_assets = None
-    st.session_state.matches = []
-    st.session_state.keyword_counts = {}
-    st.session_state.selected_keyword = None
-    st.session_state.current_match_index = 0
-    st.session_state.highlighted_text = ""
+    if st.session_state.search_job is not None:
+        st.session_state.search_job.cancel()
+        clear_search_job()
+    replace_document(None)
+    replace_ref('keywords_ref', None)
+    st.session_state.document_id = None
+    st.session_state.asset_columns = None
+    st.session_state.search_options = None
+    st.session_state.keywords_key = None
+    st.session_state.perf_events = []
+    st.session_state.profile_data = None
     st.experimental_rerun()
\ No newline at end of file
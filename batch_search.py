@@ -0,0 +1,204 @@
+"""命令行批量搜索：用同一份资产列表扫描大量文稿
+
+示例：
+    python batch_search.py manuscripts/ --assets assets.xlsx --columns 资产名称 -o results.jsonl
+    python batch_search.py "docs/**/*.docx" --assets assets.csv --columns 名称 别名 -o results.csv --fuzzy
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.file_reader import (
+    configure_parse_cache, document_extensions, read_asset_columns, read_asset_keywords, read_file
+)
+from utils.normalization import DEFAULT_NORMALIZATION, NORMALIZATIONS
+from utils.search_engine import FUZZY_MODES, search_keywords
+
+# 工作进程内的关键词与搜索选项，由 _init_worker 设置，避免每篇文稿重复传递
+_worker_keywords = None
+_worker_options = None
+
+
+def collect_documents(inputs):
+    """展开目录（递归）、通配符和文件路径，返回去重排序后的文稿列表
+
+    文稿格式来自读取器注册表（见 utils/file_reader.register_reader 与 TEXT_ASSET_READERS）。
+    """
+    extensions = set(document_extensions())
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                for name in files:
+                    paths.add(os.path.join(root, name))
+        elif glob.has_magic(item):
+            paths.update(glob.glob(item, recursive=True))
+        else:
+            paths.add(item)
+    return sorted(
+        path for path in paths
+        if os.path.isfile(path) and os.path.splitext(path)[1].lower() in extensions
+    )
+
+
+def _init_worker(keywords, options):
+    global _worker_keywords, _worker_options
+    _worker_keywords = keywords
+    _worker_options = options
+    # 每篇文稿只读一次，不需要缓存解析结果
+    configure_parse_cache(max_entries=0)
+
+
+def search_document(path):
+    """搜索一篇文稿，返回该文稿的统计结果；读取或搜索失败时记录错误而不中断整批任务"""
+    started = time.perf_counter()
+    result = {'document': path, 'bytes': 0}
+    try:
+        # 列出文稿之后被删除或无权读取的文件同样记为失败
+        result['bytes'] = os.path.getsize(path)
+        text = read_file(path)
+        matches, keyword_counts = search_keywords(text, _worker_keywords, **_worker_options)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        return result
+    result['chars'] = len(text)
+    result['matches'] = len(matches)
+    result['counts'] = {keyword: count for keyword, count in keyword_counts.items() if count > 0}
+    result['seconds'] = round(time.perf_counter() - started, 4)
+    return result
+
+
+class ResultWriter:
+    """按输出文件扩展名写 CSV 或 JSON Lines，逐篇写入"""
+
+    def __init__(self, path, csv_fields):
+        self.is_csv = os.path.splitext(path)[1].lower() == '.csv'
+        self._file = open(path, 'w', encoding='utf-8', newline='')
+        self._csv = None
+        if self.is_csv:
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(csv_fields)
+
+    def write(self, record, rows=()):
+        if self.is_csv:
+            self._csv.writerows(rows)
+        else:
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def close(self):
+        self._file.close()
+
+
+def _document_rows(result):
+    """CSV 格式下每篇文稿按关键词展开为多行；没有匹配或出错时输出一行"""
+    if 'error' in result:
+        return [(result['document'], '', 0, result['error'])]
+    if not result['counts']:
+        return [(result['document'], '', 0, '')]
+    return [(result['document'], keyword, count, '') for keyword, count in result['counts'].items()]
+
+
+def run_batch(documents, keywords, output, aggregate_output=None, workers=None, **options):
+    """并行搜索所有文稿，写出逐篇结果与汇总结果，返回汇总统计"""
+    writer = ResultWriter(output, ('document', 'keyword', 'count', 'error'))
+    totals = {}
+    document_counts = {}
+    summary = {'documents': 0, 'failed': 0, 'bytes': 0, 'matches': 0}
+    started = time.perf_counter()
+
+    def consume(results):
+        for result in results:
+            summary['documents'] += 1
+            summary['bytes'] += result['bytes']
+            if 'error' in result:
+                summary['failed'] += 1
+            else:
+                summary['matches'] += result['matches']
+                for keyword, count in result['counts'].items():
+                    totals[keyword] = totals.get(keyword, 0) + count
+                    document_counts[keyword] = document_counts.get(keyword, 0) + 1
+            writer.write(result, _document_rows(result))
+
+    try:
+        if workers == 1:
+            _init_worker(keywords, options)
+            consume(map(search_document, documents))
+        else:
+            # 结果按文稿顺序逐篇取回并写出，小文稿成批分发以减少进程间通信
+            chunksize = max(1, min(64, len(documents) // ((workers or os.cpu_count() or 1) * 8)))
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(keywords, options)) as executor:
+                consume(executor.map(search_document, documents, chunksize=chunksize))
+    finally:
+        writer.close()
+    summary['seconds'] = time.perf_counter() - started
+
+    if aggregate_output:
+        aggregate = ResultWriter(aggregate_output, ('keyword', 'count', 'documents'))
+        try:
+            for keyword in sorted(totals, key=lambda k: (-totals[k], k)):
+                record = {'keyword': keyword, 'count': totals[keyword], 'documents': document_counts[keyword]}
+                aggregate.write(record, [(keyword, totals[keyword], document_counts[keyword])])
+        finally:
+            aggregate.close()
+    return summary
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="用资产列表批量扫描文稿，输出每篇文稿和汇总的匹配次数")
+    parser.add_argument('inputs', nargs='+', help=f"文稿目录、通配符或文件路径（{'/'.join(document_extensions())}）")
+    parser.add_argument('--assets', required=True, help="资产列表文件（.xlsx/.csv）")
+    parser.add_argument('--columns', nargs='+', required=True, help="关键词列名")
+    parser.add_argument('-o', '--output', required=True, help="逐篇结果输出文件（.jsonl 或 .csv）")
+    parser.add_argument('--aggregate', help="汇总结果输出文件（.jsonl 或 .csv）")
+    parser.add_argument('--case-sensitive', action='store_true', help="区分大小写")
+    parser.add_argument('--fuzzy', action='store_true', help="启用模糊匹配")
+    parser.add_argument('--threshold', type=int, default=80, help="模糊匹配阈值（默认 80）")
+    parser.add_argument('--fuzzy-mode', choices=FUZZY_MODES, default='auto', help="模糊匹配方式")
+    parser.add_argument('--normalization', choices=NORMALIZATIONS, default=DEFAULT_NORMALIZATION,
+                        help="文本规范化方式：none / nfkc（全角半角、兼容字符，默认）/ nfkc_t2s（另做繁简转换，需要 opencc）")
+    parser.add_argument('--whole-word', action='store_true', help="整词匹配（不从英文等单词中间开始或结束）")
+    parser.add_argument('--workers', type=int, default=None, help="工作进程数（默认 CPU 核心数）")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    # 资产列表读不出或列名不存在时按用法错误退出，而不是输出堆栈
+    try:
+        available = read_asset_columns(args.assets)
+    except (OSError, ValueError) as e:
+        parser.error(f"cannot read asset list {args.assets}: {e}")
+    missing = [column for column in args.columns if column not in available]
+    if missing:
+        parser.error(f"unknown --columns: {', '.join(missing)} (available: {', '.join(available)})")
+    documents = collect_documents(args.inputs)
+    if not documents:
+        raise SystemExit(f"No {' or '.join(document_extensions())} documents found")
+    # 只读取选中的列并去重
+    keywords = read_asset_keywords(args.assets, args.columns)
+
+    summary = run_batch(
+        documents, keywords, args.output, args.aggregate, args.workers,
+        case_sensitive=args.case_sensitive,
+        use_fuzzy=args.fuzzy,
+        fuzzy_threshold=args.threshold,
+        fuzzy_mode=args.fuzzy_mode,
+        normalization=args.normalization,
+        whole_word=args.whole_word
+    )
+
+    seconds = max(summary['seconds'], 1e-9)
+    megabytes = summary['bytes'] / (1024 * 1024)
+    print(f"文稿: {summary['documents']} 篇（失败 {summary['failed']} 篇），关键词: {len(keywords)} 个，"
+          f"匹配: {summary['matches']} 个")
+    print(f"用时: {seconds:.2f} 秒，吞吐: {summary['documents'] / seconds:.1f} 篇/秒，"
+          f"{megabytes / seconds:.2f} MB/秒")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""可复现的合成语料：中文/英文文本与资产列表（相同参数与种子生成完全相同的内容）"""
+import random
+from itertools import accumulate
+
+# 常用汉字，用于组成中文词
+_CJK_CHARS = (
+    '的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面'
+    '而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性'
+    '好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第'
+    '向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管'
+    '特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处'
+)
+_LATIN_LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+
+LANGUAGES = ('zh', 'en')
+
+
+def parse_size(size):
+    """解析 10KB、1MB、100MB 这样的大小，返回字节数"""
+    units = {'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'B': 1}
+    text = str(size).strip().upper()
+    for unit, factor in units.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
+def format_size(size_bytes):
+    for unit, factor in (('MB', 1024 ** 2), ('KB', 1024)):
+        if size_bytes >= factor:
+            return f"{size_bytes / factor:.3g}{unit}"
+    return f"{size_bytes}B"
+
+
+def vocabulary(language, count=20000, seed=0):
+    """生成词表；中文为 2-4 字词，英文为 3-10 个字母的单词"""
+    rng = random.Random(f"vocabulary-{language}-{seed}")
+    words = set()
+    while len(words) < count:
+        if language == 'zh':
+            words.add(''.join(rng.choice(_CJK_CHARS) for _ in range(rng.randint(2, 4))))
+        else:
+            words.add(''.join(rng.choice(_LATIN_LETTERS) for _ in range(rng.randint(3, 10))))
+    return sorted(words)
+
+
+def generate_text(language, size_bytes, seed=0):
+    """生成约 size_bytes 字节（UTF-8）的文本，词频近似 Zipf 分布"""
+    rng = random.Random(f"text-{language}-{size_bytes}-{seed}")
+    words = vocabulary(language, seed=seed)
+    rng.shuffle(words)
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(words))))
+    char_bytes = 3 if language == 'zh' else 1
+    separator = '' if language == 'zh' else ' '
+    marks = '，。；' if language == 'zh' else ',.;'
+    pieces = []
+    total = 0
+    while total < size_bytes:
+        # 成批抽词再切成句子，避免逐句调用 choices
+        batch = rng.choices(words, cum_weights=cum_weights, k=4096)
+        pos = 0
+        while pos < len(batch):
+            length = rng.randint(5, 20)
+            sentence = separator.join(batch[pos:pos + length])
+            if language == 'en':
+                sentence = sentence.capitalize()
+            piece = sentence + rng.choice(marks) + ('\n' if rng.random() < 0.05 else separator)
+            pieces.append(piece)
+            total += len(piece) * char_bytes
+            pos += length
+    text = ''.join(pieces)
+    return text[:size_bytes // char_bytes]
+
+
+def generate_keywords(language, count, seed=0):
+    """生成资产关键词：大部分来自词表（会在文本中出现），其余为词表中词的组合或变体"""
+    rng = random.Random(f"keywords-{language}-{count}-{seed}")
+    words = vocabulary(language, seed=seed)
+    keywords = set()
+    while len(keywords) < count:
+        roll = rng.random()
+        word = rng.choice(words)
+        if roll < 0.7:
+            keywords.add(word)
+        elif roll < 0.9:
+            keywords.add(word + ('' if language == 'zh' else ' ') + rng.choice(words))
+        else:
+            # 替换一个字符，只能通过模糊匹配找到
+            i = rng.randrange(len(word))
+            alphabet = _CJK_CHARS if language == 'zh' else _LATIN_LETTERS
+            keywords.add(word[:i] + rng.choice(alphabet) + word[i + 1:])
+    return sorted(keywords)
@@ -0,0 +1,318 @@
+"""性能基准：在合成语料上测量搜索、高亮和文件读取的耗时与内存峰值
+
+示例：
+    python -m benchmarks.run -o results.json
+    python -m benchmarks.run --sizes 10KB 1MB 100MB --keywords 10 1000 100000 -o full.json
+    python -m benchmarks.run compare base.json results.json --tolerance 0.15
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+from docx import Document
+
+from benchmarks.corpus import LANGUAGES, format_size, generate_keywords, generate_text, parse_size
+from utils.compiled_keywords import clear_keyword_cache, compile_keywords
+from utils.file_reader import clear_parse_cache, iter_text_file_chunks, read_asset_keywords, read_file
+from utils.search_engine import highlight_text, search_keywords
+
+DEFAULT_SIZES = ('10KB', '100KB', '1MB')
+DEFAULT_KEYWORDS = (10, 1000)
+FULL_SIZES = ('10KB', '100KB', '1MB', '10MB', '100MB')
+FULL_KEYWORDS = (10, 1000, 10000, 100000)
+
+# 结果文件格式版本
+RESULTS_VERSION = 1
+
+
+def measure(func, repeat=3, memory=True):
+    """返回 (最短耗时秒数, 内存峰值字节数, 函数返回值)；内存单独运行一次测量，不影响计时"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    peak = None
+    if memory:
+        result = None
+        gc.collect()
+        tracemalloc.start()
+        try:
+            result = func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return best, peak, result
+
+
+def measure_import(module, repeat=3):
+    """在新进程中导入 module，返回最短导入耗时（秒），用于衡量冷启动开销"""
+    code = f"import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return min(
+        float(subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, cwd=root).stdout)
+        for _ in range(repeat)
+    )
+
+
+def _search_cases(max_fuzzy_bytes):
+    return [
+        ('search_exact', {'case_sensitive': True}, None),
+        ('search_ignore_case', {'case_sensitive': False}, None),
+        ('search_fuzzy', {'case_sensitive': False, 'use_fuzzy': True, 'fuzzy_threshold': 80}, max_fuzzy_bytes),
+    ]
+
+
+def _write_docx(path, text, paragraph_chars=2000):
+    doc = Document()
+    for i in range(0, len(text), paragraph_chars):
+        doc.add_paragraph(text[i:i + paragraph_chars])
+    doc.save(path)
+
+
+def run_benchmarks(sizes, keyword_counts, languages=LANGUAGES, repeat=3, memory=True,
+                   max_fuzzy_bytes=parse_size('1MB'), max_docx_bytes=parse_size('10MB'), log=print):
+    """运行全部基准，返回结果记录列表"""
+    records = []
+
+    def record(benchmark, language, size_bytes, keywords, seconds, peak, **extra):
+        entry = {
+            'benchmark': benchmark,
+            'language': language,
+            'size_bytes': size_bytes,
+            'keywords': keywords,
+            'seconds': seconds,
+            'peak_bytes': peak,
+            'mb_per_second': size_bytes / (1024 * 1024) / seconds if size_bytes and seconds else None
+        }
+        entry.update(extra)
+        records.append(entry)
+        log(f"  {benchmark:<24} {language} {format_size(size_bytes):>7} {keywords or '-':>7} 个关键词  "
+            f"{seconds * 1000:10.2f} ms  峰值 {format_size(peak or 0):>8}")
+
+    # 只处理 .txt 的进程需要导入的模块（解析库在首次读取对应格式时才导入）
+    for module in ('utils.file_reader', 'utils.search_engine'):
+        record('import_' + module.rsplit('.', 1)[1], '-', 0, 0, measure_import(module, repeat), None)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for language in languages:
+            for keyword_count in keyword_counts:
+                keywords = generate_keywords(language, keyword_count)
+                # 关键词预处理（自动机构建）单独计时，搜索计时使用已缓存的编译结果
+                for name, options, _ in _search_cases(None):
+                    def compile_cold():
+                        clear_keyword_cache()
+                        return compile_keywords(keywords, **options)
+                    seconds, peak, _ = measure(compile_cold, repeat, memory)
+                    record('compile_' + name[len('search_'):], language, 0, keyword_count, seconds, peak)
+
+                # 资产列表读取
+                df_assets = pd.DataFrame({'资产名称': keywords})
+                for ext in ('.csv', '.xlsx'):
+                    path = os.path.join(tmp_dir, f"assets-{language}-{keyword_count}{ext}")
+                    if ext == '.csv':
+                        df_assets.to_csv(path, index=False)
+                    else:
+                        df_assets.to_excel(path, index=False)
+
+                    def read_assets():
+                        clear_parse_cache()
+                        return read_file(path)
+                    seconds, peak, _ = measure(read_assets, repeat, memory)
+                    record('read_assets' + ext.replace('.', '_'), language, os.path.getsize(path),
+                           keyword_count, seconds, peak)
+
+                    # 只读取关键词列（应用与批量处理实际使用的路径）
+                    def read_keywords():
+                        clear_parse_cache()
+                        return read_asset_keywords(path, ['资产名称'])
+                    seconds, peak, _ = measure(read_keywords, repeat, memory)
+                    record('read_asset_keywords' + ext.replace('.', '_'), language, os.path.getsize(path),
+                           keyword_count, seconds, peak)
+
+            for size in sizes:
+                text = generate_text(language, size)
+                size_bytes = len(text.encode('utf-8'))
+
+                # 文稿读取
+                txt_path = os.path.join(tmp_dir, f"text-{language}-{size}.txt")
+                with open(txt_path, 'w', encoding='utf-8') as f:
+                    f.write(text)
+
+                def read_txt():
+                    clear_parse_cache()
+                    return read_file(txt_path)
+                seconds, peak, _ = measure(read_txt, repeat, memory)
+                record('read_txt', language, size_bytes, 0, seconds, peak)
+
+                seconds, peak, _ = measure(lambda: sum(map(len, iter_text_file_chunks(txt_path))), repeat, memory)
+                record('read_txt_chunks', language, size_bytes, 0, seconds, peak)
+
+                if size_bytes <= max_docx_bytes:
+                    docx_path = os.path.join(tmp_dir, f"text-{language}-{size}.docx")
+                    _write_docx(docx_path, text)
+
+                    def read_docx():
+                        clear_parse_cache()
+                        return read_file(docx_path)
+                    seconds, peak, _ = measure(read_docx, repeat, memory)
+                    record('read_docx', language, size_bytes, 0, seconds, peak)
+
+                for keyword_count in keyword_counts:
+                    keywords = generate_keywords(language, keyword_count)
+                    for name, options, max_bytes in _search_cases(max_fuzzy_bytes):
+                        if max_bytes is not None and size_bytes > max_bytes:
+                            continue
+                        # 预热：编译关键词并放入缓存
+                        search_keywords(text[:1000], keywords, **options)
+                        seconds, peak, result = measure(
+                            lambda: search_keywords(text, keywords, **options), repeat, memory
+                        )
+                        matches = result[0]
+                        record(name, language, size_bytes, keyword_count, seconds, peak, matches=len(matches))
+                        if name == 'search_exact':
+                            seconds, peak, _ = measure(lambda: highlight_text(text, matches), repeat, memory)
+                            record('highlight_text', language, size_bytes, keyword_count, seconds, peak,
+                                   matches=len(matches))
+    return records
+
+
+def scaling_exponents(records):
+    """按（基准, 语言, 关键词数）拟合 log(耗时) ~ log(文本大小) 的斜率，1 表示线性"""
+    groups = {}
+    for entry in records:
+        if entry['size_bytes'] and entry['seconds']:
+            key = (entry['benchmark'], entry['language'], entry['keywords'])
+            groups.setdefault(key, []).append((math.log(entry['size_bytes']), math.log(entry['seconds'])))
+    exponents = {}
+    for key, points in groups.items():
+        if len(points) < 2:
+            continue
+        mean_x = sum(x for x, _ in points) / len(points)
+        mean_y = sum(y for _, y in points) / len(points)
+        var_x = sum((x - mean_x) ** 2 for x, _ in points)
+        if var_x:
+            exponents[key] = sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+    return exponents
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _record_key(entry):
+    return entry['benchmark'], entry['language'], entry['size_bytes'], entry['keywords']
+
+
+def compare_results(base, current, tolerance=0.1):
+    """对比两份结果，返回 (对比行, 变慢超过 tolerance 的行)"""
+    base_records = {_record_key(entry): entry for entry in base['results']}
+    rows = []
+    regressions = []
+    for entry in current['results']:
+        old = base_records.get(_record_key(entry))
+        if old is None or not old['seconds']:
+            continue
+        ratio = entry['seconds'] / old['seconds']
+        row = (entry, old, ratio)
+        rows.append(row)
+        if ratio > 1 + tolerance:
+            regressions.append(row)
+    return rows, regressions
+
+
+def main_run(args):
+    sizes = [parse_size(size) for size in (args.sizes or (FULL_SIZES if args.full else DEFAULT_SIZES))]
+    keyword_counts = args.keywords or (FULL_KEYWORDS if args.full else DEFAULT_KEYWORDS)
+    records = run_benchmarks(
+        sizes, keyword_counts, args.languages, args.repeat, not args.no_memory,
+        parse_size(args.max_fuzzy_size)
+    )
+    print("\n规模曲线（耗时随文本大小增长的指数，1 为线性）：")
+    for (benchmark, language, keywords), exponent in sorted(scaling_exponents(records).items()):
+        print(f"  {benchmark:<24} {language} {keywords:>7} 个关键词  {exponent:.2f}")
+
+    output = {
+        'version': RESULTS_VERSION,
+        'meta': {
+            'revision': _git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': args.repeat
+        },
+        'results': records
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入 {args.output}")
+
+
+def main_compare(args):
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.current, encoding='utf-8') as f:
+        current = json.load(f)
+    rows, regressions = compare_results(base, current, args.tolerance)
+    print(f"基准: {base['meta'].get('revision')}  对比: {current['meta'].get('revision')}")
+    for entry, old, ratio in rows:
+        flag = '  <-- 变慢' if (entry, old, ratio) in regressions else ''
+        print(f"  {entry['benchmark']:<20} {entry['language']} {format_size(entry['size_bytes']):>7} "
+              f"{entry['keywords']:>7} 个关键词  {old['seconds'] * 1000:10.2f} -> "
+              f"{entry['seconds'] * 1000:10.2f} ms  x{ratio:.2f}{flag}")
+    if regressions:
+        print(f"\n{len(regressions)} 项变慢超过 {args.tolerance:.0%}")
+        sys.exit(1)
+    print("\n没有发现性能退化")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="文本资产定位工具性能基准")
+    subparsers = parser.add_subparsers(dest='command')
+
+    run_parser = subparsers.add_parser('run', help="运行基准（默认）")
+    compare_parser = subparsers.add_parser('compare', help="对比两次运行的结果")
+    for p in (parser, run_parser):
+        p.add_argument('--sizes', nargs='+', help="文本大小，如 10KB 1MB 100MB")
+        p.add_argument('--keywords', nargs='+', type=int, help="关键词数量，如 10 1000 100000")
+        p.add_argument('--languages', nargs='+', choices=LANGUAGES, default=list(LANGUAGES))
+        p.add_argument('--full', action='store_true', help="完整规模：10KB-100MB，10-100000 个关键词")
+        p.add_argument('--repeat', type=int, default=3, help="每项重复次数，取最短耗时")
+        p.add_argument('--no-memory', action='store_true', help="不测量内存峰值")
+        p.add_argument('--max-fuzzy-size', default='1MB', help="模糊匹配基准的最大文本大小")
+        p.add_argument('-o', '--output', default='benchmark_results.json', help="结果输出文件（JSON）")
+    compare_parser.add_argument('base', help="基准结果文件")
+    compare_parser.add_argument('current', help="待对比的结果文件")
+    compare_parser.add_argument('--tolerance', type=float, default=0.1, help="允许的变慢比例（默认 0.1）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'compare':
+        main_compare(args)
+    else:
+        main_run(args)
+
+
+if __name__ == '__main__':
+    main()
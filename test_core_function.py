@@ -1,5 +1,29 @@
-from utils.file_reader import read_file
-from utils.search_engine import search_keywords, highlight_text
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from docx import Document
+from utils.file_reader import read_file, read_asset_columns, read_asset_keywords, register_reader
+from utils.file_reader import clear_parse_cache, configure_parse_cache, parse_cache_stats
+from utils.search_engine import search_keywords, highlight_text, find_exact_matches, find_all_exact_matches
+from utils.search_engine import search_stream, count_matches
+from utils.search_engine import highlight_page, page_count, page_of_match
+from utils.incremental_search import IncrementalSearch
+from utils.instrumentation import collect
+from utils.search_jobs import SearchJob
+from utils.text_encoding import detect_encoding
+from utils.token_index import TokenIndex
+from utils.export import EXPORT_FORMATS, export_results, iter_match_rows
+from utils.document_store import DocumentStore, content_key
+from utils.normalization import Normalizer
+from concurrent.futures import ThreadPoolExecutor
+from utils.compiled_keywords import clear_keyword_cache, compile_keywords, configure_keyword_cache
+from batch_search import collect_documents, search_document, _init_worker
+from utils.corpus_index import CorpusIndex
+from benchmarks.corpus import generate_keywords, generate_text, parse_size
+from benchmarks.run import compare_results, run_benchmarks
 
 # 创建测试数据
 TEST_TEXT = """
@@ -41,4 +65,376 @@ print(f"模糊匹配 - 找到 {len(matches_fuzzy)} 个匹配项")
 for match in matches_fuzzy:
     print(f"  位置 {match['start']}-{match['end']}: {match['keyword']} ({match['type']}, 相似度: {match['similarity']})")
 
+# 测试多关键词自动机与逐个正则匹配结果一致
+print("\n5. 测试多关键词自动机：")
+for case_sensitive in (True, False):
+    multi = find_all_exact_matches(TEST_TEXT, TEST_KEYWORDS + ["python"], case_sensitive)
+    single = {k: find_exact_matches(TEST_TEXT, k, case_sensitive) for k in TEST_KEYWORDS + ["python"]}
+    print(f"大小写敏感={case_sensitive} - 与逐个匹配一致: {multi == single}")
+
+# 测试模糊匹配报告每一次出现
+print("\n6. 测试模糊匹配报告所有出现位置：")
+repeat_text = "Pyton is fun. I like Pyton and pyton"
+matches_repeat, counts_repeat = search_keywords(repeat_text, ["Python"], case_sensitive=False, use_fuzzy=True)
+print(f"模糊匹配 - 找到 {len(matches_repeat)} 个匹配项（期望 3）", counts_repeat)
+
+# 测试中文近似子串匹配
+print("\n7. 测试中文近似子串匹配：")
+cjk_text = "我们的文本检测工具和文本检索系统"
+matches_cjk, counts_cjk = search_keywords(cjk_text, ["文本检索"], use_fuzzy=True, fuzzy_threshold=75)
+for match in matches_cjk:
+    print(f"  位置 {match['start']}-{match['end']}: {cjk_text[match['start']:match['end']]} ({match['type']}, 相似度: {match.get('similarity', 100)})")
+
+# 测试流式分块搜索与整体搜索结果一致
+print("\n8. 测试流式分块搜索：")
+chunks = [TEST_TEXT[i:i + 7] for i in range(0, len(TEST_TEXT), 7)]
+stream_matches = list(search_stream(chunks, TEST_KEYWORDS, case_sensitive=False))
+print(f"流式搜索 - 找到 {len(stream_matches)} 个匹配项，与整体搜索一致: {count_matches(stream_matches) == counts}")
+
+# 测试高亮文本的转义与重叠匹配
+print("\n9. 测试高亮转义与重叠匹配：")
+overlap_text = "<b>文本检索</b>"
+overlap_matches = [
+    {'start': 3, 'end': 7, 'keyword': '文本检索', 'type': 'exact'},
+    {'start': 5, 'end': 7, 'keyword': '检索', 'type': 'exact'}
+]
+print(highlight_text(overlap_text, overlap_matches))
+unsorted_matches = overlap_matches[::-1]
+highlight_text(overlap_text, unsorted_matches)
+print(f"不改动传入的匹配顺序: {unsorted_matches == overlap_matches[::-1]}")
+
+# 测试列式匹配存储
+print("\n10. 测试列式匹配存储：")
+store, store_counts = search_keywords(TEST_TEXT, TEST_KEYWORDS, case_sensitive=False, as_store=True)
+print(f"与列表结果一致: {list(store) == matches}")
+print(f"Python 第 2 次出现的匹配下标: {store.nth('Python', 1)}，共 {store.count('Python')} 次")
+
+# 测试只调整搜索选项时的增量搜索
+print("\n11. 测试增量搜索：")
+session = IncrementalSearch()
+for threshold in (80, 60, 90):
+    incremental = session.search(TEST_TEXT, TEST_KEYWORDS + ["Pyton"], use_fuzzy=True, fuzzy_threshold=threshold)
+    full = search_keywords(TEST_TEXT, TEST_KEYWORDS + ["Pyton"], use_fuzzy=True, fuzzy_threshold=threshold)
+    print(f"阈值 {threshold} - 与完整搜索一致: {incremental == full}")
+print(f"重新计算次数: {session.stats}")
+# 含展开字符（ﬁ→fi、㈱→(株)）时，同一原文位置上的匹配按规范化文本中的位置排列，与完整搜索相同
+expanding_text = "ﬁle file ㈱ (株)"
+expanding_session = IncrementalSearch()
+for options in ((False, 80, 'auto'), (True, 75, 'token'), (True, 60, 'substring')):
+    incremental = expanding_session.search(expanding_text, ["i", "fi", "(株", "file"], True, *options)[0]
+    full = search_keywords(expanding_text, ["i", "fi", "(株", "file"], True, *options)[0]
+    print(f"展开字符 {options} - 与完整搜索一致（含顺序）: {incremental == full}")
+
+# 测试各阶段计时
+print("\n12. 测试各阶段计时：")
+with collect() as events:
+    search_keywords(TEST_TEXT, TEST_KEYWORDS, case_sensitive=False)
+for event in events:
+    print(f"{'  ' * event['depth']}{event['name']}: {event['seconds'] * 1000:.3f} ms")
+
+# 测试 .docx 表格与页眉中的文本
+print("\n13. 测试 .docx 文本提取：")
+doc = Document()
+doc.add_paragraph("正文提到 Python")
+doc.add_table(rows=1, cols=2).cell(0, 1).text = "表格中的 Streamlit"
+doc.sections[0].header.paragraphs[0].text = "页眉中的文本检索"
+with tempfile.TemporaryDirectory() as tmp_dir:
+    docx_path = os.path.join(tmp_dir, "test.docx")
+    doc.save(docx_path)
+    docx_text = read_file(docx_path)
+docx_matches, docx_counts = search_keywords(docx_text, TEST_KEYWORDS)
+print(f"提取文本: {docx_text!r}")
+print(f"匹配次数: {docx_counts}")
+
+# 测试按列读取资产列表
+print("\n14. 测试按列读取资产列表：")
+with tempfile.TemporaryDirectory() as tmp_dir:
+    csv_path = os.path.join(tmp_dir, "assets.csv")
+    with open(csv_path, 'w', encoding='utf-8') as f:
+        f.write("名称,别名,备注\nPython,,语言\n文本检索,检索,\nPython,Streamlit,框架\n")
+    print(f"列名: {read_asset_columns(csv_path)}")
+    print(f"关键词: {read_asset_keywords(csv_path, ['名称', '别名'])}")
+
+# 测试文本编码识别
+print("\n15. 测试 GBK 编码的文稿：")
+with tempfile.TemporaryDirectory() as tmp_dir:
+    gbk_path = os.path.join(tmp_dir, "gbk.txt")
+    with open(gbk_path, 'w', encoding='gbk') as f:
+        f.write(TEST_TEXT)
+    with open(gbk_path, 'rb') as f:
+        print(f"识别编码: {detect_encoding(f.read())}")
+    print(f"内容一致: {read_file(gbk_path) == TEST_TEXT}")
+
+# 测试后台搜索任务
+print("\n16. 测试后台搜索任务：")
+job = SearchJob(TEST_TEXT, TEST_KEYWORDS, use_fuzzy=True, chunk_size=16).start()
+job.wait()
+job_matches, job_counts = job.result()
+job_progress = job.progress()
+print(f"进度: 已扫描 {job_progress['chars_scanned']} / {job_progress['chars_total']} 字符，{job_progress['matches']} 个匹配")
+print(f"与 search_keywords 一致: {list(job_matches) == search_keywords(TEST_TEXT, TEST_KEYWORDS, use_fuzzy=True)[0]}")
+cancelled_job = SearchJob(TEST_TEXT, TEST_KEYWORDS, chunk_size=16)
+cancelled_job.cancel()
+cancelled_job.start().wait()
+print(f"取消后的状态: {cancelled_job.state}")
+
+# 测试读取器注册表与按需导入
+print("\n17. 测试读取器注册表：")
+register_reader('.md', lambda content: str(content, 'utf-8').replace('#', ''))
+with tempfile.TemporaryDirectory() as tmp_dir:
+    md_path = os.path.join(tmp_dir, "notes.md")
+    with open(md_path, 'w', encoding='utf-8') as f:
+        f.write("# Python 文本检索")
+    print(f"Markdown 文稿: {read_file(md_path)!r}")
+imported = subprocess.run(
+    [sys.executable, '-c', "import sys, utils.search_engine; print(sorted({'pandas', 'openpyxl', 'fuzzywuzzy'} & set(sys.modules)))"],
+    capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+).stdout.strip()
+print(f"导入搜索模块时加载的解析库: {imported}")
+
+# 测试文本规范化
+print("\n18. 测试全角与兼容字符：")
+wide_text = "新版ＰＹＴＨＯＮ教程由Straße出版"
+wide_matches, _ = search_keywords(wide_text, ["python", "strasse"], case_sensitive=False)
+print(f"匹配原文: {[wide_text[m['start']:m['end']] for m in wide_matches]}")
+print(f"不做规范化: {len(search_keywords(wide_text, ['python'], case_sensitive=False, normalization='none')[0])} 个匹配")
+
+# 测试分词索引与整词匹配
+print("\n19. 测试整词匹配：")
+word_text = "cat cats category 资产cat"
+word_index = TokenIndex(word_text)
+print(f"词: {word_index.words}，cat 的位置: {word_index.occurrences('cat')}")
+word_matches, _ = search_keywords(word_text, ["cat"], whole_word=True)
+print(f"整词匹配 cat: {[(m['start'], m['end']) for m in word_matches]}")
+
+# 测试导出匹配表与标注文稿
+print("\n20. 测试导出：")
+export_matches, _ = search_keywords(TEST_TEXT, TEST_KEYWORDS, as_store=True)
+print(f"第一行: {next(iter_match_rows(TEST_TEXT, export_matches, context=5))}")
+with tempfile.TemporaryDirectory() as tmp_dir:
+    for export_format in EXPORT_FORMATS:
+        export_path = os.path.join(tmp_dir, f"result.{export_format}")
+        export_results(TEST_TEXT, export_matches, export_path)
+        print(f"{export_format}: {os.path.getsize(export_path) > 0}")
+    with open(os.path.join(tmp_dir, "result.csv"), encoding='utf-8-sig', newline='') as f:
+        print(f"CSV 行数: {sum(1 for _ in csv.reader(f))}（含表头）")
+
+# 测试共享存储的去重、引用计数与内存预算
+print("\n21. 测试共享存储：")
+with tempfile.TemporaryDirectory() as tmp_dir:
+    store = DocumentStore(max_bytes=1000, spill_dir=tmp_dir)
+    # 每次拼接出新的字符串，存储之外没有人持有它
+    document_key = content_key('document', TEST_TEXT + "\n")
+    first_ref = store.share(document_key, TEST_TEXT + "\n", size=600)
+    second_ref = store.share(document_key, TEST_TEXT + "\n", size=600)
+    print(f"相同内容只保存一份: {len(store)} 个条目，{store.stats()['references']} 个引用")
+    store.put('page-1', "<p>1</p>", 'page', size=300)
+    store.put('page-2', "<p>2</p>", 'page', size=300)
+    print(f"超出预算时丢弃没有引用的页面: {'page-1' in store}, {'page-2' in store}")
+    other_ref = store.share(content_key('document', "另一份文稿"), "另一份文稿", size=600)
+    print(f"有引用的文稿溢出到磁盘: {store.stats()['spilled_entries']} 个，再次读取一致: {first_ref.get() == TEST_TEXT + chr(10)}")
+    first_ref.release()
+    del second_ref
+    other_ref.release()
+    print(f"释放全部引用后: {len(store)} 个条目（内存中的作为缓存保留），{len(os.listdir(tmp_dir))} 个溢出文件")
+    # 后台任务使用的文稿钉在内存中：它仍持有文稿，溢出腾不出内存，再读取还会多出一份
+    pinned_store = DocumentStore(max_bytes=1000, spill_dir=tmp_dir)
+    job_key = content_key('document', "后台任务使用的文稿")
+    job_document_ref = pinned_store.share(job_key, "后台任务使用的文稿", size=600)
+    job_ref = pinned_store.pin(job_key)
+    next_ref = pinned_store.share('document-next', "下一份文稿", size=600)
+    print(f"钉住的文稿不溢出: {pinned_store.stats()['spilled_entries']} 个溢出")
+    job_ref.release()
+    pinned_store.put('page-3', "<p>3</p>", 'page', size=100)
+    print(f"任务结束后溢出: {pinned_store.stats()['spilled_entries']} 个")
+    job_document_ref.release()
+    next_ref.release()
+    # 缓存的增量搜索状态持有文稿：存入时声明，留在存储中期间文稿不溢出
+    held_store = DocumentStore(max_bytes=1000, spill_dir=tmp_dir)
+    held_ref = held_store.share('document-held', "增量搜索状态持有的文稿", size=600)
+    other_ref = held_store.share('keywords-other', ["关键词"], 'keywords', size=300)
+    held_store.put('search-held', ["中间结果"], 'search', size=200, holds=('document-held',))
+    held_kinds = held_store.stats()['kinds']
+    print(f"被持有的文稿留在内存中: {held_kinds['document']['spilled_bytes'] == 0}，"
+          f"改为溢出其他条目: {held_kinds['keywords']['spilled_bytes'] == 300}")
+    held_ref.release()
+    other_ref.release()
+    # 溢出目录不可用（这里是一个普通文件）时条目留在内存中，不影响存取
+    blocked_dir = os.path.join(tmp_dir, "blocked")
+    open(blocked_dir, 'w').close()
+    blocked_store = DocumentStore(max_bytes=1000, spill_dir=blocked_dir)
+    blocked_refs = [
+        blocked_store.share(f'document-{i}', "不能溢出的文稿" * (i + 2), size=600) for i in range(2)
+    ]
+    print(f"溢出失败时留在内存中: {blocked_store.stats()['spilled_entries']} 个溢出，"
+          f"读取一致: {blocked_refs[0].get() == '不能溢出的文稿' * 2}")
+    for blocked_ref in blocked_refs:
+        blocked_ref.release()
+
+# 测试关键词编译结果的磁盘缓存
+print("\n22. 测试关键词编译缓存：")
+with tempfile.TemporaryDirectory() as tmp_dir:
+    configure_keyword_cache(cache_dir=tmp_dir)
+    clear_keyword_cache()
+    compile_keywords(TEST_KEYWORDS)
+    clear_keyword_cache()
+    with collect() as events:
+        reversed_compiled = compile_keywords(TEST_KEYWORDS[::-1])
+    print(f"从磁盘载入: {[e['cache'] for e in events if e['name'] == 'compile_keywords']}")
+    print(f"关键词保持传入顺序: {reversed_compiled.keywords == TEST_KEYWORDS[::-1]}")
+    for name in os.listdir(tmp_dir):
+        with open(os.path.join(tmp_dir, name), 'wb') as f:
+            f.write(b"stale")
+    clear_keyword_cache()
+    with collect() as events:
+        compile_keywords(TEST_KEYWORDS)
+    print(f"缓存文件损坏时重新编译: {[e['cache'] for e in events if e['name'] == 'compile_keywords']}")
+    # 缓存目录不可用（这里是一个普通文件）时照常编译，只是不写入磁盘
+    blocked_dir = os.path.join(tmp_dir, "blocked")
+    open(blocked_dir, 'w').close()
+    configure_keyword_cache(cache_dir=blocked_dir)
+    clear_keyword_cache()
+    with collect() as events:
+        blocked_compiled = compile_keywords(TEST_KEYWORDS)
+    print(f"缓存目录不可用时照常编译: {[e['cache'] for e in events if e['name'] == 'compile_keywords']}, "
+          f"{blocked_compiled.keywords == TEST_KEYWORDS}")
+    configure_keyword_cache(cache_dir='')
+    clear_keyword_cache()
+
+# 测试解析结果缓存
+print("\n23. 测试解析结果缓存：")
+clear_parse_cache()
+with tempfile.TemporaryDirectory() as tmp_dir:
+    cached_path = os.path.join(tmp_dir, "cached.txt")
+    with open(cached_path, 'w', encoding='utf-8') as f:
+        f.write(TEST_TEXT)
+    first_read = read_file(cached_path)
+    second_read = read_file(cached_path)
+    print(f"第二次读取复用缓存: {second_read is first_read}，命中 {parse_cache_stats()['hits']} 次")
+    with open(cached_path, 'a', encoding='utf-8') as f:
+        f.write("新增一行")
+    print(f"内容变化后重新解析: {read_file(cached_path).endswith('新增一行')}")
+    # 两个 lambda 读取器同名，缓存不应混用；重新注册后不再返回旧读取器的结果
+    lambda_path = os.path.join(tmp_dir, "cached.lam")
+    with open(lambda_path, 'w', encoding='utf-8') as f:
+        f.write("# 标题")
+    register_reader('.lam', lambda content: "first")
+    first_lambda = read_file(lambda_path)
+    register_reader('.lam', lambda content: "second")
+    print(f"重新注册后使用新读取器: {first_lambda == 'first' and read_file(lambda_path) == 'second'}")
+    read_first = lambda content: "first"
+    read_second = lambda content: "second"
+    register_reader('.lam', read_first)
+    register_reader('.lam2', read_second)
+    lambda_path2 = os.path.join(tmp_dir, "cached.lam2")
+    with open(lambda_path2, 'w', encoding='utf-8') as f:
+        f.write("# 标题")
+    print(f"同名读取器缓存互不混用: {read_file(lambda_path) == 'first' and read_file(lambda_path2) == 'second'}")
+
+# 测试分页高亮
+print("\n24. 测试分页高亮：")
+page_matches, _ = search_keywords(TEST_TEXT, TEST_KEYWORDS, as_store=True)
+last_page = page_of_match(page_matches, len(page_matches) - 1, 40)
+print(f"共 {page_count(TEST_TEXT, 40)} 页，最后一个匹配在第 {last_page + 1} 页")
+last_html = highlight_page(TEST_TEXT, page_matches, last_page, 40, 20)
+last_anchor = f'id="match_{len(page_matches) - 1}"'
+print(f"锚点保持全局编号: {last_anchor in last_html}")
+
+# 测试命令行批量处理
+print("\n25. 测试批量处理命令行：")
+with tempfile.TemporaryDirectory() as tmp_dir:
+    batch_doc = os.path.join(tmp_dir, "doc.txt")
+    with open(batch_doc, 'w', encoding='utf-8') as f:
+        f.write(TEST_TEXT)
+    batch_assets = os.path.join(tmp_dir, "assets.csv")
+    with open(batch_assets, 'w', encoding='utf-8') as f:
+        f.write("名称\n" + "\n".join(TEST_KEYWORDS) + "\n")
+    batch_output = os.path.join(tmp_dir, "out.jsonl")
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "batch_search.py")
+    batch_run = subprocess.run(
+        [sys.executable, script, tmp_dir, '--assets', batch_assets, '--columns', '名称', '-o', batch_output,
+         '--workers', '1'],
+        capture_output=True, text=True
+    )
+    with open(batch_output, encoding='utf-8') as f:
+        batch_record = json.loads(f.readline())
+    print(f"退出码: {batch_run.returncode}，匹配: {batch_record['matches']}（与 search_keywords 一致: "
+          f"{batch_record['matches'] == len(search_keywords(TEST_TEXT, TEST_KEYWORDS)[0])}）")
+    bad_run = subprocess.run(
+        [sys.executable, script, tmp_dir, '--assets', batch_assets, '--columns', '别名', '-o', batch_output],
+        capture_output=True, text=True
+    )
+    print(f"列名不存在: 退出码 {bad_run.returncode}，{bad_run.stderr.strip().splitlines()[-1]}")
+    parse_cache_entries = parse_cache_stats()['max_entries']
+    _init_worker(TEST_KEYWORDS, {})
+    print(f"文件已被删除: {search_document(os.path.join(tmp_dir, 'missing.txt'))['error'].split(':')[0]}")
+    configure_parse_cache(max_entries=parse_cache_entries)
+    # 注册的其他格式（前面注册的 .md）同样作为文稿收集，资产列表格式不收集
+    with open(os.path.join(tmp_dir, "notes.md"), 'w', encoding='utf-8') as f:
+        f.write("# Python")
+    print(f"收集注册格式的文稿: {[os.path.basename(path) for path in collect_documents([tmp_dir])]}")
+
+# 测试分片并行搜索
+print("\n26. 测试分片并行搜索：")
+long_text = (TEST_TEXT + "Pythn 与 Streamlt 的拼写错误。\n") * 6000
+serial_matches, serial_counts = search_keywords(long_text, TEST_KEYWORDS, use_fuzzy=True, fuzzy_threshold=70)
+for _ in range(2):
+    sharded_matches, sharded_counts = search_keywords(
+        long_text, TEST_KEYWORDS, use_fuzzy=True, fuzzy_threshold=70, workers=2
+    )
+    print(f"与单进程一致: {sharded_matches == serial_matches and sharded_counts == serial_counts}"
+          f"（{len(sharded_matches)} 个匹配）")
+
+# 测试文稿库索引
+print("\n27. 测试文稿库索引：")
+with tempfile.TemporaryDirectory() as tmp_dir:
+    corpus_texts = [TEST_TEXT, "ＰＹＴＨＯＮ 与 python 教程", "没有任何资产的文稿", "ﬁle 测试 ㈱ (株) Python"]
+    corpus_paths = []
+    for i, corpus_text in enumerate(corpus_texts):
+        corpus_paths.append(os.path.join(tmp_dir, f"doc{i}.txt"))
+        with open(corpus_paths[-1], 'w', encoding='utf-8') as f:
+            f.write(corpus_text)
+    with CorpusIndex(os.path.join(tmp_dir, "corpus.db")) as corpus:
+        corpus.add(corpus_paths)
+        for corpus_case in (True, False):
+            corpus_results = corpus.search(TEST_KEYWORDS, case_sensitive=corpus_case)
+            expected = {}
+            for path, corpus_text in zip(corpus_paths, corpus_texts):
+                corpus_matches = search_keywords(corpus_text, TEST_KEYWORDS, case_sensitive=corpus_case)[0]
+                if corpus_matches:
+                    expected[os.path.abspath(path)] = corpus_matches
+            print(f"大小写敏感={corpus_case}: {len(corpus_results)} 篇有匹配，与 search_keywords 一致: "
+                  f"{corpus_results == expected}")
+        print(f"包含 python 的文稿: {[os.path.basename(p) for p in corpus.documents_containing('python')]}")
+        # 展开字符（ﬁ→fi、㈱→(株)）中间开始的出现也由位置倒排表得到，换算回原文与 search_keywords 相同
+        expanding_keywords = ["i", "fi", "(株", "le"]
+        expanding_results = corpus.search(expanding_keywords, case_sensitive=False)
+        print(f"展开字符与 search_keywords 一致: "
+              f"{expanding_results.get(os.path.abspath(corpus_paths[3])) == search_keywords(corpus_texts[3], expanding_keywords, False)[0]}")
+        corpus.remove(corpus_paths[1])
+        print(f"删除后不再命中: {[os.path.basename(p) for p in corpus.search(['ＰＹＴＨＯＮ'], case_sensitive=False)]}")
+
+# 测试性能基准
+print("\n28. 测试性能基准：")
+bench_text = generate_text('zh', parse_size('2KB'))
+print(f"语料可复现: {bench_text == generate_text('zh', parse_size('2KB'))}，"
+      f"{len(bench_text.encode('utf-8'))} 字节，{len(generate_keywords('zh', 10))} 个关键词")
+bench_records = run_benchmarks(
+    [parse_size('2KB')], [10], ['en'], repeat=1, memory=False, log=lambda *args: None
+)
+print(f"基准项: {sorted({entry['benchmark'] for entry in bench_records})}")
+slower = {'results': [dict(entry, seconds=entry['seconds'] * 2) for entry in bench_records]}
+_, bench_regressions = compare_results({'results': bench_records}, slower)
+print(f"耗时翻倍时检出退化: {len(bench_regressions) > 0}")
+
+# 测试多线程共享规范化器
+print("\n29. 测试多线程共享规范化器：")
+# 每段含不同的展开字符（ﬁ、ß、㈱ 等），各线程同时学习新字符
+thread_chunks = [f"第{i}段 ﬁle Straße ㈱{chr(0x2460 + i % 20)} ＡＢＣ{chr(0xFB00 + i % 5)}" * 50 for i in range(64)]
+shared_normalizer = Normalizer('nfkc', case_sensitive=False)
+with ThreadPoolExecutor(max_workers=8) as executor:
+    threaded = list(executor.map(lambda chunk: shared_normalizer.normalize(chunk)[0], thread_chunks))
+serial = [Normalizer('nfkc', case_sensitive=False).normalize(chunk)[0] for chunk in thread_chunks]
+print(f"多线程结果与单线程一致: {threaded == serial}")
+
 print("\n=== 测试完成 ===")
\ No newline at end of file
@@ -0,0 +1,69 @@
+class AhoCorasick:
+    """多关键词自动机（Aho-Corasick），一次扫描即可找出所有关键词的全部出现位置"""
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        # 每个节点：子节点字典、失败指针、本节点结束的模式编号、输出链接
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        self._link = [0]
+        self._build()
+
+    def _build(self):
+        goto = self._goto
+        out = self._out
+
+        # 构建字典树
+        for index, pattern in enumerate(self.patterns):
+            if not pattern:
+                continue
+            node = 0
+            for ch in pattern:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    self._fail.append(0)
+                    out.append(())
+                    self._link.append(0)
+                node = nxt
+            out[node] = out[node] + (index,)
+
+        # 广度优先计算失败指针和输出链接
+        fail = self._fail
+        link = self._link
+        queue = list(goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for ch, child in goto[node].items():
+                queue.append(child)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[child] = target if target != child else 0
+                link[child] = fail[child] if out[fail[child]] else link[fail[child]]
+
+    def iter_matches(self, text):
+        """扫描文本，按结束位置顺序产出 (结束位置, 模式编号)，包含重叠的出现"""
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        link = self._link
+        root = goto[0]
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0) if node else root.get(ch, 0)
+            if not node:
+                continue
+            o = node if out[node] else link[node]
+            while o:
+                for index in out[o]:
+                    yield i + 1, index
+                o = link[o]
@@ -0,0 +1,214 @@
+from utils.aho_corasick import AhoCorasick
+
+
+def max_edits(keyword_len, threshold):
+    """由相似度阈值推出允许的最大编辑距离"""
+    return keyword_len * (100 - threshold) // 100
+
+
+def similarity_from_distance(distance, keyword_len):
+    """编辑距离换算为相似度（0-100），与 max_edits 的取整方式一致"""
+    return 100 * (keyword_len - distance) // keyword_len
+
+
+def myers_distances(text, pattern, max_distance, lo=0, hi=None):
+    """Myers 位并行近似匹配
+
+    扫描 text[lo:hi]，对每个结束位置给出模式与以该位置结尾的子串的最小编辑距离，
+    只产出距离不超过 max_distance 的 (结束位置, 距离)。时间与扫描长度成线性。
+    """
+    if hi is None:
+        hi = len(text)
+    m = len(pattern)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    peq = {}
+    for i, ch in enumerate(pattern):
+        peq[ch] = peq.get(ch, 0) | (1 << i)
+
+    pv = mask
+    mv = 0
+    score = m
+    for j in range(lo, hi):
+        eq = peq.get(text[j], 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = (ph << 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+        if score <= max_distance:
+            yield j + 1, score
+
+
+def _best_start(text, pattern, end, distance, max_distance):
+    """在结束位置固定时，反向动态规划找出编辑距离最小、长度最接近关键词的起点"""
+    m = len(pattern)
+    lo = max(0, end - m - max_distance)
+    window = text[lo:end][::-1]
+    reversed_pattern = pattern[::-1]
+    # prev[j]: 反向模式前缀与 window[:j] 的编辑距离
+    prev = list(range(len(window) + 1))
+    for i, ch in enumerate(reversed_pattern, 1):
+        cur = [i] + [0] * len(window)
+        for j, wch in enumerate(window, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (wch != ch))
+        prev = cur
+    candidates = [length for length, d in enumerate(prev) if d == distance and length > 0]
+    length = min(candidates, key=lambda n: (abs(n - m), -n))
+    return end - length
+
+
+def _local_minima(hits, max_distance, min_end=0, max_end=None):
+    """从逐位置距离中挑出局部最优的结束位置（距离严格小于前一位置且不大于后一位置）"""
+    infinity = max_distance + 1
+    for i, (end, distance) in enumerate(hits):
+        if end <= min_end or (max_end is not None and end > max_end):
+            continue
+        prev_distance = hits[i - 1][1] if i > 0 and hits[i - 1][0] == end - 1 else infinity
+        next_distance = hits[i + 1][1] if i + 1 < len(hits) and hits[i + 1][0] == end + 1 else infinity
+        if distance < prev_distance and distance <= next_distance:
+            yield end, distance
+
+
+class ApproximateSelection:
+    """按结束位置顺序接收候选，挑出互不重叠的结果
+
+    与上一个结果重叠时保留距离更小的一个。一个结果在后续候选的终点超过
+    其终点 + 关键词长度 + k 之后就不会再被替换，可以通过 release 提前取出，
+    便于分块扫描时边扫描边输出。
+    """
+
+    def __init__(self, matcher):
+        self.matcher = matcher
+        self._pending = [[] for _ in matcher.patterns]
+        self._floor = [0] * len(matcher.patterns)
+
+    def add(self, pattern_index, start, end, distance):
+        pending = self._pending[pattern_index]
+        if pending and start < pending[-1][1]:
+            floor = pending[-2][1] if len(pending) > 1 else self._floor[pattern_index]
+            if distance < pending[-1][2] and start >= floor:
+                pending[-1] = (start, end, distance)
+            return
+        pending.append((start, end, distance))
+
+    def release(self, limit=None):
+        """取出终点不超过 limit 的候选已无法再影响的结果；limit 为 None 时全部取出"""
+        results = []
+        for pattern_index, pending in enumerate(self._pending):
+            keyword, pattern, k = self.matcher.patterns[pattern_index]
+            horizon = None if limit is None else limit - len(pattern) - k
+            done = 0
+            for start, end, distance in pending:
+                if horizon is not None and end > horizon:
+                    break
+                results.append({
+                    'start': start,
+                    'end': end,
+                    'keyword': keyword,
+                    'type': 'fuzzy',
+                    'similarity': similarity_from_distance(distance, len(pattern))
+                })
+                self._floor[pattern_index] = end
+                done += 1
+            del pending[:done]
+        return results
+
+
+def _pieces(pattern, max_distance):
+    """把模式切成 max_distance + 1 段：编辑距离不超过 k 的匹配必然精确包含其中一段"""
+    count = max_distance + 1
+    m = len(pattern)
+    return [(pattern[i * m // count:(i + 1) * m // count], i * m // count) for i in range(count)]
+
+
+class ApproximateMatcher:
+    """预编译的近似子串匹配器，适用于中文等无空格分词的文本
+
+    每个关键词切成 k + 1 段，所有分段共用一个自动机。搜索时先精确查找分段，
+    只在命中分段附近的窗口内运行 Myers 扫描。构建一次后可对多个文本重复使用。
+    compare_forms 为各关键词实际参与比较的形式（如忽略大小写时的小写形式），
+    此时传入 search 的文本也应是同样处理过的文本。
+    """
+
+    def __init__(self, keywords, threshold=80, compare_forms=None):
+        if compare_forms is None:
+            compare_forms = keywords
+        self.keywords = list(keywords)
+        self.patterns = []
+        self._piece_owners = {}
+        for keyword, pattern in zip(self.keywords, compare_forms):
+            k = max_edits(len(pattern), threshold)
+            self.patterns.append((keyword, pattern, k))
+            if k == 0:
+                # 不允许编辑时只会得到精确匹配，交由精确匹配处理
+                continue
+            for piece, offset in _pieces(pattern, k):
+                self._piece_owners.setdefault(piece, []).append((len(self.patterns) - 1, offset))
+        self._pieces = list(self._piece_owners)
+        self._automaton = AhoCorasick(self._pieces) if self._pieces else None
+
+    def candidates(self, text, min_end=0, max_end=None):
+        """返回终点在 (min_end, max_end] 内的候选 [(模式编号, 起点, 终点, 距离)]
+
+        每个关键词的候选按终点排序。
+        """
+        results = []
+        if self._automaton is None:
+            return results
+
+        windows = [[] for _ in self.patterns]
+        n = len(text)
+        for piece_end, piece_index in self._automaton.iter_matches(text):
+            piece = self._pieces[piece_index]
+            piece_start = piece_end - len(piece)
+            for pattern_index, offset in self._piece_owners[piece]:
+                _, pattern, k = self.patterns[pattern_index]
+                origin = piece_start - offset
+                windows[pattern_index].append((max(0, origin - k), min(n, origin + len(pattern) + k)))
+
+        for pattern_index, spans in enumerate(windows):
+            if not spans:
+                continue
+            _, pattern, k = self.patterns[pattern_index]
+            spans.sort()
+            merged = [list(spans[0])]
+            for lo, hi in spans[1:]:
+                if lo <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], hi)
+                else:
+                    merged.append([lo, hi])
+            hits = []
+            for lo, hi in merged:
+                hits.extend(myers_distances(text, pattern, k, lo, hi))
+            for end, distance in _local_minima(hits, k, min_end, max_end):
+                start = _best_start(text, pattern, end, distance, k)
+                results.append((pattern_index, start, end, distance))
+        return results
+
+    def search(self, text, word_index=None):
+        """返回 {关键词: 模糊匹配列表}
+
+        word_index 为同一文本的 TokenIndex 时只保留两端都是词边界的候选（整词匹配）。
+        """
+        selection = ApproximateSelection(self)
+        for candidate in self.candidates(text):
+            if word_index is not None and not word_index.is_whole_word(candidate[1], candidate[2]):
+                continue
+            selection.add(*candidate)
+        results = {keyword: [] for keyword in self.keywords}
+        for match in selection.release():
+            results[match['keyword']].append(match)
+        return results
+
+
+def find_all_approximate_matches(text, keywords, threshold=80, compare_forms=None):
+    """按原始字符做近似子串匹配，返回 {关键词: 模糊匹配列表}"""
+    return ApproximateMatcher(keywords, threshold, compare_forms).search(text)
@@ -0,0 +1,329 @@
+import copy
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+from utils.aho_corasick import AhoCorasick
+from utils.approximate import ApproximateMatcher
+from utils.cache import LRUCache
+from utils.fuzzy_index import can_reach
+from utils.instrumentation import span
+from utils.normalization import DEFAULT_NORMALIZATION, Normalizer
+
+# 模糊匹配方式：token 按空白分词后比较整词；substring 在原始字符上做近似子串匹配；
+# auto 对含中日文字符的关键词使用 substring，其余使用 token
+FUZZY_MODES = ('auto', 'token', 'substring')
+
+# 编译结果的格式版本，结构变化时递增，使旧的磁盘缓存失效
+COMPILED_FORMAT_VERSION = 5
+
+# 进程内共享（同一服务器上的所有会话共用）的编译结果缓存
+_memory_cache = LRUCache(max_entries=int(os.environ.get('TEXT_ASSET_KEYWORD_CACHE_SIZE', 8)))
+# 磁盘缓存目录，为空时不落盘
+_cache_dir = os.environ.get('TEXT_ASSET_KEYWORD_CACHE_DIR') or None
+_max_disk_entries = 64
+
+
+def prepare_keywords(keywords):
+    """去除空白关键词并去重，保持原有顺序"""
+    seen = set()
+    result = []
+    for keyword in keywords:
+        if not keyword or keyword.strip() == '':
+            continue
+        keyword = keyword.strip()
+        if keyword not in seen:
+            seen.add(keyword)
+            result.append(keyword)
+    return result
+
+
+def has_cjk(text):
+    """是否包含中日文字符（这类文本没有空格分词）"""
+    for ch in text:
+        code = ord(ch)
+        if (0x3040 <= code <= 0x30ff or 0x3400 <= code <= 0x4dbf
+                or 0x4e00 <= code <= 0x9fff or 0xf900 <= code <= 0xfaff):
+            return True
+    return False
+
+
+class ExactMatcher:
+    """预编译的多关键词精确匹配器，所有关键词共用一个 Aho-Corasick 自动机
+
+    关键词与文本都先经过同一个 Normalizer 规范化，匹配位置换算回原文。
+    """
+
+    def __init__(self, keywords, case_sensitive=True, normalization=DEFAULT_NORMALIZATION):
+        self.keywords = list(keywords)
+        self.case_sensitive = case_sensitive
+        self.normalizer = Normalizer(normalization, case_sensitive)
+        patterns = [self.normalizer.normalize_keyword(k) for k in self.keywords]
+
+        # 规范化后不同关键词可能变成同一模式，共享一个自动机节点
+        pattern_ids = {}
+        self.pattern_owners = []
+        for keyword, pattern in zip(self.keywords, patterns):
+            if pattern not in pattern_ids:
+                pattern_ids[pattern] = len(self.pattern_owners)
+                self.pattern_owners.append([])
+            self.pattern_owners[pattern_ids[pattern]].append(keyword)
+        self._lengths = [len(pattern) for pattern in pattern_ids]
+        self._automaton = AhoCorasick(list(pattern_ids))
+
+    def iter_occurrences(self, text):
+        """产出所有出现（含同一模式的重叠出现）(起点, 终点, 模式编号)，按终点排序
+
+        text 需已经过 normalizer 规范化，位置为规范化文本中的偏移。
+        """
+        lengths = self._lengths
+        for end, index in self._automaton.iter_matches(text):
+            yield end - lengths[index], end, index
+
+    def search(self, text):
+        """返回 {关键词: 匹配列表}，每个关键词的结果从左到右、互不重叠"""
+        text, offsets = self.normalizer.normalize(text)
+        results = {keyword: [] for keyword in self.keywords}
+        owners = self.pattern_owners
+        last_end = [0] * len(owners)
+        for start, end, index in self.iter_occurrences(text):
+            # 同一关键词保持 re.finditer 的非重叠语义
+            if start < last_end[index]:
+                continue
+            last_end[index] = end
+            for keyword in owners[index]:
+                results[keyword].append({
+                    'start': start,
+                    'end': end,
+                    'keyword': keyword,
+                    'type': 'exact'
+                })
+        for matches in results.values():
+            offsets.map_matches(matches)
+        return results
+
+
+class CompiledKeywords:
+    """一组关键词在给定搜索选项下的全部预处理结果
+
+    包括去重后的关键词、文本规范化方式、精确匹配自动机、按词模糊匹配的比较形式和
+    近似子串匹配器。与文档无关，可在多次搜索、多个会话之间复用。
+    keywords 保持传入的顺序，决定 keyword_counts 的顺序和同一位置上匹配的先后。
+    whole_word 为 True 时只保留两端都是词边界的精确匹配和近似匹配（见 TokenIndex）。
+    """
+
+    def __init__(self, keywords, case_sensitive=True, use_fuzzy=False, fuzzy_threshold=80,
+                 fuzzy_mode='auto', normalization=DEFAULT_NORMALIZATION, whole_word=False):
+        if fuzzy_mode not in FUZZY_MODES:
+            raise ValueError(f"Unsupported fuzzy mode: {fuzzy_mode}")
+        self.keywords = prepare_keywords(keywords)
+        self.case_sensitive = case_sensitive
+        self.use_fuzzy = use_fuzzy
+        self.fuzzy_threshold = fuzzy_threshold
+        self.fuzzy_mode = fuzzy_mode
+        self.normalization = normalization
+        self.whole_word = whole_word
+        self.fingerprint = keyword_fingerprint(
+            self.keywords, case_sensitive, use_fuzzy, fuzzy_threshold, fuzzy_mode, normalization, whole_word
+        )
+        self.exact = ExactMatcher(self.keywords, case_sensitive, normalization)
+        # 文本只规范化一次，全部匹配器都在规范化文本上运行
+        self.normalizer = self.exact.normalizer
+
+        self.token_keywords = []
+        # 按词模糊匹配时关键词的比较形式
+        self.token_forms = {}
+        self.substring_keywords = []
+        self.approximate = None
+        if use_fuzzy:
+            for keyword in self.keywords:
+                if fuzzy_mode == 'substring' or (fuzzy_mode == 'auto' and has_cjk(keyword)):
+                    self.substring_keywords.append(keyword)
+                else:
+                    self.token_keywords.append(keyword)
+                    self.token_forms[keyword] = self.normalizer.normalize_keyword(keyword)
+            if self.substring_keywords:
+                compare_forms = [self.normalizer.normalize_keyword(k) for k in self.substring_keywords]
+                self.approximate = ApproximateMatcher(
+                    self.substring_keywords, fuzzy_threshold, compare_forms
+                )
+        self.max_token_length = self._max_token_length()
+        self.max_match_length = self._max_match_length()
+
+    def _max_token_length(self):
+        """按词模糊匹配时可能达到阈值的最大词长（比较形式），更长的词无需打分
+
+        阈值过低使任意长的词都可能达到阈值时返回 None。
+        """
+        threshold = self.fuzzy_threshold
+        if self.token_keywords and 2 * threshold - 1 <= 0:
+            return None
+        longest = 0
+        for keyword in self.token_keywords:
+            # ratio = 2M / (la + lb) 且 M <= la，词长超过上限时不可能达到阈值
+            keyword_len = len(self.token_forms[keyword])
+            length = int(400 * keyword_len / (2 * threshold - 1)) - keyword_len + 1
+            while length > keyword_len and not can_reach(keyword_len, keyword_len + length, threshold):
+                length -= 1
+            longest = max(longest, length)
+        return longest
+
+    def _max_match_length(self):
+        """任何一个匹配可能的最大长度；分块扫描时块与块之间需要重叠这么多字符
+
+        阈值过低使任意长的词都可能达到阈值时返回 None。
+        """
+        if self.max_token_length is None:
+            return None
+        longest = max((len(self.normalizer.normalize_keyword(k)) for k in self.keywords), default=0)
+        longest = max(longest, self.max_token_length)
+        if self.approximate is not None:
+            for _, pattern, k in self.approximate.patterns:
+                longest = max(longest, len(pattern) + k)
+        return longest
+
+    def ordered(self, keywords):
+        """同一组关键词按另一种顺序排列的视图，共享全部预处理结构"""
+        if keywords == self.keywords:
+            return self
+        view = copy.copy(self)
+        view.keywords = list(keywords)
+        return view
+
+
+def keyword_fingerprint(keywords, case_sensitive=True, use_fuzzy=False, fuzzy_threshold=80,
+                        fuzzy_mode='auto', normalization=DEFAULT_NORMALIZATION, whole_word=False):
+    """关键词集合与搜索选项的指纹，与关键词顺序和重复无关"""
+    if not use_fuzzy:
+        # 未开启模糊匹配时阈值和方式不影响编译结果
+        fuzzy_threshold = 80
+        fuzzy_mode = 'auto'
+    payload = json.dumps({
+        'version': COMPILED_FORMAT_VERSION,
+        'keywords': sorted(set(keywords)),
+        'case_sensitive': case_sensitive,
+        'use_fuzzy': use_fuzzy,
+        'fuzzy_threshold': fuzzy_threshold,
+        'fuzzy_mode': fuzzy_mode,
+        'normalization': normalization,
+        'whole_word': whole_word
+    }, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _disk_path(fingerprint):
+    return os.path.join(_cache_dir, f"keywords-{fingerprint}.pkl")
+
+
+def _load_from_disk(fingerprint):
+    if not _cache_dir:
+        return None
+    path = _disk_path(fingerprint)
+    try:
+        with open(path, 'rb') as f:
+            compiled = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, TypeError, ValueError):
+        # 读不到、旧版本或损坏的缓存文件，重新编译
+        return None
+    # 更新修改时间，磁盘淘汰同样按最近使用顺序（文件可能刚被其他进程淘汰）
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return compiled
+
+
+def _save_to_disk(compiled):
+    """写入磁盘缓存；磁盘缓存只是优化，写不进去（磁盘已满、没有权限等）时跳过"""
+    if not _cache_dir:
+        return
+    tmp_path = None
+    try:
+        os.makedirs(_cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=_cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, _disk_path(compiled.fingerprint))
+    except (OSError, pickle.PicklingError):
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        return
+    _prune_disk_cache()
+
+
+def _prune_disk_cache():
+    """超出条目上限时删除最久未使用的缓存文件；多个进程共用缓存目录时文件可能已被其他进程删除"""
+    try:
+        names = os.listdir(_cache_dir)
+    except OSError:
+        return
+    entries = []
+    for name in names:
+        if name.startswith('keywords-') and name.endswith('.pkl'):
+            path = os.path.join(_cache_dir, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+    if len(entries) > _max_disk_entries:
+        entries.sort()
+        for _, path in entries[:len(entries) - _max_disk_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def compile_keywords(keywords, case_sensitive=True, use_fuzzy=False, fuzzy_threshold=80,
+                     fuzzy_mode='auto', normalization=DEFAULT_NORMALIZATION, whole_word=False):
+    """获取编译好的关键词，优先使用内存缓存，其次使用磁盘缓存
+
+    缓存按与顺序无关的指纹共享，返回的对象中关键词保持本次传入的顺序。
+    """
+    with span('compile_keywords') as counters:
+        keywords = prepare_keywords(keywords)
+        counters['keywords'] = len(keywords)
+        fingerprint = keyword_fingerprint(
+            keywords, case_sensitive, use_fuzzy, fuzzy_threshold, fuzzy_mode, normalization, whole_word
+        )
+        compiled = _memory_cache.get(fingerprint)
+        counters['cache'] = 'memory'
+        if compiled is None:
+            compiled = _load_from_disk(fingerprint)
+            counters['cache'] = 'disk'
+            if compiled is None:
+                compiled = CompiledKeywords(
+                    keywords, case_sensitive, use_fuzzy, fuzzy_threshold, fuzzy_mode, normalization, whole_word
+                )
+                _save_to_disk(compiled)
+                counters['cache'] = 'miss'
+            _memory_cache.put(fingerprint, compiled)
+        return compiled.ordered(keywords)
+
+
+def configure_keyword_cache(max_entries=None, cache_dir=None, max_disk_entries=None):
+    """调整编译结果缓存：内存条目上限、磁盘缓存目录（空字符串表示关闭）及磁盘条目上限"""
+    global _cache_dir, _max_disk_entries
+    if max_entries is not None:
+        _memory_cache.resize(max_entries)
+    if cache_dir is not None:
+        _cache_dir = cache_dir or None
+    if max_disk_entries is not None:
+        _max_disk_entries = max_disk_entries
+
+
+def clear_keyword_cache():
+    """清空内存中的编译结果缓存"""
+    _memory_cache.clear()
+
+
+def keyword_cache_stats():
+    """内存缓存的条目数与命中统计"""
+    stats = _memory_cache.stats()
+    stats['cache_dir'] = _cache_dir
+    return stats
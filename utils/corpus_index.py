@@ -0,0 +1,383 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+
+from utils.compiled_keywords import compile_keywords, prepare_keywords
+from utils.file_reader import read_file
+from utils.match_store import MatchStore
+from utils.normalization import Normalizer, OffsetMap
+from utils.search_engine import search_compiled
+
+# 索引格式版本，结构变化时递增
+CORPUS_INDEX_VERSION = 3
+
+# 索引项与查询都按 NFKC 规范化（全角/半角、兼容字符）后比较
+_NORMALIZATION = 'nfkc'
+_folder = Normalizer(_NORMALIZATION, case_sensitive=False)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    content BLOB NOT NULL,
+    offsets BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    gram TEXT NOT NULL,
+    doc_id INTEGER NOT NULL,
+    positions BLOB NOT NULL,
+    PRIMARY KEY (gram, doc_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS grams (
+    gram TEXT PRIMARY KEY,
+    doc_count INTEGER NOT NULL
+) WITHOUT ROWID;
+'''
+
+
+def document_grams(text):
+    """文档的索引项：规范化并折叠大小写后出现过的所有单字和相邻两字"""
+    folded = _folder.normalize(text)[0]
+    grams = set(folded)
+    grams.update(folded[i:i + 2] for i in range(len(folded) - 1))
+    return grams
+
+
+def document_postings(text):
+    """文档的位置倒排表：{索引项: 在折叠文本中的起点列表} 及折叠文本到原文的偏移映射"""
+    folded, offsets = _folder.normalize(text)
+    postings = {}
+    for i, char in enumerate(folded):
+        postings.setdefault(char, []).append(i)
+    for i in range(len(folded) - 1):
+        postings.setdefault(folded[i:i + 2], []).append(i)
+    return postings, offsets
+
+
+def _pack(values):
+    """整数序列编码为小端序的 uint32 字节串"""
+    packed = array('I', values)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack(blob):
+    values = array('I')
+    values.frombytes(blob)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def _pack_offsets(offsets):
+    """偏移映射只记录结果不是一个字符的原文字符：(规范化位置, 结果长度, 原文位置) 三元组"""
+    values = [offsets.original_length, offsets.normalized_length]
+    for triple in zip(offsets.normalized_starts, offsets.lengths, offsets.original_positions):
+        values.extend(triple)
+    return _pack(values)
+
+
+def _unpack_offsets(blob):
+    values = _unpack(blob)
+    offsets = OffsetMap()
+    offsets.original_length, offsets.normalized_length = values[0], values[1]
+    offsets.normalized_starts.fromlist(values[2::3].tolist())
+    offsets.lengths.fromlist(values[3::3].tolist())
+    offsets.original_positions.fromlist(values[4::3].tolist())
+    return offsets
+
+
+def keyword_grams(keyword):
+    """包含关键词的文档必然包含的索引项"""
+    return {gram for _, gram in _pattern_grams(_folder.normalize_keyword(keyword))}
+
+
+def _pattern_grams(folded):
+    """折叠后的关键词的索引项及其在关键词中的位置 [(位置, 索引项)]"""
+    if len(folded) == 1:
+        return [(0, folded)]
+    return [(i, folded[i:i + 2]) for i in range(len(folded) - 1)]
+
+
+class CorpusIndex:
+    """文稿库的持久化倒排索引（SQLite）
+
+    文稿经 read_file 解析一次后，正文规范化并折叠大小写，按单字和相邻两字建立
+    “索引项 -> 文稿 -> 位置”倒排表，并压缩保存解析后的正文和偏移映射。
+    不区分大小写的查询只读倒排表：关键词的出现位置由其各个两字索引项的位置对齐求出，
+    不解压也不扫描正文；区分大小写时只对有出现的文稿再做一次精确匹配。
+    返回与 search_keywords 相同的匹配（可直接交给 highlight_text），不再重新读取和解析原始文件。
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path)
+        self._conn.executescript(_SCHEMA)
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('version', ?)", (str(CORPUS_INDEX_VERSION),)
+                )
+        elif int(row[0]) != CORPUS_INDEX_VERSION:
+            raise ValueError(f"Unsupported corpus index version: {row[0]}")
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def __contains__(self, path):
+        return self._doc_id(path) is not None
+
+    def _doc_id(self, path):
+        row = self._conn.execute(
+            "SELECT id FROM documents WHERE path = ?", (os.path.abspath(path),)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def _delete(self, doc_id):
+        row = self._conn.execute("SELECT content FROM documents WHERE id = ?", (doc_id,)).fetchone()
+        grams = document_grams(zlib.decompress(row[0]).decode('utf-8'))
+        self._conn.executemany(
+            "DELETE FROM postings WHERE gram = ? AND doc_id = ?", ((gram, doc_id) for gram in grams)
+        )
+        self._conn.executemany(
+            "UPDATE grams SET doc_count = doc_count - 1 WHERE gram = ?", ((gram,) for gram in grams)
+        )
+        self._conn.execute("DELETE FROM grams WHERE doc_count <= 0")
+        self._conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+
+    def _add(self, path):
+        """加入或更新一篇文稿；文件大小和修改时间都未变化时跳过，返回是否重新索引"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        row = self._conn.execute(
+            "SELECT id, mtime, size, digest FROM documents WHERE path = ?", (path,)
+        ).fetchone()
+        if row is not None and row[1] == stat.st_mtime and row[2] == stat.st_size:
+            return False
+
+        text = read_file(path)
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        if row is not None:
+            if row[3] == digest:
+                # 内容未变（如只是被重新保存），只更新文件信息
+                self._conn.execute(
+                    "UPDATE documents SET mtime = ?, size = ? WHERE id = ?",
+                    (stat.st_mtime, stat.st_size, row[0])
+                )
+                return False
+            self._delete(row[0])
+
+        postings, offsets = document_postings(text)
+        cursor = self._conn.execute(
+            "INSERT INTO documents (path, mtime, size, digest, length, content, offsets) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, stat.st_mtime, stat.st_size, digest, len(text), zlib.compress(text.encode('utf-8')),
+             _pack_offsets(offsets))
+        )
+        doc_id = cursor.lastrowid
+        self._conn.executemany(
+            "INSERT INTO postings (gram, doc_id, positions) VALUES (?, ?, ?)",
+            ((gram, doc_id, _pack(positions)) for gram, positions in postings.items())
+        )
+        self._conn.executemany(
+            "INSERT INTO grams (gram, doc_count) VALUES (?, 1) "
+            "ON CONFLICT (gram) DO UPDATE SET doc_count = doc_count + 1",
+            ((gram,) for gram in postings)
+        )
+        return True
+
+    def add(self, paths):
+        """加入或更新文稿（单个路径或路径列表），返回重新索引的文稿数"""
+        if isinstance(paths, str):
+            paths = [paths]
+        with self._conn:
+            return sum(self._add(path) for path in paths)
+
+    def remove(self, paths):
+        """从索引中删除文稿，返回删除的文稿数"""
+        if isinstance(paths, str):
+            paths = [paths]
+        removed = 0
+        with self._conn:
+            for path in paths:
+                doc_id = self._doc_id(path)
+                if doc_id is not None:
+                    self._delete(doc_id)
+                    removed += 1
+        return removed
+
+    def sync(self, paths):
+        """使索引与给定的文稿列表一致：加入新文稿、更新有变化的文稿、删除不在列表中的文稿"""
+        wanted = {os.path.abspath(path) for path in paths}
+        stale = [path for path in self.documents() if path not in wanted]
+        removed = self.remove(stale)
+        added = self.add(sorted(wanted))
+        return {'added': added, 'removed': removed}
+
+    def documents(self):
+        """已索引的文稿路径"""
+        return [row[0] for row in self._conn.execute("SELECT path FROM documents ORDER BY path")]
+
+    def text(self, path):
+        """已索引文稿的正文（即 read_file 的结果）"""
+        row = self._conn.execute(
+            "SELECT content FROM documents WHERE path = ?", (os.path.abspath(path),)
+        ).fetchone()
+        if row is None:
+            raise KeyError(path)
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    def _occurrences(self, keywords):
+        """关键词在各文稿折叠文本中的出现，只读倒排表（一次查询取出全部索引项的位置）
+
+        与精确匹配相同：折叠后相同的关键词共用一个模式，每个模式从左到右取互不重叠的出现。
+        返回 (模式列表 [(折叠形式, 关键词列表)], {文稿编号: [(起点, 终点, 模式编号)]})。
+        """
+        patterns = {}
+        for keyword in keywords:
+            folded = _folder.normalize_keyword(keyword)
+            if folded:
+                patterns.setdefault(folded, []).append(keyword)
+        patterns = list(patterns.items())
+        pattern_grams = [_pattern_grams(folded) for folded, _ in patterns]
+        grams = {gram for parts in pattern_grams for _, gram in parts}
+        postings = {gram: {} for gram in grams}
+        rows = self._conn.execute(
+            "SELECT gram, doc_id, positions FROM postings WHERE gram IN (SELECT value FROM json_each(?))",
+            (json.dumps(sorted(grams), ensure_ascii=False),)
+        )
+        for gram, doc_id, positions in rows:
+            postings[gram][doc_id] = positions
+        decoded = {}
+
+        def positions_of(gram, doc_id):
+            positions = decoded.get((gram, doc_id))
+            if positions is None:
+                positions = decoded[gram, doc_id] = _unpack(postings[gram][doc_id])
+            return positions
+
+        occurrences = {}
+        for index, parts in enumerate(pattern_grams):
+            doc_ids = set(postings[parts[0][1]]).intersection(*(postings[gram] for _, gram in parts[1:]))
+            length = len(patterns[index][0])
+            for doc_id in doc_ids:
+                if len(parts) == 1:
+                    starts = positions_of(parts[0][1], doc_id)
+                else:
+                    # 从本文稿中出现最少的索引项开始，其余索引项在有序的位置表中二分确认
+                    first = min(parts, key=lambda part: len(postings[part[1]][doc_id]))
+                    first_offset = first[0]
+                    starts = [position - first_offset for position in positions_of(first[1], doc_id)
+                              if position >= first_offset]
+                    for part in parts:
+                        if part is first or not starts:
+                            continue
+                        offset = part[0]
+                        positions = positions_of(part[1], doc_id)
+                        count = len(positions)
+                        kept = []
+                        for start in starts:
+                            i = bisect_left(positions, start + offset)
+                            if i < count and positions[i] == start + offset:
+                                kept.append(start)
+                        starts = kept
+                # 同一模式保持 re.finditer 的非重叠语义
+                last_end = 0
+                for start in starts:
+                    if start >= last_end:
+                        occurrences.setdefault(doc_id, []).append((start, start + length, index))
+                        last_end = start + length
+        return patterns, occurrences
+
+    def documents_containing(self, keyword):
+        """包含关键词（规范化并忽略大小写后）的文稿路径，只查倒排表"""
+        keyword = keyword.strip()
+        if not keyword:
+            return []
+        return self._paths(self._occurrences([keyword])[1])
+
+    def _paths(self, doc_ids):
+        rows = self._conn.execute(
+            "SELECT path FROM documents WHERE id IN (SELECT value FROM json_each(?)) ORDER BY path",
+            (json.dumps(sorted(doc_ids)),)
+        )
+        return [row[0] for row in rows]
+
+    def search(self, keywords, case_sensitive=True, as_store=False):
+        """在全部已索引文稿中精确查找关键词（可以是整个资产列表）
+
+        返回 {文稿路径: 匹配列表}，只包含至少有一个匹配的文稿；匹配与
+        search_keywords(正文, keywords, case_sensitive) 相同，位置为该文稿正文（见 text）中的偏移。
+        不区分大小写时匹配全部由倒排表中的位置得到；区分大小写时倒排表给出有出现的文稿，
+        只对这些文稿的正文再扫描一遍（大小写不同的出现需要对照正文才能排除）。
+        """
+        keywords = prepare_keywords(keywords)
+        patterns, occurrences = self._occurrences(keywords) if keywords else ([], {})
+        if not occurrences:
+            return {}
+        doc_ids = json.dumps(sorted(occurrences))
+        results = {}
+        if case_sensitive:
+            compiled = compile_keywords(keywords, case_sensitive, normalization=_NORMALIZATION)
+            rows = self._conn.execute(
+                "SELECT path, content FROM documents WHERE id IN (SELECT value FROM json_each(?)) ORDER BY id",
+                (doc_ids,)
+            )
+            for path, content in rows:
+                matches, _ = search_compiled(zlib.decompress(content).decode('utf-8'), compiled, as_store=as_store)
+                if matches:
+                    results[path] = matches
+            return results
+
+        # 与 search_keywords 相同的顺序：按位置，同一位置按关键词顺序
+        rank = {keyword: i for i, keyword in enumerate(keywords)}
+        rows = self._conn.execute(
+            "SELECT id, path, offsets FROM documents WHERE id IN (SELECT value FROM json_each(?)) ORDER BY id",
+            (doc_ids,)
+        )
+        for doc_id, path, offsets in rows:
+            matches = [
+                {'start': start, 'end': end, 'keyword': keyword, 'type': 'exact'}
+                for start, end, index in occurrences[doc_id]
+                for keyword in patterns[index][1]
+            ]
+            matches.sort(key=lambda x: (x['start'], rank[x['keyword']]))
+            _unpack_offsets(offsets).map_matches(matches)
+            results[path] = MatchStore.from_matches(matches, keywords) if as_store else matches
+        return results
+
+    def stats(self):
+        """文稿数、正文总字符数、索引项数与倒排表条目数"""
+        documents, characters = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM documents"
+        ).fetchone()
+        return {
+            'documents': documents,
+            'characters': characters,
+            'grams': self._conn.execute("SELECT COUNT(*) FROM grams").fetchone()[0],
+            'postings': self._conn.execute("SELECT COUNT(*) FROM postings").fetchone()[0]
+        }
@@ -0,0 +1,315 @@
+import atexit
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+# 共享存储的内存预算（字节）与溢出目录，同一服务器上的所有会话共用
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def content_key(kind, value):
+    """按内容计算条目的键，value 为字符串、字节串或字符串序列（如关键词列表）"""
+    digest = hashlib.sha256(kind.encode('utf-8') + b'\0')
+    if isinstance(value, str):
+        digest.update(value.encode('utf-8', 'surrogatepass'))
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        digest.update(value)
+    else:
+        for item in value:
+            item = str(item).encode('utf-8', 'surrogatepass')
+            digest.update(b'%d:' % len(item) + item)
+    return f"{kind}-{digest.hexdigest()}"
+
+
+def derived_key(kind, *parts):
+    """由其他键和参数派生条目的键（如某个文稿在某组关键词和选项下的搜索结果）"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{kind}-{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+def estimate_size(value):
+    """估算条目占用的内存字节数；对象有 nbytes() 方法时使用它"""
+    nbytes = getattr(value, 'nbytes', None)
+    if callable(nbytes):
+        return nbytes()
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(map(estimate_size, value))
+    return sys.getsizeof(value)
+
+
+class StoreRef:
+    """存储中条目的引用：显式 release 或被回收（如会话结束）时引用计数减一"""
+
+    __slots__ = ('key', '_store', '_finalizer', '__weakref__')
+
+    def __init__(self, store, key, pinned=False):
+        self.key = key
+        self._store = store
+        self._finalizer = weakref.finalize(self, store.release, key, pinned)
+
+    def get(self):
+        return self._store.get(self.key)
+
+    def release(self):
+        self._finalizer()
+
+
+class _Entry:
+    __slots__ = ('value', 'size', 'kind', 'refs', 'pins', 'holds', 'path')
+
+    def __init__(self, value, size, kind, holds=()):
+        self.value = value
+        self.size = size
+        self.kind = kind
+        self.refs = 0
+        # 钉住本条目的引用与条目数；本条目的值持有的其他条目
+        self.pins = 0
+        self.holds = holds
+        # 溢出文件；载入内存后保留，再次溢出时不必重写
+        self.path = None
+
+
+class DocumentStore:
+    """服务器内共享的内容寻址存储：相同的文稿、资产列表、搜索结果和渲染结果只保存一份
+
+    会话只持有引用（StoreRef），引用计数归零的条目仍作为缓存保留。内存中条目的总大小
+    超过预算 max_bytes 时按最近使用顺序腾出空间：先丢弃没有引用的条目；仍超出时把有引用的
+    条目写入溢出目录 spill_dir，再次读取时载入。没有溢出目录时有引用的条目留在内存中。
+    被钉住的条目不溢出：后台搜索任务等仍在使用其值时用 pin 取得引用，缓存的值持有其他条目的值时
+    （如增量搜索状态持有文稿）存入时用 holds 声明。这时溢出腾不出内存，再次读取反而载入第二份，
+    因此继续计入内存用量。
+    键由 content_key 或 derived_key 生成。存入的值在会话之间共享，调用方不应原地修改。
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, spill_dir=None):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.stats_counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'spills': 0, 'loads': 0}
+        self._entries = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.RLock()
+
+    def put(self, key, value, kind='document', size=None, holds=()):
+        """存入条目并返回存储中的值；键已存在时返回已有的值，调用方改用它即可不保存第二份
+
+        size 为占用的字节数，省略时由 estimate_size 估算。holds 为值中持有的其他条目的键，
+        本条目留在存储中期间钉住它们。
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                holds = tuple(self._entries[held] for held in holds if held in self._entries)
+                entry = _Entry(value, estimate_size(value) if size is None else size, kind, holds)
+                for held in holds:
+                    held.pins += 1
+                self._entries[key] = entry
+                self._memory_bytes += entry.size
+            else:
+                self._entries.move_to_end(key)
+                if entry.value is None:
+                    # 已溢出到磁盘：直接用传入的值，不必再读文件
+                    entry.value = value
+                    self._memory_bytes += entry.size
+                elif entry.value is value:
+                    # 同一对象再次存入（如增量搜索的中间结果增长后），重新估算大小
+                    new_size = estimate_size(value) if size is None else size
+                    self._memory_bytes += new_size - entry.size
+                    entry.size = new_size
+            self._enforce(keep=key)
+            return entry.value
+
+    def share(self, key, value, kind='document', size=None):
+        """存入条目并返回它的引用"""
+        with self._lock:
+            self.put(key, value, kind, size)
+            return self.acquire(key)
+
+    def acquire(self, key, pinned=False):
+        """取得已有条目的引用（引用计数加一），条目不存在时返回 None
+
+        pinned 为真时引用释放之前条目不溢出（已溢出的条目先载入内存）。
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if pinned and self.get(key) is None:
+                return None
+            entry.refs += 1
+            entry.pins += pinned
+            return StoreRef(self, key, pinned)
+
+    def pin(self, key):
+        """取得钉住条目的引用，用于存储以外仍在使用其值的对象（如后台搜索任务使用的文稿）"""
+        return self.acquire(key, pinned=True)
+
+    def release(self, key, pinned=False):
+        """引用计数减一；没有引用后溢出文件随即删除（只在磁盘上的条目一并删除）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.refs == 0:
+                return
+            entry.refs -= 1
+            if pinned and entry.pins:
+                entry.pins -= 1
+            if entry.refs == 0 and entry.value is None:
+                self._remove(key)
+            elif entry.refs == 0 and entry.path is not None:
+                # 没有引用的条目超出预算时直接丢弃，不再溢出
+                self._discard_file(entry)
+
+    def get(self, key, default=None):
+        """读取条目（已溢出的条目重新载入内存），不存在时返回 default"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats_counters['misses'] += 1
+                return default
+            self._entries.move_to_end(key)
+            self.stats_counters['hits'] += 1
+            if entry.value is None:
+                try:
+                    with open(entry.path, 'rb') as f:
+                        entry.value = pickle.load(f)
+                except (OSError, pickle.UnpicklingError, EOFError):
+                    self._remove(key)
+                    return default
+                self._memory_bytes += entry.size
+                self.stats_counters['loads'] += 1
+                self._enforce(keep=key)
+            return entry.value
+
+    def _enforce(self, keep=None):
+        """按最近使用顺序腾出空间：先丢弃没有引用的条目，再溢出有引用的条目"""
+        if self.max_bytes is None:
+            return
+        for spill in (False, True):
+            if spill and not self.spill_dir:
+                return
+            for key in list(self._entries):
+                if self._memory_bytes <= self.max_bytes:
+                    return
+                entry = self._entries[key]
+                if key == keep or entry.value is None:
+                    continue
+                if not entry.refs:
+                    self._remove(key)
+                    self.stats_counters['evictions'] += 1
+                elif spill and not entry.pins:
+                    self._spill(key, entry)
+
+    def _spill(self, key, entry):
+        if entry.path is None:
+            path = None
+            try:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                fd, path = tempfile.mkstemp(dir=self.spill_dir, prefix=f"{key}-", suffix='.pkl')
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(entry.value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            except (OSError, pickle.PicklingError, TypeError, AttributeError):
+                # 不能序列化或写不进溢出目录（磁盘已满、没有权限等）的条目留在内存中
+                if path is not None:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                return
+            entry.path = path
+        entry.value = None
+        self._memory_bytes -= entry.size
+        self.stats_counters['spills'] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        if entry.value is not None:
+            self._memory_bytes -= entry.size
+        self._discard_file(entry)
+        for held in entry.holds:
+            held.pins -= 1
+
+    @staticmethod
+    def _discard_file(entry):
+        if entry.path is not None:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+            entry.path = None
+
+    def resize(self, max_bytes=None, spill_dir=None):
+        """调整内存预算（字节）与溢出目录（空字符串表示关闭溢出）"""
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if spill_dir is not None:
+                self.spill_dir = spill_dir or None
+            self._enforce()
+
+    def clear(self):
+        """删除全部条目及溢出文件；仍持有的引用之后读取到 None"""
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+            for name in self.stats_counters:
+                self.stats_counters[name] = 0
+
+    def stats(self):
+        """当前用量：条目数、引用数、内存与溢出字节数、命中统计，以及按种类的明细"""
+        with self._lock:
+            kinds = {}
+            for entry in self._entries.values():
+                usage = kinds.setdefault(entry.kind, {
+                    'entries': 0, 'references': 0, 'memory_bytes': 0, 'spilled_bytes': 0
+                })
+                usage['entries'] += 1
+                usage['references'] += entry.refs
+                usage['memory_bytes' if entry.value is not None else 'spilled_bytes'] += entry.size
+            return {
+                'entries': len(self._entries),
+                'references': sum(usage['references'] for usage in kinds.values()),
+                'memory_bytes': self._memory_bytes,
+                'max_bytes': self.max_bytes,
+                'spilled_entries': sum(entry.value is None for entry in self._entries.values()),
+                'spilled_bytes': sum(usage['spilled_bytes'] for usage in kinds.values()),
+                'spill_dir': self.spill_dir,
+                **self.stats_counters,
+                'kinds': kinds
+            }
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+# 进程内共享（同一服务器上的所有会话共用）的存储
+shared_store = DocumentStore(
+    max_bytes=int(os.environ.get('TEXT_ASSET_STORE_BYTES', DEFAULT_MAX_BYTES)),
+    spill_dir=os.environ.get('TEXT_ASSET_STORE_DIR') or None
+)
+# 退出时删除溢出文件
+atexit.register(shared_store.clear)
+
+
+def configure_document_store(max_bytes=None, spill_dir=None):
+    """调整共享存储的内存预算（字节）与溢出目录（空字符串表示关闭溢出）"""
+    shared_store.resize(max_bytes, spill_dir)
+
+
+def clear_document_store():
+    """清空共享存储"""
+    shared_store.clear()
+
+
+def document_store_stats():
+    """共享存储的当前用量与命中统计"""
+    return shared_store.stats()
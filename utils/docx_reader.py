@@ -0,0 +1,298 @@
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from array import array
+from bisect import bisect_right
+
+_W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+_MC_NS = 'http://schemas.openxmlformats.org/markup-compatibility/2006'
+_W = '{' + _W_NS + '}'
+_MC_FALLBACK = '{' + _MC_NS + '}Fallback'
+_RELATIONSHIP = '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'
+
+_P = _W + 'p'
+_R = _W + 'r'
+_T = _W + 't'
+_BR = _W + 'br'
+_BR_TYPE = _W + 'type'
+# 与 python-docx 的 Run.text 相同：制表符、换行与不间断连字符转换为对应字符
+_RUN_CHARS = {
+    'tab': '\t',
+    'ptab': '\t',
+    'cr': '\n',
+    'noBreakHyphen': '-',
+}
+_RUN_CHAR_TAGS = {_W + name: char for name, char in _RUN_CHARS.items()}
+
+# 正文之后依次读取的部分（关系类型名）；批注等不属于文稿内容，不读取
+DOCX_PART_KINDS = ('body', 'header', 'footer', 'footnotes', 'endnotes')
+
+# 流式读取解压后 XML 的块大小（字节）
+XML_CHUNK_SIZE = 1024 * 1024
+
+_XML_ENTITIES = {b'lt': b'<', b'gt': b'>', b'amp': b'&', b'quot': b'"', b'apos': b"'"}
+_ENTITY = re.compile(rb'&(#x[0-9a-fA-F]+|#[0-9]+|\w+);')
+_ROOT_TAG = re.compile(rb'<[^?!][^>]*>')
+_FOREIGN_ENCODING = re.compile(rb'<\?xml[^>]*encoding\s*=\s*["\'](?!utf-8["\'])', re.I)
+
+
+class _UnsupportedMarkup(Exception):
+    """快速扫描无法可靠处理的写法（非 UTF-8 编码、CDATA、非根元素上声明的命名空间等）"""
+
+
+def _iter_paragraphs_parsed(stream):
+    """用 ElementTree 增量解析一个部件，按文档顺序产生段落文本"""
+    # 嵌套段落（文本框）各自的文本片段
+    stack = []
+    fallback = 0
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        tag = elem.tag
+        if event == 'start':
+            if tag == _P:
+                stack.append([])
+            elif tag == _MC_FALLBACK:
+                fallback += 1
+            continue
+        if tag == _R:
+            if stack and not fallback:
+                pieces = stack[-1]
+                for child in elem:
+                    child_tag = child.tag
+                    if child_tag == _T:
+                        if child.text:
+                            pieces.append(child.text)
+                    elif child_tag in _RUN_CHAR_TAGS:
+                        pieces.append(_RUN_CHAR_TAGS[child_tag])
+                    elif child_tag == _BR and child.get(_BR_TYPE, 'textWrapping') == 'textWrapping':
+                        # 分页符、分栏符不产生字符
+                        pieces.append('\n')
+            elem.clear()
+        elif tag == _P:
+            pieces = stack.pop()
+            if not fallback:
+                yield ''.join(pieces)
+            elem.clear()
+        elif tag == _MC_FALLBACK:
+            fallback -= 1
+
+
+def _namespace_prefix(root_tag, namespace):
+    """根元素上为 namespace 声明的前缀（如 b'w:'，默认命名空间为 b''），未声明时返回 None"""
+    match = re.search(
+        rb'\sxmlns(?::([\w.-]+))?\s*=\s*["\']' + re.escape(namespace.encode('ascii')) + rb'["\']', root_tag
+    )
+    if match is None:
+        return None
+    return match.group(1) + b':' if match.group(1) else b''
+
+
+def _replace_entity(match):
+    name = match.group(1)
+    if name[:2] == b'#x':
+        return chr(int(name[2:], 16)).encode('utf-8')
+    if name[:1] == b'#':
+        return chr(int(name[1:])).encode('utf-8')
+    return _XML_ENTITIES.get(name, match.group(0))
+
+
+def _scan_paragraphs(stream, chunk_size=XML_CHUNK_SIZE):
+    """按块扫描一个部件的 XML，返回段落文本列表，结果与 _iter_paragraphs_parsed 相同
+
+    只用正则表达式定位 w:t 的文本以及段落、制表符、换行等少数标记，不为其余
+    元素（格式、修订标记等）创建对象；每块在最后一个 '<' 处切开，标签和文本
+    都不会被截断。遇到无法可靠处理的写法时抛出 _UnsupportedMarkup。
+    """
+    data = stream.read(chunk_size)
+    root = _ROOT_TAG.search(data)
+    while root is None:
+        more = stream.read(chunk_size)
+        if not more:
+            break
+        data += more
+        root = _ROOT_TAG.search(data)
+    if root is None or _FOREIGN_ENCODING.match(data) or data.startswith((b'\xff\xfe', b'\xfe\xff')):
+        raise _UnsupportedMarkup('encoding')
+    w = _namespace_prefix(root.group(), _W_NS)
+    mc = _namespace_prefix(root.group(), _MC_NS)
+    if not w:
+        # 未在根元素声明或为默认命名空间（属性不带前缀，含义不同）
+        raise _UnsupportedMarkup('namespace')
+    names = {w + name.encode('ascii'): name for name in ('p', 'tabs', 'br') + tuple(_RUN_CHARS)}
+    tags = rb'/?' + re.escape(w) + rb'(?:p|tabs|tab|ptab|br|cr|noBreakHyphen)\b[^>]*'
+    if mc is not None:
+        names[mc + b'Fallback'] = 'Fallback'
+        tags += rb'|/?' + re.escape(mc) + rb'Fallback\b[^>]*'
+    # 第一组为 w:t 的文本（自闭合的空 w:t 不匹配），第二组为其余关心的标记
+    pattern = re.compile(rb'<(?:' + re.escape(w) + rb't(?:\s[^>]*[^/>])?>([^<]*)|(' + tags + rb')>)')
+    br_type_attribute = re.compile(rb'\s' + re.escape(w) + rb'type\s*=\s*["\']([^"\']*)')
+
+    paragraphs = []
+    stack = []
+    fallback = 0
+    tab_stops = 0
+    rest = b''
+    while data:
+        buffer = rest + data
+        data = stream.read(chunk_size)
+        if data:
+            cut = max(buffer.rfind(b'<'), 0)
+            segment, rest = buffer[:cut], buffer[cut:]
+        else:
+            segment, rest = buffer, b''
+        if b'<!' in segment:
+            # 注释、CDATA 或 DOCTYPE
+            raise _UnsupportedMarkup('markup declaration')
+        for text, tag in pattern.findall(segment):
+            if not tag:
+                if stack and not fallback:
+                    stack[-1].append(text)
+                continue
+            closing = tag[:1] == b'/'
+            self_closing = tag[-1:] == b'/'
+            name = names[tag.lstrip(b'/').split(None, 1)[0].rstrip(b'/')]
+            if name == 'p':
+                if closing:
+                    pieces = stack.pop()
+                    if not fallback:
+                        paragraphs.append(b''.join(pieces))
+                elif self_closing:
+                    if not fallback:
+                        paragraphs.append(b'')
+                else:
+                    stack.append([])
+            elif name == 'Fallback':
+                if not self_closing:
+                    fallback += -1 if closing else 1
+            elif name == 'tabs':
+                # 段落格式中的制表位，其中的 w:tab 不是字符
+                if not self_closing:
+                    tab_stops += -1 if closing else 1
+            elif closing or not stack or fallback or (name == 'tab' and tab_stops):
+                continue
+            elif name == 'br':
+                br_type = br_type_attribute.search(tag)
+                if br_type is None or br_type.group(1) == b'textWrapping':
+                    stack[-1].append(b'\n')
+            else:
+                stack[-1].append(_RUN_CHARS[name].encode('ascii'))
+    if stack:
+        raise _UnsupportedMarkup('unbalanced paragraphs')
+    return [
+        (_ENTITY.sub(_replace_entity, paragraph) if b'&' in paragraph else paragraph).decode('utf-8')
+        for paragraph in paragraphs
+    ]
+
+
+def read_part_paragraphs(zf, name):
+    """读取压缩包中一个部件的全部段落文本（正文、页眉、页脚或脚注）
+
+    表格单元格中的每个段落各自成为一段；文本框中的段落排在所在段落之前；
+    兼容性标记（mc:Fallback）中的重复内容被跳过。先用快速扫描，
+    遇到少见写法时改用 ElementTree 增量解析，两者结果相同。
+    """
+    try:
+        with zf.open(name) as stream:
+            return _scan_paragraphs(stream)
+    except _UnsupportedMarkup:
+        with zf.open(name) as stream:
+            return list(_iter_paragraphs_parsed(stream))
+
+
+def _relationships(zf, names, part):
+    """读取部件的关系，返回 [(关系类型名, 目标部件名)]"""
+    directory, name = posixpath.split(part)
+    rels_name = posixpath.join(directory, '_rels', name + '.rels')
+    if rels_name not in names:
+        return []
+    relationships = []
+    with zf.open(rels_name) as f:
+        for elem in ET.parse(f).getroot().iter(_RELATIONSHIP):
+            if elem.get('TargetMode') == 'External':
+                continue
+            target = elem.get('Target', '')
+            if target.startswith('/'):
+                target = target[1:]
+            else:
+                target = posixpath.normpath(posixpath.join(directory, target))
+            relationships.append((elem.get('Type', '').rsplit('/', 1)[-1], target))
+    return relationships
+
+
+def _natural_key(name):
+    """header2.xml 排在 header10.xml 之前"""
+    stem = name.rsplit('.', 1)[0]
+    digits = len(stem) - len(stem.rstrip('0123456789'))
+    return stem[:len(stem) - digits], int(stem[len(stem) - digits:] or 0), name
+
+
+def docx_parts(zf):
+    """按 DOCX_PART_KINDS 的顺序返回需要读取的部件 [(部件名, 种类)]"""
+    names = set(zf.namelist())
+    document = next(
+        (target for kind, target in _relationships(zf, names, '') if kind == 'officeDocument'),
+        'word/document.xml'
+    )
+    if document not in names:
+        raise ValueError("Not a Word document: main document part not found")
+    found = {}
+    for kind, target in _relationships(zf, names, document):
+        if kind in DOCX_PART_KINDS and target in names:
+            found.setdefault(kind, set()).add(target)
+    parts = [(document, 'body')]
+    for kind in DOCX_PART_KINDS[1:]:
+        parts.extend((name, kind) for name in sorted(found.get(kind, ()), key=_natural_key))
+    return parts
+
+
+class DocxText:
+    """.docx 的文本与偏移映射
+
+    text 为正文段落（含表格）之后依次接页眉、页脚、脚注和尾注的段落，段落之间以换行分隔；
+    paragraph_starts 为每个段落在 text 中的起点；parts 为 [(部件名, 种类, 起点, 终点)]。
+    """
+
+    def __init__(self, text, paragraph_starts, parts):
+        self.text = text
+        self.paragraph_starts = paragraph_starts
+        self.parts = parts
+        self._part_starts = [start for _, _, start, _ in parts]
+
+    def locate(self, offset):
+        """返回偏移所在的 {'part': 部件名, 'kind': 种类, 'paragraph': 段落序号}"""
+        if not 0 <= offset < len(self.text):
+            raise IndexError(offset)
+        name, kind, _, _ = self.parts[bisect_right(self._part_starts, offset) - 1]
+        return {
+            'part': name,
+            'kind': kind,
+            'paragraph': bisect_right(self.paragraph_starts, offset) - 1
+        }
+
+
+def extract_docx(source):
+    """从 .docx 提取全部文本（source 为文件路径或二进制文件对象）
+
+    直接从压缩包中流式解压并扫描 XML，不构建 python-docx 的对象模型。正文中的空段落
+    保留（与按段落读取的结果一致），页眉、页脚和脚注中的空段落（如脚注分隔线）跳过。
+    """
+    paragraphs = []
+    paragraph_starts = array('q')
+    parts = []
+    position = 0
+    with zipfile.ZipFile(source) as zf:
+        for name, kind in docx_parts(zf):
+            part_start = None
+            for paragraph in read_part_paragraphs(zf, name):
+                if kind != 'body' and not paragraph:
+                    continue
+                if paragraphs:
+                    position += 1
+                if part_start is None:
+                    part_start = position
+                paragraphs.append(paragraph)
+                paragraph_starts.append(position)
+                position += len(paragraph)
+            if part_start is not None:
+                parts.append((name, kind, part_start, position))
+    return DocxText('\n'.join(paragraphs), paragraph_starts, parts)
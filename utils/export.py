@@ -0,0 +1,269 @@
+import csv
+import io
+import os
+import re
+import zipfile
+from contextlib import contextmanager
+from xml.sax.saxutils import escape
+
+from utils.instrumentation import span
+from utils.match_store import MatchStore
+from utils.search_engine import highlight_spans, highlight_text
+
+# 导出格式：csv/xlsx 为匹配表，html/docx 为标注后的文稿
+EXPORT_FORMATS = ('csv', 'xlsx', 'html', 'docx')
+EXPORT_MIME_TYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'html': 'text/html',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+}
+
+# 匹配表的列
+MATCH_COLUMNS = ('index', 'keyword', 'type', 'similarity', 'start', 'end', 'line', 'text', 'context')
+
+# 上下文片段在匹配前后各取的字符数
+CONTEXT_CHARS = 30
+
+# 标注文稿每次写出的最大字符数
+EXPORT_PIECE_SIZE = 64 * 1024
+
+# Excel 单个工作表的行数上限（含表头），超出时续写到新的工作表
+XLSX_MAX_ROWS = 1048576
+
+# .docx 中精确匹配与模糊匹配的突出显示颜色（Word 的突出显示只有固定的几种颜色）
+DOCX_HIGHLIGHT_COLORS = {True: 'yellow', False: 'cyan'}
+
+_WHITESPACE = re.compile(r'\s+')
+# XML 1.0 不允许的控制字符
+_XML_ILLEGAL = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_HTML_HEAD = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+    body {{ font-family: sans-serif; margin: 2em; }}
+    .highlight-exact {{ background-color: yellow; font-weight: bold; }}
+    .highlight-fuzzy {{ background-color: orange; font-weight: bold; }}
+    .summary {{ border-collapse: collapse; margin-bottom: 1.5em; }}
+    .summary td, .summary th {{ border: 1px solid #ddd; padding: 2px 8px; }}
+    .document {{ white-space: pre-wrap; line-height: 1.6; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<p><span class="highlight-exact">精确匹配</span> <span class="highlight-fuzzy">模糊匹配</span></p>
+'''
+
+_DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+_DOCX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+_DOCX_DOCUMENT_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+    '<w:body><w:p>'
+)
+_DOCX_DOCUMENT_END = '</w:p><w:sectPr/></w:body></w:document>'
+
+
+def export_format(path):
+    """按文件扩展名确定导出格式"""
+    fmt = os.path.splitext(path)[1].lower().lstrip('.')
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt or path}")
+    return fmt
+
+
+def _keyword_counts(matches):
+    if isinstance(matches, MatchStore):
+        return {keyword: n for keyword, n in matches.counts().items() if n}
+    counts = {}
+    for match in matches:
+        counts[match['keyword']] = counts.get(match['keyword'], 0) + 1
+    return counts
+
+
+def _snippet(text):
+    return _WHITESPACE.sub(' ', text)
+
+
+def iter_match_rows(text, matches, context=CONTEXT_CHARS):
+    """逐个产出匹配表的行（列见 MATCH_COLUMNS），不在内存中保存整张表
+
+    行号从 1 开始，按匹配顺序增量计算（matches 按位置排序时全文只扫描一遍）；
+    上下文为匹配前后各 context 个字符，匹配本身用【】标出，连续空白合并为一个空格。
+    """
+    line = 1
+    line_pos = 0
+    for i, match in enumerate(matches):
+        start, end = match['start'], match['end']
+        if start < line_pos:
+            line, line_pos = 1, 0
+        line += text.count('\n', line_pos, start)
+        line_pos = start
+        matched = text[start:end]
+        snippet = (
+            _snippet(text[max(0, start - context):start]) + '【' + _snippet(matched) + '】'
+            + _snippet(text[end:end + context])
+        )
+        yield (
+            i, match['keyword'], match['type'], match.get('similarity', ''), start, end, line, matched, snippet
+        )
+
+
+def write_matches_csv(text, matches, out, context=CONTEXT_CHARS):
+    """把匹配表逐行写入文本流 out（CSV）"""
+    writer = csv.writer(out)
+    writer.writerow(MATCH_COLUMNS)
+    writer.writerows(iter_match_rows(text, matches, context))
+
+
+def write_matches_xlsx(text, matches, out, context=CONTEXT_CHARS):
+    """把匹配表写入 .xlsx（openpyxl 只写模式，逐行落盘），out 为路径或二进制流
+
+    另有“关键词”工作表列出每个关键词的匹配次数。
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    workbook = Workbook(write_only=True)
+    sheet = None
+    rows = XLSX_MAX_ROWS
+    counts = {}
+    for row in iter_match_rows(text, matches, context):
+        if rows >= XLSX_MAX_ROWS:
+            sheet = workbook.create_sheet('匹配' if sheet is None else f'匹配{len(workbook.worksheets) + 1}')
+            sheet.append(MATCH_COLUMNS)
+            rows = 1
+        keyword = row[1]
+        counts[keyword] = counts.get(keyword, 0) + 1
+        # 精确匹配没有相似度，留空单元格
+        sheet.append([
+            (ILLEGAL_CHARACTERS_RE.sub('', value) or None) if isinstance(value, str) else value for value in row
+        ])
+        rows += 1
+    if sheet is None:
+        workbook.create_sheet('匹配').append(MATCH_COLUMNS)
+
+    summary = workbook.create_sheet('关键词')
+    summary.append(('keyword', 'count'))
+    for keyword in sorted(counts, key=lambda k: (-counts[k], k)):
+        summary.append((ILLEGAL_CHARACTERS_RE.sub('', keyword), counts[keyword]))
+    workbook.save(out)
+
+
+def write_annotated_html(text, matches, out, title='标注文稿'):
+    """把高亮标注后的完整 HTML 文稿逐段写入文本流 out
+
+    开头列出每个关键词的匹配次数；高亮与应用中的显示相同，保留原文换行。
+    """
+    counts = _keyword_counts(matches)
+    out.write(_HTML_HEAD.format(title=escape(title)))
+    out.write('<table class="summary"><tr><th>关键词</th><th>次数</th></tr>\n')
+    for keyword in sorted(counts, key=lambda k: (-counts[k], k)):
+        out.write(f'<tr><td>{escape(keyword)}</td><td>{counts[keyword]}</td></tr>\n')
+    out.write('</table>\n<div class="document">')
+    highlight_text(text, matches, EXPORT_PIECE_SIZE, out=out, chunk_break='')
+    out.write('</div>\n</body>\n</html>\n')
+
+
+def _write_docx_runs(out, text, start, end, run_start):
+    """写出 text[start:end]：每段换行开始新段落，制表符写为 w:tab"""
+    while start < end:
+        piece_end = min(end, start + EXPORT_PIECE_SIZE)
+        newline = text.find('\n', start, piece_end)
+        if newline != -1:
+            piece_end = newline
+        piece = _XML_ILLEGAL.sub('', text[start:piece_end]).replace('\r', '')
+        if piece:
+            out.write(run_start)
+            out.write('<w:t xml:space="preserve">')
+            out.write(escape(piece).replace('\t', '</w:t><w:tab/><w:t xml:space="preserve">'))
+            out.write('</w:t></w:r>')
+        if newline != -1:
+            out.write('</w:p><w:p>')
+            piece_end += 1
+        start = piece_end
+
+
+def write_annotated_docx(text, matches, out):
+    """把高亮标注后的文稿写成 .docx，out 为路径或二进制流
+
+    直接把 WordprocessingML 逐段写入压缩包，不在内存中构建文档树。原文每行一个段落，
+    精确匹配与模糊匹配分别以 DOCX_HIGHLIGHT_COLORS 中的颜色加粗突出显示。
+    """
+    runs = {
+        None: '<w:r>',
+        True: f'<w:r><w:rPr><w:b/><w:highlight w:val="{DOCX_HIGHLIGHT_COLORS[True]}"/></w:rPr>',
+        False: f'<w:r><w:rPr><w:b/><w:highlight w:val="{DOCX_HIGHLIGHT_COLORS[False]}"/></w:rPr>'
+    }
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _DOCX_CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _DOCX_RELS)
+        with archive.open('word/document.xml', 'w') as part:
+            document = io.TextIOWrapper(part, encoding='utf-8')
+            document.write(_DOCX_DOCUMENT_START)
+            pos = 0
+            for start, end, exact in highlight_spans(matches):
+                _write_docx_runs(document, text, pos, start, runs[None])
+                _write_docx_runs(document, text, start, end, runs[exact])
+                pos = end
+            _write_docx_runs(document, text, pos, len(text), runs[None])
+            document.write(_DOCX_DOCUMENT_END)
+            document.flush()
+            document.detach()
+
+
+@contextmanager
+def _text_stream(out, encoding):
+    """路径或二进制流上的文本流；二进制流在结束后保持打开"""
+    if isinstance(out, str):
+        with open(out, 'w', encoding=encoding, newline='') as stream:
+            yield stream
+        return
+    stream = io.TextIOWrapper(out, encoding=encoding, newline='')
+    try:
+        yield stream
+        stream.flush()
+    finally:
+        stream.detach()
+
+
+def export_results(text, matches, out, fmt=None, context=CONTEXT_CHARS, title='标注文稿'):
+    """导出搜索结果：csv/xlsx 为匹配表，html/docx 为标注后的文稿
+
+    out 为文件路径或二进制流；fmt 为空时按路径的扩展名确定。matches 可以是匹配字典
+    列表或 MatchStore。全程流式写出，匹配很多的长文稿也不会在内存中拼出完整结果。
+    CSV 带 BOM，便于 Excel 直接打开中文内容。
+    """
+    if fmt is None:
+        fmt = export_format(out)
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    with span('export', format=fmt, matches=len(matches)):
+        if fmt == 'xlsx':
+            write_matches_xlsx(text, matches, out, context)
+        elif fmt == 'docx':
+            write_annotated_docx(text, matches, out)
+        else:
+            with _text_stream(out, 'utf-8-sig' if fmt == 'csv' else 'utf-8') as stream:
+                if fmt == 'csv':
+                    write_matches_csv(text, matches, stream, context)
+                else:
+                    write_annotated_html(text, matches, stream, title)
@@ -1,45 +1,67 @@
-import pandas as pd
-from docx import Document
+import csv
+import hashlib
+import importlib
 import os
 import io
+import sys
+
+from utils.cache import LRUCache
+from utils.docx_reader import extract_docx
+from utils.instrumentation import span
+from utils.text_encoding import decode_text, detect_encoding, iter_decoded
+
+# 解析结果缓存：按文件内容哈希 + 扩展名 + 读取函数 + 选项缓存，总大小有上限，LRU 淘汰
+_parse_cache = LRUCache(
+    max_entries=int(os.environ.get('TEXT_ASSET_PARSE_CACHE_ENTRIES', 32)),
+    max_bytes=int(os.environ.get('TEXT_ASSET_PARSE_CACHE_BYTES', 256 * 1024 * 1024))
+)
+
+# 资产列表支持的格式，其余已注册的格式作为文稿读取
+ASSET_EXTENSIONS = ('.xlsx', '.csv')
+
+# 读取器注册表：扩展名 -> 读取函数或 'module:function' 字符串（首次读取该格式时才导入）
+_readers = {}
 
 
 def read_text_content(content):
-    """从字节内容读取文本"""
-    return content.decode('utf-8')
+    """从字节内容读取文本（content 可以是 bytes 或 memoryview），自动识别编码"""
+    return decode_text(content)[0]
 
 
 def read_docx_content(content):
-    """从字节内容读取Word文档"""
-    doc = Document(io.BytesIO(content))
-    full_text = []
-    for para in doc.paragraphs:
-        full_text.append(para.text)
-    return '\n'.join(full_text)
+    """从字节内容读取Word文档（含表格、页眉页脚和脚注，见 extract_docx）"""
+    return extract_docx(io.BytesIO(content)).text
 
 
 def read_spreadsheet_content(content):
     """从字节内容读取Excel或CSV"""
+    import pandas as pd
     return pd.read_excel(io.BytesIO(content))
 
 
 def read_text_file(file_path):
-    """读取文本文件"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return f.read()
+    """读取文本文件，自动识别编码"""
+    with open(file_path, 'rb') as f:
+        return read_text_content(f.read())
+
+
+def iter_text_file_chunks(file_path, chunk_size=1024 * 1024, encoding=None):
+    """按约 chunk_size 字节分块读取并增量解码文本文件，不把整个文件读入内存
+
+    encoding 为空时根据文件开头自动识别编码。
+    """
+    with open(file_path, 'rb') as f:
+        yield from iter_decoded(iter(lambda: f.read(chunk_size), b''), encoding)
 
 
 def read_docx_file(file_path):
-    """读取Word文档"""
-    doc = Document(file_path)
-    full_text = []
-    for para in doc.paragraphs:
-        full_text.append(para.text)
-    return '\n'.join(full_text)
+    """读取Word文档（含表格、页眉页脚和脚注，见 extract_docx）"""
+    return extract_docx(file_path).text
 
 
 def read_spreadsheet_file(file_path):
     """读取Excel或CSV文件"""
+    import pandas as pd
     ext = os.path.splitext(file_path)[1].lower()
     if ext == '.xlsx':
         return pd.read_excel(file_path)
@@ -49,30 +71,235 @@ def read_spreadsheet_file(file_path):
         raise ValueError("Unsupported spreadsheet format")
 
 
+def _result_size(result):
+    """估算解析结果占用的内存字节数"""
+    # 没有读取过表格时 pandas 不会被导入，也就不可能是 DataFrame
+    pd = sys.modules.get('pandas')
+    if pd is not None and isinstance(result, pd.DataFrame):
+        return int(result.memory_usage(deep=True).sum())
+    if isinstance(result, list):
+        return sys.getsizeof(result) + sum(map(sys.getsizeof, result))
+    if isinstance(result, tuple):
+        return sum(map(_result_size, result))
+    return sys.getsizeof(result)
+
+
+def _reader_identity(reader):
+    """读取函数的标识：模块名 + 限定名 + id，同名函数和 lambda 不会混用缓存"""
+    name = getattr(reader, '__qualname__', type(reader).__qualname__)
+    return (getattr(reader, '__module__', None), name, id(reader))
+
+
+def _parse_cached(content, reader, reader_ext=None, **options):
+    """按内容哈希缓存解析结果，相同内容与选项不再重复解析
+
+    reader_ext 为读取函数在注册表中的扩展名，重新注册该扩展名时其缓存随即失效。
+    缓存结果在调用方之间共享，调用方不应原地修改返回的对象。
+    """
+    identity = _reader_identity(reader)
+    with span('parse', reader=identity[1], bytes=len(content)) as counters:
+        digest = hashlib.sha256(content).hexdigest()
+        key = (digest, reader_ext, identity, tuple(sorted(options.items())))
+        result = _parse_cache.get(key)
+        counters['cache_hit'] = result is not None
+        if result is None:
+            result = reader(content, **options)
+            _parse_cache.put(key, result, _result_size(result))
+        return result
+
+
+def _read_csv_content(content):
+    import pandas as pd
+    return pd.read_csv(io.BytesIO(content), encoding=detect_encoding(content))
+
+
+def _read_excel_content(content):
+    import pandas as pd
+    return pd.read_excel(io.BytesIO(content))
+
+
+def register_reader(ext, reader):
+    """注册（或替换）一种扩展名的读取器，用于接入 PDF、Markdown、HTML 等格式
+
+    reader 接受文件的字节内容（bytes 或 memoryview），返回文本；也可以是
+    'module:function' 形式的字符串，首次读取该格式时才导入对应模块。
+    """
+    ext = ext.lower()
+    if not ext.startswith('.'):
+        ext = '.' + ext
+    _readers[ext] = reader
+    # 旧读取器的解析结果作废（被回收的函数的 id 也可能被新函数复用）
+    _parse_cache.discard(lambda key: key[1] == ext)
+
+
+def get_reader(ext):
+    """返回扩展名对应的读取函数，必要时导入其模块"""
+    ext = ext.lower()
+    reader = _readers.get(ext)
+    if reader is None:
+        raise ValueError(f"Unsupported file format: {ext}")
+    if isinstance(reader, str):
+        module_name, _, name = reader.partition(':')
+        reader = getattr(importlib.import_module(module_name), name)
+        _readers[ext] = reader
+    return reader
+
+
+def supported_extensions():
+    """已注册的全部扩展名"""
+    return sorted(_readers)
+
+
+def document_extensions():
+    """可作为文稿读取的扩展名（不含资产列表格式）"""
+    return [ext for ext in supported_extensions() if ext not in ASSET_EXTENSIONS]
+
+
+# 内置格式的解析库（pandas、openpyxl）都在读取函数内按需导入
+register_reader('.txt', read_text_content)
+register_reader('.docx', read_docx_content)
+register_reader('.xlsx', _read_excel_content)
+register_reader('.csv', _read_csv_content)
+
+# 通过环境变量注册其他格式，如 TEXT_ASSET_READERS=".pdf=mypkg.pdf:read_pdf,.md=mypkg.md:read_markdown"
+for _entry in filter(None, os.environ.get('TEXT_ASSET_READERS', '').split(',')):
+    _ext, _, _spec = _entry.partition('=')
+    register_reader(_ext.strip(), _spec.strip())
+
+
 def read_file(file_path):
-    """根据文件扩展名调用相应的读取函数"""
+    """根据文件扩展名调用注册的读取函数（按文件内容缓存解析结果）"""
     ext = os.path.splitext(file_path)[1].lower()
-    if ext == '.txt':
-        return read_text_file(file_path)
-    elif ext == '.docx':
-        return read_docx_file(file_path)
-    elif ext in ['.xlsx', '.csv']:
-        return read_spreadsheet_file(file_path)
-    else:
-        raise ValueError(f"Unsupported file format: {ext}")
+    reader = get_reader(ext)
+    with span('read_file', ext=ext) as counters:
+        with open(file_path, 'rb') as f:
+            content = f.read()
+        counters['bytes'] = len(content)
+        return _parse_cached(content, reader, ext)
 
 
 def read_file_from_upload(uploaded_file):
-    """从Streamlit上传文件直接读取内容，无需创建临时文件"""
-    file_name = uploaded_file.name
+    """从Streamlit上传文件直接读取内容，无需创建临时文件
+
+    Streamlit 每次交互都会重新运行脚本，解析结果按文件内容哈希缓存，
+    重复运行时直接复用，不再重新解析。
+    """
+    ext = os.path.splitext(uploaded_file.name)[1].lower()
+    return _parse_cached(uploaded_file.getbuffer(), get_reader(ext), ext)
+
+
+def read_text_from_upload(uploaded_file):
+    """从上传的文本文件读取内容并识别编码，返回 (文本, 编码)"""
+    return _parse_cached(uploaded_file.getbuffer(), decode_text)
+
+
+def _asset_extension(file_name):
     ext = os.path.splitext(file_name)[1].lower()
-    content = uploaded_file.getbuffer()
-    
-    if ext == '.txt':
-        return content.decode('utf-8')
-    elif ext == '.docx':
-        return read_docx_content(content)
-    elif ext in ['.xlsx', '.csv']:
-        return pd.read_excel(io.BytesIO(content))
-    else:
-        raise ValueError(f"Unsupported file format: {ext}")
\ No newline at end of file
+    if ext not in ASSET_EXTENSIONS:
+        raise ValueError(f"Unsupported asset list format: {ext}")
+    return ext
+
+
+def _column_names(header):
+    """表头单元格转换为列名：空单元格命名为 Unnamed: i，重复的列名加 .1、.2 后缀（与 pandas 相同）"""
+    names = []
+    seen = {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None or str(value).strip() == '' else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        seen.setdefault(name, 0)
+        names.append(name)
+    return names
+
+
+def _cell_text(value):
+    """单元格的关键词文本；空单元格返回 None，整数值的浮点数不带 .0"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    text = str(value)
+    return text if text else None
+
+
+def _iter_asset_rows(content, ext):
+    """逐行读取资产列表的第一个工作表（或 CSV），不构建 DataFrame"""
+    if ext == '.csv':
+        with io.TextIOWrapper(io.BytesIO(content), encoding=detect_encoding(content), newline='') as f:
+            yield from csv.reader(f)
+        return
+    from openpyxl import load_workbook
+    # 只读模式按行流式解析，不把整个工作表载入内存
+    workbook = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _read_asset_columns_content(content, ext):
+    for header in _iter_asset_rows(content, ext):
+        return _column_names(header)
+    return []
+
+
+def _read_asset_keywords_content(content, ext, columns):
+    rows = _iter_asset_rows(content, ext)
+    names = _column_names(next(rows, ()))
+    missing = [col for col in columns if col not in names]
+    if missing:
+        raise ValueError(f"Columns not found in asset list: {', '.join(missing)}")
+    indices = sorted({names.index(col) for col in columns})
+    keywords = set()
+    for row in rows:
+        for i in indices:
+            if i < len(row):
+                text = _cell_text(row[i])
+                if text is not None:
+                    keywords.add(text)
+    return sorted(keywords)
+
+
+def read_asset_columns(file_path):
+    """只读取资产列表（.xlsx/.csv）的表头，返回列名列表"""
+    ext = _asset_extension(file_path)
+    with open(file_path, 'rb') as f:
+        content = f.read()
+    return _parse_cached(content, _read_asset_columns_content, ext=ext)
+
+
+def read_asset_keywords(file_path, columns):
+    """只读取资产列表中指定列的非空单元格，返回去重排序后的关键词列表"""
+    ext = _asset_extension(file_path)
+    with open(file_path, 'rb') as f:
+        content = f.read()
+    return _parse_cached(content, _read_asset_keywords_content, ext=ext, columns=tuple(columns))
+
+
+def read_asset_columns_from_upload(uploaded_file):
+    """从上传的资产列表只读取表头（用于选择关键词列）"""
+    ext = _asset_extension(uploaded_file.name)
+    return _parse_cached(uploaded_file.getbuffer(), _read_asset_columns_content, ext=ext)
+
+
+def read_asset_keywords_from_upload(uploaded_file, columns):
+    """从上传的资产列表只读取选中的列，返回去重排序后的关键词列表"""
+    ext = _asset_extension(uploaded_file.name)
+    return _parse_cached(uploaded_file.getbuffer(), _read_asset_keywords_content, ext=ext, columns=tuple(columns))
+
+
+def configure_parse_cache(max_entries=None, max_bytes=None):
+    """调整解析结果缓存的条目上限和总大小上限（字节）"""
+    _parse_cache.resize(max_entries, max_bytes)
+
+
+def clear_parse_cache():
+    """清空解析结果缓存"""
+    _parse_cache.clear()
+
+
+def parse_cache_stats():
+    """解析结果缓存的条目数、占用字节数与命中统计"""
+    return _parse_cache.stats()
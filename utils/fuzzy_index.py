@@ -0,0 +1,127 @@
+from collections import Counter
+
+from utils.token_index import TokenIndex
+
+
+def can_reach(shared, total, threshold):
+    """fuzz.ratio = round(200 * M / 总长)，判断 M 个公共字符能否达到阈值"""
+    return 400 * shared >= (2 * threshold - 1) * total
+
+
+def _elements(counts):
+    """把多重集合展开为 (字符或二元组, 第几次出现) 的集合元素"""
+    return [(gram, n) for gram, count in counts.items() for n in range(count)]
+
+
+def _bigrams(token):
+    return Counter(token[i:i + 2] for i in range(len(token) - 1))
+
+
+class FuzzyIndex:
+    """文档级模糊匹配索引
+
+    在文档的分词索引（TokenIndex）上按（字符/二元组元素, 词长）建立倒排表。查询时先用词长、
+    公共二元组数和公共字符数这几个必要条件筛出候选词（前缀过滤：只需探查关键词中
+    最罕见的几个元素），再对少量候选计算相似度，结果与逐词计算完全一致。
+    """
+
+    def __init__(self, text, case_sensitive=True, max_token_length=None, token_index=None):
+        """max_token_length 为可能达到阈值的最大词长，更长的词不建索引
+
+        token_index 为同一文本已经构建的 TokenIndex，为空时在这里分词。
+        """
+        self.case_sensitive = case_sensitive
+        self.tokens = []
+        self.positions = []
+        self._counts = []
+        self._postings = {}
+        self._frequency = Counter()
+        self._lengths = set()
+
+        if token_index is None:
+            token_index = TokenIndex(text)
+        token_ids = {}
+        for word in token_index.words:
+            token = word if case_sensitive else word.lower()
+            if max_token_length is not None and len(token) > max_token_length:
+                continue
+            token_id = token_ids.get(token)
+            if token_id is None:
+                token_id = len(self.tokens)
+                token_ids[token] = token_id
+                self.tokens.append(token)
+                self.positions.append([])
+            self.positions[token_id].extend(token_index.occurrences(word))
+        if not case_sensitive:
+            # 大小写不同的词合并后按位置排序
+            for positions in self.positions:
+                positions.sort()
+
+        for token_id, token in enumerate(self.tokens):
+            length = len(token)
+            counts = Counter(token)
+            self._counts.append(counts)
+            self._lengths.add(length)
+            for element in _elements(counts) + _elements(_bigrams(token)):
+                self._frequency[element] += 1
+                self._postings.setdefault((element, length), []).append(token_id)
+
+    def candidates(self, keyword, threshold, verify=True):
+        """返回相似度可能达到阈值的候选词编号
+
+        verify 为 False 时跳过逐个候选的公共字符数校验，适合后续打分本身很快的场景。
+        """
+        if not self.case_sensitive:
+            keyword = keyword.lower()
+        if 2 * threshold - 1 <= 0:
+            return list(range(len(self.tokens)))
+
+        keyword_len = len(keyword)
+        # ratio = 2M / (la + lb) 且 M <= min(la, lb)，先按词长排除
+        lengths = [
+            length for length in self._lengths
+            if can_reach(min(keyword_len, length), keyword_len + length, threshold)
+        ]
+        if not lengths:
+            return []
+
+        # 公共字符数 M 至少为 needed(L) 时，对齐中相邻的匹配字符至少构成
+        # 3M - 1 - 总长 个公共二元组；公共元素至少 q 个时，关键词中最罕见的
+        # (元素数 - q + 1) 个元素里必有一个是公共的，只需探查这些元素的倒排表
+        min_shared = None
+        min_bigrams = None
+        for length in lengths:
+            needed = 0
+            while not can_reach(needed, keyword_len + length, threshold):
+                needed += 1
+            bigrams_needed = 3 * needed - 1 - keyword_len - length
+            min_shared = needed if min_shared is None else min(min_shared, needed)
+            min_bigrams = bigrams_needed if min_bigrams is None else min(min_bigrams, bigrams_needed)
+
+        keyword_counts = Counter(keyword)
+        if min_bigrams >= 1:
+            elements = _elements(_bigrams(keyword))
+            probe_size = len(elements) - min_bigrams + 1
+        else:
+            elements = _elements(keyword_counts)
+            probe_size = len(elements) - min_shared + 1
+        elements.sort(key=lambda e: (self._frequency[e], e))
+        prefix = elements[:max(1, probe_size)]
+
+        found = set()
+        for element in prefix:
+            for length in lengths:
+                found.update(self._postings.get((element, length), ()))
+
+        if not verify:
+            return list(found)
+
+        result = []
+        keyword_chars = keyword_counts.items()
+        for token_id in found:
+            # M 不超过两者共有字符数（按多重集合计）
+            counts = self._counts[token_id]
+            shared = sum(min(count, counts.get(ch, 0)) for ch, count in keyword_chars)
+            if can_reach(shared, keyword_len + len(self.tokens[token_id]), threshold):
+                result.append(token_id)
+        return result
@@ -0,0 +1,67 @@
+import importlib.util
+
+# 是否安装了 rapidfuzz；两个打分库都在第一次打分时才导入
+HAS_RAPIDFUZZ = importlib.util.find_spec('rapidfuzz') is not None
+
+# 打分后端：rapidfuzz 批量并行计算；fuzzywuzzy 逐对计算，作为参考实现保留
+SCORER_BACKENDS = ('auto', 'rapidfuzz', 'fuzzywuzzy')
+
+# 单次批量打分矩阵的最大单元数，避免关键词和候选词都很多时占用过多内存
+MAX_MATRIX_CELLS = 4_000_000
+
+
+def resolve_backend(backend='auto'):
+    """确定实际使用的打分后端，auto 在安装了 rapidfuzz 时优先使用它"""
+    if backend not in SCORER_BACKENDS:
+        raise ValueError(f"Unsupported scorer backend: {backend}")
+    if backend == 'auto':
+        return 'rapidfuzz' if HAS_RAPIDFUZZ else 'fuzzywuzzy'
+    if backend == 'rapidfuzz' and not HAS_RAPIDFUZZ:
+        raise ValueError("rapidfuzz is not installed")
+    return backend
+
+
+def _exact_ratio(a, b, indel):
+    """与 fuzz.ratio 相同的取整方式：round(100 * (总长 - Indel 距离) / 总长)"""
+    total = len(a) + len(b)
+    return int(round(100 * ((total - indel.distance(a, b)) / total)))
+
+
+def score_matrix(queries, choices, threshold, backend='auto', workers=-1):
+    """批量计算 queries × choices 的相似度
+
+    返回与 queries 等长的列表，每项为达到阈值的 [(choice 下标, 相似度)]。
+    rapidfuzz 后端一次调用计算整块矩阵，按 workers 使用多个 CPU 核心，
+    并把阈值作为提前截断条件；fuzzywuzzy 后端逐对计算。
+    """
+    backend = resolve_backend(backend)
+    results = [[] for _ in queries]
+    if not queries or not choices:
+        return results
+
+    # 阈值过低时截断值为 0，无法区分“未达到”与“得分为 0”，退回逐对计算
+    if backend == 'fuzzywuzzy' or threshold <= 1:
+        from fuzzywuzzy import fuzz
+        for i, query in enumerate(queries):
+            for j, choice in enumerate(choices):
+                similarity = fuzz.ratio(query, choice)
+                if similarity >= threshold:
+                    results[i].append((j, similarity))
+        return results
+
+    from rapidfuzz import fuzz as rapid_fuzz, process as rapid_process
+    from rapidfuzz.distance import Indel
+    rows_per_batch = max(1, MAX_MATRIX_CELLS // len(choices))
+    for offset in range(0, len(queries), rows_per_batch):
+        batch = queries[offset:offset + rows_per_batch]
+        # 截断值留出 1 分余量，最终分数按 fuzz.ratio 的取整方式重新确认
+        matrix = rapid_process.cdist(
+            batch, choices, scorer=rapid_fuzz.ratio,
+            score_cutoff=threshold - 1, workers=workers
+        )
+        rows, cols = matrix.nonzero()
+        for i, j in zip(rows.tolist(), cols.tolist()):
+            similarity = _exact_ratio(batch[i], choices[j], Indel)
+            if similarity >= threshold:
+                results[offset + i].append((j, similarity))
+    return results
@@ -0,0 +1,213 @@
+import sys
+import threading
+
+from utils.cache import LRUCache
+from utils.compiled_keywords import compile_keywords, prepare_keywords
+from utils.instrumentation import span
+from utils.match_store import MatchStore
+from utils.normalization import DEFAULT_NORMALIZATION
+from utils.search_engine import _search_fuzzy, _search_normalized, search_keywords
+from utils.token_index import TokenIndex
+
+# 按词模糊匹配缓存相似度的下限，阈值在此之上变化时只需过滤缓存
+FUZZY_SCORE_FLOOR = 50
+
+
+class IncrementalSearch:
+    """增量搜索：保留上一次搜索的中间结果，只在必要时重新扫描文本
+
+    文本、关键词集合、大小写、规范化和整词选项不变时（规范化后的文本及其分词索引也只计算一次）：
+    - 精确匹配结果直接复用，关闭模糊匹配只是去掉模糊结果；
+    - 按词模糊匹配的相似度按下限 fuzzy_floor 计算一次，阈值在下限以上变化时只做过滤；
+    - 按字符近似匹配的编辑距离上限和结果选择都随阈值变化，无法过滤得到，
+      只对这部分关键词重新扫描，并按阈值缓存结果。
+    中间结果与 ChunkedScanner 一样以规范化文本中的位置保存，在规范化文本上去重和排序，
+    输出前才换算回原文，因此结果（含顺序）与 search_keywords 完全一致。
+    search 与 adopt 加锁，同一实例可以在会话之间共享。
+    """
+
+    def __init__(self, fuzzy_floor=FUZZY_SCORE_FLOOR, fuzzy_scorer='auto', max_thresholds=8):
+        self.fuzzy_floor = fuzzy_floor
+        self.fuzzy_scorer = fuzzy_scorer
+        # 各部分实际重新计算的次数
+        self.stats = {'exact_scans': 0, 'token_scans': 0, 'substring_scans': 0}
+        self._text = None
+        self._normalized = None
+        self._token_index = None
+        self._base_key = None
+        self._exact = None
+        self._exact_keys = None
+        self._token_scores = {}
+        self._substring_results = LRUCache(max_entries=max_thresholds)
+        self._lock = threading.Lock()
+
+    def _prepare(self, text, keywords, case_sensitive, normalization, whole_word):
+        """文本、关键词、大小写、规范化或整词选项变化时丢弃全部中间结果并重新做精确匹配"""
+        base_key = (tuple(sorted(keywords)), case_sensitive, normalization, whole_word)
+        if self._base_key == base_key and (self._text is text or self._text == text):
+            return
+        self._text = text
+        self._normalized = None
+        self._token_index = None
+        self._base_key = base_key
+        self._token_scores = {}
+        self._substring_results.clear()
+
+        compiled = compile_keywords(keywords, case_sensitive, normalization=normalization, whole_word=whole_word)
+        with span('search', chars=len(text), keywords=len(compiled.keywords)) as counters:
+            self._exact, _ = _search_normalized(self._normalized_text(compiled)[0], compiled, self.fuzzy_scorer)
+            counters['matches'] = len(self._exact)
+        self._exact_keys = {(m['start'], m['end'], m['keyword']) for m in self._exact}
+        self.stats['exact_scans'] += 1
+
+    def adopt(self, text, keywords, case_sensitive, matches, normalization=DEFAULT_NORMALIZATION,
+              whole_word=False):
+        """采用别处（如后台搜索任务）对同一文本和关键词得到的完整结果，之后调整选项时不再做精确匹配
+
+        matches 中的精确匹配与只做精确匹配时的结果相同（模糊匹配不影响精确匹配的选择）。
+        文本中有展开字符（如 ﬁ→fi）时原文位置不能唯一换算回规范化文本，不采用，下次搜索时重新做精确匹配。
+        """
+        with self._lock:
+            keywords = prepare_keywords(keywords)
+            self._text = text
+            self._normalized = None
+            self._token_index = None
+            self._base_key = None
+            self._token_scores = {}
+            self._substring_results.clear()
+            compiled = compile_keywords(keywords, case_sensitive, normalization=normalization, whole_word=whole_word)
+            if self._normalized_text(compiled)[1].normalized_starts:
+                return
+            self._base_key = (tuple(sorted(keywords)), case_sensitive, normalization, whole_word)
+            self._exact = [match for match in matches if match['type'] == 'exact']
+            self._exact_keys = {(m['start'], m['end'], m['keyword']) for m in self._exact}
+
+    def nbytes(self):
+        """中间结果占用内存的粗略估计（不含文本本身：文本计入共享存储中的文稿条目，被持有期间不会溢出）"""
+        exact_count = len(self._exact or ())
+        match_count = exact_count + sum(map(len, self._token_scores.values()))
+        # 每个匹配字典及列表中的指针；精确匹配另有去重用的 (起点, 终点, 关键词) 集合
+        size = match_count * (sys.getsizeof({'start': 0, 'end': 0, 'keyword': '', 'type': ''}) + 8)
+        size += exact_count * (sys.getsizeof((0, 0, '')) + 32)
+        if self._normalized is not None and self._normalized[0] is not self._text:
+            size += sys.getsizeof(self._normalized[0])
+        if self._token_index is not None:
+            size += 2 * self._token_index.starts.itemsize * len(self._token_index)
+        return size
+
+    def _normalized_text(self, compiled):
+        """规范化后的文本及偏移映射，同一文本只计算一次"""
+        if self._normalized is None:
+            self._normalized = compiled.normalizer.normalize(self._text)
+        return self._normalized
+
+    def _tokens(self, compiled):
+        """规范化文本的分词索引，同一文本只构建一次"""
+        if self._token_index is None:
+            self._token_index = TokenIndex(self._normalized_text(compiled)[0])
+        return self._token_index
+
+    def _token_matches(self, token_keywords, threshold):
+        key = tuple(token_keywords)
+        scores = self._token_scores.get(key)
+        if scores is None:
+            _, case_sensitive, normalization, whole_word = self._base_key
+            compiled = compile_keywords(
+                token_keywords, case_sensitive, True, self.fuzzy_floor, 'token', normalization, whole_word
+            )
+            token_results = _search_fuzzy(
+                self._text, compiled, self.fuzzy_scorer, self._normalized_text(compiled), self._tokens(compiled),
+                to_original=False
+            )
+            scores = [
+                match
+                for keyword_matches in token_results.values()
+                for match in keyword_matches
+                if (match['start'], match['end'], match['keyword']) not in self._exact_keys
+            ]
+            self._token_scores = {key: scores}
+            self.stats['token_scans'] += 1
+        return [match for match in scores if match['similarity'] >= threshold]
+
+    def _substring_matches(self, compiled):
+        key = (tuple(compiled.substring_keywords), compiled.fuzzy_threshold)
+        results = self._substring_results.get(key)
+        if results is None:
+            text, _ = self._normalized_text(compiled)
+            word_index = self._tokens(compiled) if compiled.whole_word else None
+            with span('fuzzy_substring', keywords=len(compiled.substring_keywords)) as counters:
+                results = [
+                    match
+                    for keyword_matches in compiled.approximate.search(text, word_index).values()
+                    for match in keyword_matches
+                    if (match['start'], match['end'], match['keyword']) not in self._exact_keys
+                ]
+                counters['matches'] = len(results)
+            self._substring_results.put(key, results)
+            self.stats['substring_scans'] += 1
+        return results
+
+    def search(self, text, keywords, case_sensitive=True, use_fuzzy=False, fuzzy_threshold=80,
+               fuzzy_mode='auto', as_store=False, normalization=DEFAULT_NORMALIZATION, whole_word=False):
+        """与 search_keywords 参数和返回值相同"""
+        if use_fuzzy and 2 * fuzzy_threshold - 1 <= 0:
+            # 阈值过低时任意长的词都可能匹配，不做缓存
+            return search_keywords(text, keywords, case_sensitive, use_fuzzy, fuzzy_threshold,
+                                   fuzzy_mode, self.fuzzy_scorer, as_store, normalization=normalization,
+                                   whole_word=whole_word)
+        with self._lock, span('incremental_search', chars=len(text)) as counters:
+            before = dict(self.stats)
+            matches, keyword_counts = self._search(
+                text, prepare_keywords(keywords), case_sensitive, use_fuzzy, fuzzy_threshold, fuzzy_mode, as_store,
+                normalization, whole_word
+            )
+            counters['keywords'] = len(keyword_counts)
+            counters['matches'] = len(matches)
+            # 本次实际重新扫描的部分
+            counters.update((name, self.stats[name] - before[name]) for name in self.stats)
+            return matches, keyword_counts
+
+    def _search(self, text, keywords, case_sensitive, use_fuzzy, fuzzy_threshold, fuzzy_mode, as_store,
+                normalization, whole_word):
+        self._prepare(text, keywords, case_sensitive, normalization, whole_word)
+        compiled = compile_keywords(
+            keywords, case_sensitive, use_fuzzy, fuzzy_threshold, fuzzy_mode, normalization, whole_word
+        )
+
+        matches = list(self._exact)
+        if use_fuzzy:
+            if compiled.token_keywords:
+                if fuzzy_threshold >= self.fuzzy_floor:
+                    matches.extend(self._token_matches(compiled.token_keywords, fuzzy_threshold))
+                else:
+                    # 低于缓存下限时单独计算按词模糊匹配
+                    token_compiled = compile_keywords(
+                        compiled.token_keywords, case_sensitive, True, fuzzy_threshold, 'token', normalization,
+                        whole_word
+                    )
+                    token_results = _search_fuzzy(
+                        text, token_compiled, self.fuzzy_scorer, self._normalized_text(token_compiled),
+                        self._tokens(token_compiled), to_original=False
+                    )
+                    matches.extend(
+                        match
+                        for keyword_matches in token_results.values()
+                        for match in keyword_matches
+                        if (match['start'], match['end'], match['keyword']) not in self._exact_keys
+                    )
+            if compiled.approximate is not None:
+                matches.extend(self._substring_matches(compiled))
+
+        # 与 search_keywords 相同的顺序：按规范化文本中的位置，同一位置按关键词顺序，精确匹配在前
+        rank = {keyword: i for i, keyword in enumerate(compiled.keywords)}
+        matches.sort(key=lambda x: (x['start'], rank[x['keyword']], x['type'] != 'exact'))
+        offsets = self._normalized_text(compiled)[1]
+        if offsets.normalized_starts:
+            # 换算回原文；缓存的中间结果保持规范化文本中的位置，换算在副本上进行
+            matches = offsets.map_matches([dict(match) for match in matches])
+        keyword_counts = {keyword: 0 for keyword in compiled.keywords}
+        for match in matches:
+            keyword_counts[match['keyword']] += 1
+        if as_store:
+            matches = MatchStore.from_matches(matches, compiled.keywords)
+        return matches, keyword_counts
@@ -0,0 +1,112 @@
+import cProfile
+import json
+import logging
+import marshal
+import threading
+import time
+from contextlib import contextmanager
+
+# 全局回调：每个计时区间结束时以事件字典调用
+_listeners = []
+# 当前线程的计时区间栈与收集器
+_local = threading.local()
+
+
+def add_listener(callback):
+    """注册回调，每个计时区间结束时调用 callback(event)
+
+    event 包含 name（阶段名）、seconds（耗时）、depth（嵌套层级）以及该阶段的计数
+    （如 bytes、keywords、candidates_scored、matches）。
+    """
+    if callback not in _listeners:
+        _listeners.append(callback)
+
+
+def remove_listener(callback):
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+
+def log_listener(logger_name='text_asset_locator.perf', level=logging.INFO):
+    """生成把事件以 JSON 结构化日志写出的回调"""
+    logger = logging.getLogger(logger_name)
+
+    def callback(event):
+        logger.log(level, json.dumps(event, ensure_ascii=False, default=str))
+    return callback
+
+
+def _active():
+    return bool(_listeners) or bool(getattr(_local, 'collectors', None))
+
+
+@contextmanager
+def span(name, **counters):
+    """给一个处理阶段计时；可在区间内更新返回的计数字典，或通过 count 累加计数
+
+    没有回调和收集器时几乎没有开销。
+    """
+    if not _active():
+        yield counters
+        return
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(counters)
+    started = time.perf_counter()
+    try:
+        yield counters
+    finally:
+        seconds = time.perf_counter() - started
+        stack.pop()
+        event = {'name': name, 'seconds': seconds, 'depth': len(stack)}
+        event.update(counters)
+        for collector in getattr(_local, 'collectors', ()):
+            collector.append(event)
+        for callback in list(_listeners):
+            callback(event)
+
+
+def count(name, value=1):
+    """给当前（最内层）计时区间的计数 name 累加 value，不在任何区间内时忽略"""
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        counters = stack[-1]
+        counters[name] = counters.get(name, 0) + value
+
+
+@contextmanager
+def collect():
+    """收集当前线程在 with 块内产生的全部事件（按结束顺序），返回事件列表"""
+    events = []
+    collectors = getattr(_local, 'collectors', None)
+    if collectors is None:
+        collectors = _local.collectors = []
+    collectors.append(events)
+    try:
+        yield events
+    finally:
+        collectors.remove(events)
+
+
+@contextmanager
+def profile(path=None):
+    """用 cProfile 剖析 with 块；path 不为空时写出 .prof 文件
+
+    .prof 文件可用 snakeviz、flameprof 等工具查看或转换为火焰图。
+    返回的 Profile 对象在 with 块结束后可继续用 pstats 分析。
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if path:
+            profiler.dump_stats(path)
+
+
+def profile_data(profiler):
+    """返回 Profile 对象的 .prof 文件内容（与 dump_stats 写出的相同），用于下载等不落盘的场景"""
+    profiler.create_stats()
+    return marshal.dumps(profiler.stats)
@@ -0,0 +1,140 @@
+from array import array
+from bisect import bisect_left
+
+# 匹配类型编号
+MATCH_TYPES = ('exact', 'fuzzy')
+_TYPE_IDS = {match_type: i for i, match_type in enumerate(MATCH_TYPES)}
+
+# 没有相似度（精确匹配）时的占位值
+_NO_SIMILARITY = -1
+
+
+class MatchStore:
+    """紧凑的列式匹配结果存储
+
+    起点、终点、关键词编号、类型和相似度分别存放在定长数组中，关键词字符串
+    只在关键词表中保存一次。每个关键词维护一个按位置排序的匹配下标列表，
+    “跳到某关键词”“第 n 次出现”“出现次数”都不需要扫描全部匹配。
+    按下标读取时返回与 search_keywords 相同格式的匹配字典。
+    """
+
+    def __init__(self, keywords=()):
+        self.starts = array('q')
+        self.ends = array('q')
+        self.keyword_ids = array('i')
+        self.types = array('b')
+        self.similarities = array('b')
+        self.keywords = []
+        self._keyword_ids = {}
+        self._postings = []
+        self._sorted = True
+        for keyword in keywords:
+            self.intern(keyword)
+
+    @classmethod
+    def from_matches(cls, matches, keywords=()):
+        """由匹配字典（列表或 search_stream 等产出的迭代器）构建"""
+        store = cls(keywords)
+        store.extend(matches)
+        return store
+
+    def intern(self, keyword):
+        """返回关键词编号，新关键词加入关键词表"""
+        keyword_id = self._keyword_ids.get(keyword)
+        if keyword_id is None:
+            keyword_id = len(self.keywords)
+            self._keyword_ids[keyword] = keyword_id
+            self.keywords.append(keyword)
+            self._postings.append(array('i'))
+        return keyword_id
+
+    def append(self, start, end, keyword, match_type='exact', similarity=None):
+        if match_type not in _TYPE_IDS:
+            raise ValueError(f"Unsupported match type: {match_type}")
+        if self.starts and start < self.starts[-1]:
+            self._sorted = False
+        keyword_id = self.intern(keyword)
+        self._postings[keyword_id].append(len(self.starts))
+        self.starts.append(start)
+        self.ends.append(end)
+        self.keyword_ids.append(keyword_id)
+        self.types.append(_TYPE_IDS[match_type])
+        self.similarities.append(_NO_SIMILARITY if similarity is None else similarity)
+
+    def extend(self, matches):
+        """追加匹配字典；追加顺序不按起点时最后按起点重新排序（相同起点保持原顺序）"""
+        for match in matches:
+            self.append(match['start'], match['end'], match['keyword'], match['type'],
+                        match.get('similarity'))
+        if not self._sorted:
+            self.sort()
+
+    def sort(self):
+        """按起点稳定排序并重建倒排表"""
+        order = sorted(range(len(self.starts)), key=self.starts.__getitem__)
+        for name in ('starts', 'ends', 'keyword_ids', 'types', 'similarities'):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, (column[i] for i in order)))
+        self._postings = [array('i') for _ in self.keywords]
+        for i, keyword_id in enumerate(self.keyword_ids):
+            self._postings[keyword_id].append(i)
+        self._sorted = True
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        match = {
+            'start': self.starts[index],
+            'end': self.ends[index],
+            'keyword': self.keywords[self.keyword_ids[index]],
+            'type': MATCH_TYPES[self.types[index]]
+        }
+        if self.similarities[index] != _NO_SIMILARITY:
+            match['similarity'] = self.similarities[index]
+        return match
+
+    def __iter__(self):
+        for i in range(len(self.starts)):
+            yield self[i]
+
+    def is_exact(self, index):
+        return self.types[index] == _TYPE_IDS['exact']
+
+    def postings(self, keyword):
+        """关键词所有匹配的下标（按位置排序）"""
+        keyword_id = self._keyword_ids.get(keyword)
+        if keyword_id is None:
+            return array('i')
+        return self._postings[keyword_id]
+
+    def count(self, keyword):
+        return len(self.postings(keyword))
+
+    def counts(self):
+        """{关键词: 匹配次数}，包括关键词表中没有匹配的关键词"""
+        return {keyword: len(postings) for keyword, postings in zip(self.keywords, self._postings)}
+
+    def nth(self, keyword, n):
+        """关键词第 n 次（从 0 开始）出现的匹配下标，不存在时返回 None"""
+        postings = self.postings(keyword)
+        if not -len(postings) <= n < len(postings):
+            return None
+        return postings[n]
+
+    def first_index(self, keyword):
+        return self.nth(keyword, 0)
+
+    def occurrence_number(self, index):
+        """第 index 个匹配是其关键词的第几次出现（从 0 开始）"""
+        return bisect_left(self._postings[self.keyword_ids[index]], index)
+
+    def index_at(self, position):
+        """第一个起点不小于 position 的匹配下标"""
+        return bisect_left(self.starts, position)
+
+    def nbytes(self):
+        """各列数组占用的字节数"""
+        return sum(column.itemsize * len(column) for column in (
+            self.starts, self.ends, self.keyword_ids, self.types, self.similarities
+        )) + sum(postings.itemsize * len(postings) for postings in self._postings)
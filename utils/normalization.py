@@ -0,0 +1,188 @@
+import re
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_right
+
+# 文本规范化方式：
+# none 只在忽略大小写时逐字符转小写（长度不变）；
+# nfkc 做 Unicode 兼容规范化（全角/半角、兼容汉字、带圈数字、连字等），忽略大小写时再做 casefold；
+# nfkc_t2s 在 nfkc 之后把繁体字转换为简体字（需要安装 opencc）
+NORMALIZATIONS = ('none', 'nfkc', 'nfkc_t2s')
+DEFAULT_NORMALIZATION = 'nfkc'
+
+# 文本中需要转换的字符种类不超过此数时逐个 str.replace，比 str.translate 逐字符查表快得多
+_REPLACE_LIMIT = 16
+
+
+def _load_t2s():
+    try:
+        import opencc
+    except ImportError:
+        raise ValueError("opencc is not installed") from None
+    return opencc.OpenCC('t2s')
+
+
+class OffsetMap:
+    """规范化文本到原文的偏移映射
+
+    规范化逐字符进行，只有结果不是一个字符的原文字符（如 ß→ss、ﬁ→fi、㈱→(株)）
+    会使偏移错开。只记录这些字符：它在规范化文本中的起点、结果长度和在原文中的位置，
+    其余位置由前一条记录推算。文本中没有这类字符时不占空间。
+    """
+
+    def __init__(self):
+        self.normalized_starts = array('q')
+        self.lengths = array('i')
+        self.original_positions = array('q')
+        self.original_length = 0
+        self.normalized_length = 0
+
+    def append(self, original_length, normalized_length, expansions):
+        """追加一段规范化结果（流式规范化时逐块调用），expansions 为段内的 [(原文位置, 规范化位置, 结果长度)]"""
+        for original, normalized, length in expansions:
+            self.original_positions.append(self.original_length + original)
+            self.normalized_starts.append(self.normalized_length + normalized)
+            self.lengths.append(length)
+        self.original_length += original_length
+        self.normalized_length += normalized_length
+
+    def start(self, position):
+        """规范化文本中的位置对应的原文位置；落在展开字符中间时取该字符的起点"""
+        i = bisect_right(self.normalized_starts, position) - 1
+        if i < 0:
+            return position
+        normalized_start = self.normalized_starts[i]
+        if position < normalized_start + self.lengths[i]:
+            return self.original_positions[i]
+        return self.original_positions[i] + 1 + position - normalized_start - self.lengths[i]
+
+    def end(self, position):
+        """规范化文本中的匹配终点对应的原文终点；只匹配到展开字符的一部分时包含整个字符"""
+        if position <= 0:
+            return 0
+        return self.start(position - 1) + 1
+
+    def map_matches(self, matches):
+        """把匹配字典的起点和终点原地换算为原文位置，返回 matches"""
+        if self.normalized_starts:
+            for match in matches:
+                match['start'] = self.start(match['start'])
+                match['end'] = self.end(match['end'])
+        return matches
+
+
+class Normalizer:
+    """逐字符规范化文本，并记录到原文的偏移映射
+
+    每个字符的规范化结果只计算一次；文本中需要转换的字符种类很少时逐个替换，
+    否则用 str.translate 一次完成整段转换。
+    逐字符进行意味着不做跨字符的组合（如 e 与组合重音符不会合成 é），
+    换来的是任意切分的文本块分别规范化后与整体规范化的结果相同，可以流式处理。
+    同一实例可在多个线程间共享（如缓存的编译结果），学习新字符时加锁。
+    """
+
+    def __init__(self, normalization=DEFAULT_NORMALIZATION, case_sensitive=True):
+        if normalization not in NORMALIZATIONS:
+            raise ValueError(f"Unsupported normalization: {normalization}")
+        self.normalization = normalization
+        self.case_sensitive = case_sensitive
+        # 规范化后有变化的字符：码位 -> 结果
+        self._table = {}
+        self._changed = set()
+        self._seen = set()
+        # 结果不是一个字符的字符，用于定位偏移错开的位置
+        self._expanding = set()
+        self._expanding_pattern = None
+        self._lock = threading.Lock()
+        self._t2s = _load_t2s() if normalization == 'nfkc_t2s' else None
+
+    def __getstate__(self):
+        # opencc 的转换器和锁不能序列化，加载时重新创建
+        state = dict(self.__dict__)
+        state['_t2s'] = None
+        state['_expanding_pattern'] = None
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        if self.normalization == 'nfkc_t2s':
+            self._t2s = _load_t2s()
+
+    @property
+    def identity(self):
+        """是否不做任何转换"""
+        return self.normalization == 'none' and self.case_sensitive
+
+    def normalize_char(self, char):
+        if self.normalization == 'none':
+            if self.case_sensitive:
+                return char
+            lower = char.lower()
+            return lower if len(lower) == 1 else char
+        result = unicodedata.normalize('NFKC', char)
+        if not self.case_sensitive:
+            result = unicodedata.normalize('NFKC', result.casefold())
+        if self._t2s is not None:
+            result = self._t2s.convert(result)
+        return result
+
+    def _learn(self, text):
+        """学习文本中新出现的字符，返回文本中需要转换的字符"""
+        chars = set(text)
+        with self._lock:
+            new = chars - self._seen
+            for char in new:
+                result = self.normalize_char(char)
+                if result != char:
+                    self._table[ord(char)] = result
+                    self._changed.add(char)
+                    if len(result) != 1:
+                        self._expanding.add(char)
+                        self._expanding_pattern = None
+            self._seen |= new
+            return chars & self._changed
+
+    def _convert(self, text, changed):
+        if not changed:
+            return text
+        results = [self._table[ord(char)] for char in changed]
+        if len(changed) > _REPLACE_LIMIT or not changed.isdisjoint(''.join(results)):
+            return text.translate(self._table)
+        for char, result in zip(changed, results):
+            text = text.replace(char, result)
+        return text
+
+    def normalize(self, text, offsets=None):
+        """返回 (规范化文本, OffsetMap)；传入 offsets 时把本段追加到它后面（用于流式规范化）"""
+        if offsets is None:
+            offsets = OffsetMap()
+        if self.identity:
+            offsets.append(len(text), len(text), ())
+            return text, offsets
+        changed = self._learn(text)
+        normalized = self._convert(text, changed)
+        expansions = []
+        if not changed.isdisjoint(self._expanding):
+            delta = 0
+            for match in self._pattern().finditer(text):
+                position = match.start()
+                length = len(self._table[ord(match.group())])
+                expansions.append((position, position + delta, length))
+                delta += length - 1
+        offsets.append(len(text), len(normalized), expansions)
+        return normalized, offsets
+
+    def _pattern(self):
+        with self._lock:
+            if self._expanding_pattern is None:
+                self._expanding_pattern = re.compile(
+                    '[' + ''.join(re.escape(char) for char in sorted(self._expanding)) + ']'
+                )
+            return self._expanding_pattern
+
+    def normalize_keyword(self, keyword):
+        """关键词的比较形式"""
+        return self.normalize(keyword)[0]
@@ -1,154 +1,642 @@
-import re
-from fuzzywuzzy import fuzz
+import atexit
+import html
+import os
+import pickle
+import threading
+from collections import deque
+from utils.fuzzy_index import FuzzyIndex
+from utils.approximate import ApproximateSelection, find_all_approximate_matches
+from utils.fuzzy_scorer import resolve_backend, score_matrix
+from utils.file_reader import iter_text_file_chunks
+from utils.instrumentation import count, span
+from utils.match_store import MatchStore
+from utils.normalization import DEFAULT_NORMALIZATION, Normalizer, OffsetMap
+from utils.token_index import TokenIndex
+from utils.compiled_keywords import (
+    FUZZY_MODES, CompiledKeywords, ExactMatcher, compile_keywords
+)
 
+# 批量打分时每批关键词数量
+KEYWORD_BATCH_SIZE = 256
 
-def find_exact_matches(text, keyword, case_sensitive=True):
-    """精确匹配关键词"""
-    matches = []
-    if case_sensitive:
-        pattern = re.escape(keyword)
-        for match in re.finditer(pattern, text):
-            matches.append({
-                'start': match.start(),
-                'end': match.end(),
-                'keyword': keyword,
-                'type': 'exact'
-            })
-    else:
-        pattern = re.escape(keyword)
-        for match in re.finditer(pattern, text, re.IGNORECASE):
-            matches.append({
-                'start': match.start(),
-                'end': match.end(),
-                'keyword': keyword,
-                'type': 'exact'
-            })
-    return matches
-
-
-def find_fuzzy_matches(text, keyword, threshold=80, case_sensitive=True):
-    """模糊匹配关键词"""
-    matches = []
-    words = text.split()
-    keyword_len = len(keyword)
-    
-    for i, word in enumerate(words):
-        if case_sensitive:
-            similarity = fuzz.ratio(keyword, word)
+# 流式搜索时每次读取的字符数
+DEFAULT_STREAM_CHUNK_SIZE = 1024 * 1024
+
+# 并行搜索时每个分片的最小字符数，文本较短时进程开销大于并行收益
+MIN_SHARD_SIZE = 256 * 1024
+
+# 高亮文本中分段之间插入的换行
+CHUNK_BREAK = '<br><br>'
+
+
+def find_exact_matches(text, keyword, case_sensitive=True, normalization=DEFAULT_NORMALIZATION):
+    """精确匹配关键词（从左到右、互不重叠），文本与关键词先按 normalization 规范化"""
+    if not keyword:
+        return []
+    return find_all_exact_matches(text, [keyword], case_sensitive, normalization)[keyword]
+
+
+def _match_tokens(index, keywords, threshold, scorer='auto', forms=None):
+    """在模糊索引上为多个关键词打分，返回 {关键词: 模糊匹配列表}
+
+    每批关键词合并各自的候选词后一次性交给打分后端；参考后端逐个关键词计算。
+    forms 为关键词的比较形式（已规范化，见 CompiledKeywords.token_forms），
+    此时索引应建立在同样规范化过的文本上。
+    """
+    backend = resolve_backend(scorer)
+    batched = backend != 'fuzzywuzzy'
+    batch_size = KEYWORD_BATCH_SIZE if batched else 1
+    results = {}
+    for offset in range(0, len(keywords), batch_size):
+        batch = keywords[offset:offset + batch_size]
+        if forms is not None:
+            batch_forms = [forms[keyword] for keyword in batch]
         else:
-            similarity = fuzz.ratio(keyword.lower(), word.lower())
-        
-        if similarity >= threshold:
-            # 找到该词在原文中的位置
-            start_pos = text.find(word)
-            while start_pos != -1:
-                # 检查是否是独立单词
-                prev_char = text[start_pos - 1] if start_pos > 0 else ' '
-                next_char = text[start_pos + len(word)] if start_pos + len(word) < len(text) else ' '
-                if not prev_char.isalnum() and not next_char.isalnum():
+            batch_forms = batch if index.case_sensitive else [keyword.lower() for keyword in batch]
+        token_ids = sorted({
+            token_id
+            for form in batch_forms
+            for token_id in index.candidates(form, threshold, verify=not batched)
+        })
+        queries = batch_forms
+        count('candidates_scored', len(queries) * len(token_ids))
+        scores = score_matrix(
+            queries, [index.tokens[i] for i in token_ids], threshold, backend, _scorer_workers
+        )
+        for keyword, row in zip(batch, scores):
+            matches = []
+            for j, similarity in row:
+                for start, end in index.positions[token_ids[j]]:
                     matches.append({
-                        'start': start_pos,
-                        'end': start_pos + len(word),
+                        'start': start,
+                        'end': end,
                         'keyword': keyword,
                         'type': 'fuzzy',
                         'similarity': similarity
                     })
-                    break
-                start_pos = text.find(word, start_pos + 1)
-    
-    return matches
+            matches.sort(key=lambda x: x['start'])
+            results[keyword] = matches
+    return results
 
 
-def search_keywords(text, keywords, case_sensitive=True, use_fuzzy=False, fuzzy_threshold=80):
-    """搜索多个关键词"""
-    all_matches = []
-    keyword_counts = {}
-    
-    for keyword in keywords:
-        if not keyword or keyword.strip() == '':
-            continue
-            
-        keyword = keyword.strip()
-        # 精确匹配
-        exact_matches = find_exact_matches(text, keyword, case_sensitive)
-        all_matches.extend(exact_matches)
-        
-        # 模糊匹配（如果开启）
-        new_fuzzy_matches = []
-        if use_fuzzy:
-            fuzzy_matches = find_fuzzy_matches(text, keyword, fuzzy_threshold, case_sensitive)
+def find_fuzzy_matches(text, keyword, threshold=80, case_sensitive=True, index=None, scorer='fuzzywuzzy'):
+    """模糊匹配关键词
+
+    index 为同一文档预先构建的 FuzzyIndex，多个关键词共用时只需分词一次。
+    相似度达到阈值的词，其在原文中的每一次出现都会被报告。
+    """
+    if index is None:
+        index = FuzzyIndex(text, case_sensitive)
+    return _match_tokens(index, [keyword], threshold, scorer)[keyword]
+
+
+def find_all_exact_matches(text, keywords, case_sensitive=True, normalization=DEFAULT_NORMALIZATION):
+    """使用 Aho-Corasick 自动机一次扫描完成多关键词精确匹配
+
+    返回 {关键词: 匹配列表}，每个关键词的结果与 find_exact_matches 一致
+    （从左到右、互不重叠）。
+    """
+    return ExactMatcher(keywords, case_sensitive, normalization).search(text)
+
+
+def find_approximate_matches(text, keyword, threshold=80, case_sensitive=True, normalization=DEFAULT_NORMALIZATION):
+    """按字符近似匹配关键词，编辑距离上限由阈值换算"""
+    normalizer = Normalizer(normalization, case_sensitive)
+    normalized, offsets = normalizer.normalize(text)
+    matches = find_all_approximate_matches(
+        normalized, [keyword], threshold, [normalizer.normalize_keyword(keyword)]
+    )[keyword]
+    return offsets.map_matches(matches)
+
+
+def _search_fuzzy(text, compiled, scorer='auto', normalized=None, token_index=None, to_original=True):
+    """按编译好的关键词做模糊匹配，返回 {关键词: 模糊匹配列表}
+
+    normalized 为已经用 compiled.normalizer 规范化过的 (文本, OffsetMap)，为空时在这里规范化；
+    token_index 为规范化文本的 TokenIndex，为空时在需要时构建。
+    to_original 为假时位置留在规范化文本中，不换算回原文。
+    """
+    if normalized is None:
+        normalized = compiled.normalizer.normalize(text)
+    text, offsets = normalized
+    if token_index is None and (compiled.token_keywords or compiled.whole_word):
+        token_index = TokenIndex(text)
+    results = {}
+    if compiled.token_keywords:
+        with span('fuzzy_token', keywords=len(compiled.token_keywords)) as counters:
+            # 模糊匹配索引每个文档只构建一次；文本已规范化，索引不再转换大小写
+            index = FuzzyIndex(text, True, compiled.max_token_length, token_index)
+            counters['tokens'] = len(index.tokens)
+            token_results = _match_tokens(
+                index, compiled.token_keywords, compiled.fuzzy_threshold, scorer, compiled.token_forms
+            )
+            counters['matches'] = sum(map(len, token_results.values()))
+        results.update(token_results)
+    if compiled.approximate is not None:
+        with span('fuzzy_substring', keywords=len(compiled.substring_keywords)) as counters:
+            substring_results = compiled.approximate.search(text, token_index if compiled.whole_word else None)
+            counters['matches'] = sum(map(len, substring_results.values()))
+        results.update(substring_results)
+    if to_original:
+        for matches in results.values():
+            offsets.map_matches(matches)
+    return results
+
+
+def find_all_fuzzy_matches(text, keywords, threshold=80, case_sensitive=True, fuzzy_mode='auto',
+                           scorer='auto', normalization=DEFAULT_NORMALIZATION):
+    """对多个关键词做模糊匹配，返回 {关键词: 模糊匹配列表}
+
+    scorer 选择按词匹配的打分后端，auto 在安装了 rapidfuzz 时使用批量并行打分。
+    """
+    compiled = CompiledKeywords(keywords, case_sensitive, True, threshold, fuzzy_mode, normalization)
+    return _search_fuzzy(text, compiled, scorer)
+
+
+def _scan_candidates(compiled, window, window_start, min_end, max_end, scorer='auto'):
+    """扫描一个窗口，返回终点在 (min_end, max_end] 内的全部候选（位置为绝对偏移）
+
+    window 为已经用 compiled.normalizer 规范化过的文本，位置都是规范化文本中的偏移。
+    整词匹配时精确和近似候选在这里按词边界过滤（先于非重叠选择）。返回 (精确出现 [(起点, 终点, 模式编号)], 按词模糊匹配列表,
+    近似匹配候选 [(模式编号, 起点, 终点, 距离)])。候选只取决于窗口内的文本，
+    不依赖之前的扫描状态，可以在不同进程中并行计算。
+    """
+    lo = min_end - window_start
+    hi = max_end - window_start
+    compare = window
+    # 窗口只分词一次，供按词模糊匹配和整词过滤共用；窗口开头和非最后一块的结尾
+    # 视为边界，但这些位置上的匹配不会在本窗口确定（见 ChunkedScanner.feed）
+    token_index = None
+    if compiled.whole_word or (compiled.use_fuzzy and compiled.token_keywords):
+        token_index = TokenIndex(window)
+    whole_word = token_index.is_whole_word if compiled.whole_word else None
+
+    exact = []
+    with span('exact_match', chars=len(window), keywords=len(compiled.keywords)) as counters:
+        for start, end, index in compiled.exact.iter_occurrences(compare):
+            if end > hi:
+                break
+            if end <= lo:
+                continue
+            if whole_word is not None and not whole_word(start, end):
+                continue
+            exact.append((start + window_start, end + window_start, index))
+        counters['occurrences'] = len(exact)
+
+    tokens = []
+    approximate = []
+    if compiled.use_fuzzy:
+        if compiled.token_keywords:
+            with span('fuzzy_token', keywords=len(compiled.token_keywords)) as counters:
+                # 模糊匹配索引每个文本块只构建一次
+                index = FuzzyIndex(window, True, compiled.max_token_length, token_index)
+                counters['tokens'] = len(index.tokens)
+                token_results = _match_tokens(
+                    index, compiled.token_keywords, compiled.fuzzy_threshold, scorer, compiled.token_forms
+                )
+                for keyword_matches in token_results.values():
+                    for match in keyword_matches:
+                        # 块开头的词可能被截断，这样的词不可能是新的匹配
+                        if match['end'] <= lo or match['end'] > hi or (window_start and not match['start']):
+                            continue
+                        match['start'] += window_start
+                        match['end'] += window_start
+                        tokens.append(match)
+                counters['matches'] = len(tokens)
+        if compiled.approximate is not None:
+            with span('fuzzy_substring', keywords=len(compiled.substring_keywords)) as counters:
+                for pattern_index, start, end, distance in compiled.approximate.candidates(compare, lo, hi):
+                    if whole_word is not None and not whole_word(start, end):
+                        continue
+                    approximate.append((pattern_index, start + window_start, end + window_start, distance))
+                counters['candidates'] = len(approximate)
+    return exact, tokens, approximate
+
+
+class ChunkedScanner:
+    """分块扫描器
+
+    按顺序 feed 文本块，返回已经可以确定的匹配（位置为相对全文的绝对偏移）。
+    每块先规范化（逐字符进行，分块与整体的结果相同），扫描和选择都在规范化文本上
+    进行，输出前把位置换算回原文。相邻块之间保留最长可能匹配长度的重叠；精确匹配的
+    非重叠选择、近似匹配的去重状态都跨块延续，因此结果与一次性搜索全文完全一致。
+    """
+
+    def __init__(self, compiled, fuzzy_scorer='auto'):
+        self.compiled = compiled
+        self.fuzzy_scorer = fuzzy_scorer
+        self.keyword_counts = {keyword: 0 for keyword in compiled.keywords}
+        self.chars_scanned = 0
+        self.offsets = OffsetMap()
+        self._rank = {keyword: i for i, keyword in enumerate(compiled.keywords)}
+        self._buffer = ''
+        self._buffer_start = 0
+        # 终点不超过 _limit 的匹配都已输出
+        self._limit = 0
+        self._last_exact_end = {}
+        # 尚可能与待输出的模糊匹配重合的精确匹配，用于去重
+        self._recent_exact = set()
+        self._recent_exact_order = deque()
+        self._selection = None
+        if compiled.use_fuzzy and compiled.approximate is not None:
+            self._selection = ApproximateSelection(compiled.approximate)
+
+    def feed(self, chunk, final=False):
+        """追加一块文本，返回新确定的匹配；final 表示这是最后一块"""
+        self.chars_scanned += len(chunk)
+        chunk, _ = self.compiled.normalizer.normalize(chunk, self.offsets)
+        window = self._buffer + chunk
+        window_start = self._buffer_start
+        window_end = window_start + len(window)
+        # 非最后一块时，结束在块末尾的词可能还没结束，留到下一块再确定
+        limit = window_end if final else window_end - 1
+        matches = []
+        if limit > self._limit or final:
+            matches = self._scan(window, window_start, max(limit, self._limit), final)
+            self._limit = max(limit, self._limit)
+
+        longest = self.compiled.max_match_length
+        if longest is None:
+            keep_from = window_start
+        else:
+            # 多保留一个字符，用于判断下一块开头的词是否被截断
+            keep_from = max(window_start, self._limit - longest - 1)
+        self._buffer = window[keep_from - window_start:]
+        self._buffer_start = keep_from
+        return self.offsets.map_matches(matches)
+
+    def _scan(self, window, window_start, limit, final):
+        exact, tokens, approximate = _scan_candidates(
+            self.compiled, window, window_start, self._limit, limit, self.fuzzy_scorer
+        )
+        return self._select(exact, tokens, approximate, limit, final)
+
+    def _select(self, exact, tokens, approximate, limit, final):
+        """从终点不超过 limit 的候选中选出结果（精确匹配互不重叠、近似匹配择优、去重）"""
+        compiled = self.compiled
+        batch = []
+
+        owners = compiled.exact.pattern_owners
+        last_exact_end = self._last_exact_end
+        for start, end, index in exact:
+            # 同一关键词保持 re.finditer 的非重叠语义
+            if start < last_exact_end.get(index, 0):
+                continue
+            last_exact_end[index] = end
+            for keyword in owners[index]:
+                batch.append({
+                    'start': start,
+                    'end': end,
+                    'keyword': keyword,
+                    'type': 'exact'
+                })
+                self._recent_exact.add((start, end, keyword))
+                self._recent_exact_order.append((end, start, keyword))
+
+        if compiled.use_fuzzy:
+            fuzzy_matches = list(tokens)
+            if self._selection is not None:
+                for candidate in approximate:
+                    self._selection.add(*candidate)
+                fuzzy_matches.extend(self._selection.release(None if final else limit))
+
             # 去重：模糊匹配不与精确匹配重叠
-            exact_positions = {(m['start'], m['end']) for m in exact_matches}
-            new_fuzzy_matches = [
-                m for m in fuzzy_matches 
-                if (m['start'], m['end']) not in exact_positions
-            ]
-            all_matches.extend(new_fuzzy_matches)
-        
-        # 统计关键词出现次数
-        keyword_counts[keyword] = len(exact_matches) + len(new_fuzzy_matches)
-    
-    # 按位置排序
-    all_matches.sort(key=lambda x: x['start'])
-    
-    return all_matches, keyword_counts
-
-
-def highlight_text(text, matches, chunk_size=1000):
-    """生成带高亮标记的文本，支持分段处理"""
-    if not matches:
-        return text
-    
-    # 按位置排序
-    matches.sort(key=lambda x: x['start'])
-    
-    result = []
-    last_end = 0
-    
-    # 处理长文本时添加换行符，提高可读性
-    for i in range(0, len(text), chunk_size):
-        chunk = text[i:i+chunk_size]
-        result.append(chunk)
-        if i + chunk_size < len(text):
-            result.append('<br><br>')
-    
-    text_with_breaks = ''.join(result)
-    
-    # 重新计算匹配位置（考虑添加的换行符）
-    adjusted_matches = []
-    break_count = 0
+            batch.extend(
+                m for m in fuzzy_matches
+                if (m['start'], m['end'], m['keyword']) not in self._recent_exact
+            )
+
+        horizon = None if compiled.max_match_length is None else limit - compiled.max_match_length - 1
+        while self._recent_exact_order and (final or (
+                horizon is not None and self._recent_exact_order[0][0] <= horizon)):
+            end, start, keyword = self._recent_exact_order.popleft()
+            self._recent_exact.discard((start, end, keyword))
+
+        # 按位置排序；同一位置按关键词顺序，精确匹配在前
+        rank = self._rank
+        batch.sort(key=lambda x: (x['start'], rank[x['keyword']], x['type'] != 'exact'))
+        for match in batch:
+            self.keyword_counts[match['keyword']] += 1
+        return batch
+
+
+# 批量打分使用的线程数（-1 表示全部核心）；并行搜索的工作进程内为 1，避免进程数 × 核心数的线程争抢
+_scorer_workers = -1
+
+# 并行搜索的进程池，按进程数复用（首次并行搜索时创建，退出时关闭）
+_shard_pools = {}
+_shard_pools_lock = threading.Lock()
+
+# 工作进程内最近一次使用的编译结果：(指纹, CompiledKeywords)
+_shard_compiled = (None, None)
+
+
+def _init_shard_worker():
+    global _scorer_workers
+    _scorer_workers = 1
+
+
+def _shard_pool(workers):
+    from concurrent.futures import ProcessPoolExecutor
+    with _shard_pools_lock:
+        pool = _shard_pools.get(workers)
+        if pool is None:
+            pool = _shard_pools[workers] = ProcessPoolExecutor(workers, initializer=_init_shard_worker)
+        return pool
+
+
+def _discard_shard_pool(workers):
+    with _shard_pools_lock:
+        pool = _shard_pools.pop(workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+@atexit.register
+def _shutdown_shard_pools():
+    for workers in list(_shard_pools):
+        _discard_shard_pool(workers)
+
+
+def _scan_shard(task):
+    """工作进程扫描一个分片；同一组关键词连续多个分片时只反序列化一次编译结果"""
+    global _shard_compiled
+    fingerprint, payload, (window, window_start, min_end, max_end, scorer) = task
+    if _shard_compiled[0] != fingerprint:
+        _shard_compiled = (fingerprint, pickle.loads(payload))
+    return _scan_candidates(_shard_compiled[1], window, window_start, min_end, max_end, scorer)
+
+
+def _plan_shards(text, shard_count, longest, scorer):
+    """切分文本：每个分片负责终点落在 (边界, 下一边界] 的匹配
+
+    窗口向左多取 longest + 1 个字符、向右多取 1 个字符，与 ChunkedScanner
+    按块读取时保留的重叠相同，保证分片边界附近的匹配不被截断或遗漏。
+    """
+    n = len(text)
+    bounds = [n * i // shard_count for i in range(shard_count + 1)]
+    for i in range(shard_count):
+        final = i == shard_count - 1
+        window_start = max(0, bounds[i] - longest - 1)
+        window_end = n if final else bounds[i + 1] + 1
+        yield (text[window_start:window_end], window_start, bounds[i], bounds[i + 1], scorer), final
+
+
+def _search_sharded(text, compiled, workers, fuzzy_scorer='auto'):
+    """分片并行扫描候选，再按顺序统一做结果选择；分片不足两个时返回 None"""
+    if compiled.max_match_length is None:
+        return None
+    if workers == -1:
+        workers = os.cpu_count() or 1
+    shard_count = min(workers * 2, len(text) // MIN_SHARD_SIZE)
+    if workers < 2 or shard_count < 2:
+        return None
+
+    from concurrent.futures.process import BrokenProcessPool
+    scanner = ChunkedScanner(compiled, fuzzy_scorer)
+    # 全文只规范化一次，分片在规范化文本上切分，结果最后换算回原文
+    text, offsets = compiled.normalizer.normalize(text)
+    shards = list(_plan_shards(text, shard_count, compiled.max_match_length, fuzzy_scorer))
+    # 编译结果只序列化一次，各分片传递同一份字节串
+    payload = pickle.dumps(compiled, protocol=pickle.HIGHEST_PROTOCOL)
+    matches = []
+    try:
+        results = _shard_pool(workers).map(
+            _scan_shard, [(compiled.fingerprint, payload, shard) for shard, _ in shards]
+        )
+        for (shard, final), (exact, tokens, approximate) in zip(shards, results):
+            matches.extend(scanner._select(exact, tokens, approximate, shard[3], final))
+    except BrokenProcessPool:
+        # 工作进程异常退出后进程池不可再用，下次搜索重新创建
+        _discard_shard_pool(workers)
+        raise
+    # 各分片的结果分批确定，合并后按与整体搜索相同的顺序排列
+    rank = scanner._rank
+    matches.sort(key=lambda x: (x['start'], rank[x['keyword']], x['type'] != 'exact'))
+    return offsets.map_matches(matches), scanner.keyword_counts
+
+
+def _search_normalized(text, compiled, fuzzy_scorer='auto'):
+    """在已用 compiled.normalizer 规范化过的全文上搜索，返回规范化文本中的匹配（不换算回原文）"""
+    scanner = ChunkedScanner(compiled, fuzzy_scorer)
+    return scanner._scan(text, 0, len(text), True), scanner.keyword_counts
+
+
+def search_compiled(text, compiled, fuzzy_scorer='auto', as_store=False, workers=None):
+    """使用编译好的关键词（见 compile_keywords）搜索文本
+
+    as_store 为 True 时匹配结果以 MatchStore 返回。workers 大于 1（-1 表示
+    全部 CPU 核心）时把长文本切成分片，用多个进程并行扫描，结果与单进程一致。
+    """
+    with span('search', chars=len(text), keywords=len(compiled.keywords)) as counters:
+        result = None
+        if workers not in (None, 1):
+            result = _search_sharded(text, compiled, workers, fuzzy_scorer)
+        if result is None:
+            scanner = ChunkedScanner(compiled, fuzzy_scorer)
+            result = scanner.feed(text, final=True), scanner.keyword_counts
+        matches, keyword_counts = result
+        if as_store:
+            matches = MatchStore.from_matches(matches, compiled.keywords)
+        counters['matches'] = len(matches)
+        return matches, keyword_counts
+
+
+def search_keywords(text, keywords, case_sensitive=True, use_fuzzy=False, fuzzy_threshold=80,
+                    fuzzy_mode='auto', fuzzy_scorer='auto', as_store=False, workers=None,
+                    normalization=DEFAULT_NORMALIZATION, whole_word=False):
+    """搜索多个关键词
+
+    关键词的预处理结果按关键词集合和搜索选项缓存，同一资产列表重复搜索时直接复用。
+    as_store 为 True 时匹配结果以紧凑的 MatchStore 返回，适合匹配数量很多的场景。
+    workers 大于 1 或为 -1 时对长文本分片并行搜索（见 search_compiled）。
+    normalization 为文本规范化方式（见 utils.normalization.NORMALIZATIONS），
+    文本只规范化一次，匹配位置为原文中的偏移。
+    whole_word 为 True 时只报告不在单词中间开始或结束的匹配（中日文字符各自成词，不受影响）。
+    """
+    compiled = compile_keywords(
+        keywords, case_sensitive, use_fuzzy, fuzzy_threshold, fuzzy_mode, normalization, whole_word
+    )
+    return search_compiled(text, compiled, fuzzy_scorer, as_store, workers)
+
+
+def search_stream(chunks, keywords, case_sensitive=True, use_fuzzy=False, fuzzy_threshold=80,
+                  fuzzy_mode='auto', fuzzy_scorer='auto', normalization=DEFAULT_NORMALIZATION, whole_word=False):
+    """流式搜索：依次读取文本块，逐个产出匹配（位置为相对全文的绝对偏移）
+
+    只在内存中保留当前块和与下一块的重叠部分，适合无法整体读入内存的大文件。
+    产出的匹配与 search_keywords 对全文的结果相同（顺序按确定的先后）。
+    """
+    compiled = compile_keywords(
+        keywords, case_sensitive, use_fuzzy, fuzzy_threshold, fuzzy_mode, normalization, whole_word
+    )
+    scanner = ChunkedScanner(compiled, fuzzy_scorer)
+    for chunk in chunks:
+        yield from scanner.feed(chunk)
+    yield from scanner.feed('', final=True)
+
+
+def search_file_stream(file_path, keywords, case_sensitive=True, use_fuzzy=False, fuzzy_threshold=80,
+                       fuzzy_mode='auto', fuzzy_scorer='auto', chunk_size=DEFAULT_STREAM_CHUNK_SIZE,
+                       encoding=None, normalization=DEFAULT_NORMALIZATION, whole_word=False):
+    """按固定大小分块读取文本文件并流式搜索，内存占用与文件大小无关
+
+    encoding 为空时根据文件开头自动识别编码（UTF-8/UTF-16/UTF-32、GB18030、Big5）。
+    """
+    chunks = iter_text_file_chunks(file_path, chunk_size, encoding)
+    yield from search_stream(
+        chunks, keywords, case_sensitive, use_fuzzy, fuzzy_threshold, fuzzy_mode, fuzzy_scorer, normalization,
+        whole_word
+    )
+
+
+def count_matches(matches):
+    """统计每个关键词的匹配次数，可直接消费 search_stream 产出的匹配"""
+    keyword_counts = {}
     for match in matches:
-        # 计算该位置前添加的换行符数量
-        break_count = sum(1 for i in range(0, match['start'], chunk_size) if i > 0)
-        adjusted_start = match['start'] + break_count * 8  # <br><br> 占8个字符
-        adjusted_end = match['end'] + break_count * 8
-        adjusted_matches.append({
-            **match,
-            'start': adjusted_start,
-            'end': adjusted_end
-        })
-    
-    # 重新生成高亮文本，为每个匹配项添加锚点
-    final_result = []
-    last_end = 0
-    
-    for match_index, match in enumerate(adjusted_matches):
-        # 添加匹配前的文本
-        final_result.append(text_with_breaks[last_end:match['start']])
-        
-        # 添加带高亮和锚点的匹配文本
-        matched_text = text_with_breaks[match['start']:match['end']]
-        highlight_class = 'highlight-exact' if match['type'] == 'exact' else 'highlight-fuzzy'
+        keyword_counts[match['keyword']] = keyword_counts.get(match['keyword'], 0) + 1
+    return keyword_counts
+
+
+def _text_pieces(text, start, end, chunk_size, window_start=0, chunk_break=CHUNK_BREAK):
+    """输出原文 [start, end) 段（HTML 转义），在每个分段边界前插入 chunk_break
+
+    窗口起点 window_start 处不插入。
+    """
+    pos = start
+    while pos < end:
+        if pos % chunk_size == 0 and window_start < pos < len(text):
+            if chunk_break:
+                yield chunk_break
+        piece_end = min(end, (pos // chunk_size + 1) * chunk_size)
+        yield html.escape(text[pos:piece_end], quote=False)
+        pos = piece_end
+
+
+def _match_columns(matches, lo, hi):
+    """取出第 lo 到 hi 个匹配的起点、终点和是否精确匹配"""
+    if isinstance(matches, MatchStore):
+        exact = [matches.is_exact(i) for i in range(lo, hi)]
+        return matches.starts[lo:hi], matches.ends[lo:hi], exact
+    window = matches[lo:hi]
+    return ([m['start'] for m in window], [m['end'] for m in window],
+            [m['type'] == 'exact' for m in window])
+
+
+def iter_highlighted(text, matches, chunk_size=1000, start=0, end=None, lo=0, hi=None, chunk_break=CHUNK_BREAK):
+    """逐段产出带高亮标记的 HTML，一次遍历排好序的匹配和分段边界
+
+    matches 可以是匹配字典列表或 MatchStore，只渲染其中第 lo 到 hi 个匹配。
+    每个匹配带锚点 match_索引（索引为其在 matches 中的位置）。相互重叠的匹配中，
+    起点更早（起点相同则更长）的获得高亮，被覆盖的匹配只在其起点放一个空锚点，
+    保证导航仍可定位。只输出原文 [start, end) 窗口，超出窗口的高亮部分被截断。
+    chunk_break 为每 chunk_size 个字符插入的分段换行，为空时只按 chunk_size 分段输出。
+    """
+    if end is None:
+        end = len(text)
+    if hi is None:
+        hi = len(matches)
+    starts, ends, exact = _match_columns(matches, lo, hi)
+    order = sorted(range(len(starts)), key=lambda i: (starts[i], -ends[i], i))
+    pos = start
+    span_open = False
+    span_end = start
+    for i in order:
+        match_start = min(max(starts[i], start), end)
+        if span_open and match_start >= span_end:
+            yield from _text_pieces(text, pos, span_end, chunk_size, start, chunk_break)
+            yield '</span>'
+            pos = span_end
+            span_open = False
+
+        yield from _text_pieces(text, pos, match_start, chunk_size, start, chunk_break)
+        pos = match_start
         # 添加锚点ID，格式：match_索引
-        anchor_id = f"match_{match_index}"
-        final_result.append(f'<span id="{anchor_id}" class="{highlight_class}">{matched_text}</span>')
-        
-        last_end = match['end']
-    
-    # 添加最后一段文本
-    final_result.append(text_with_breaks[last_end:])
-    
-    return ''.join(final_result)
+        anchor_id = f"match_{lo + i}"
+        highlight_class = 'highlight-exact' if exact[i] else 'highlight-fuzzy'
+        if span_open:
+            yield f'<span id="{anchor_id}" class="{highlight_class} highlight-anchor"></span>'
+            continue
+        yield f'<span id="{anchor_id}" class="{highlight_class}">'
+        span_open = True
+        span_end = min(ends[i], end)
+
+    if span_open:
+        yield from _text_pieces(text, pos, span_end, chunk_size, start, chunk_break)
+        yield '</span>'
+        pos = span_end
+    yield from _text_pieces(text, pos, end, chunk_size, start, chunk_break)
+
+
+def highlight_spans(matches):
+    """相互重叠的匹配中只保留获得高亮的那个（与 iter_highlighted 相同），产出 (起点, 终点, 是否精确)"""
+    starts, ends, exact = _match_columns(matches, 0, len(matches))
+    order = sorted(range(len(starts)), key=lambda i: (starts[i], -ends[i], i))
+    span_end = 0
+    for i in order:
+        if starts[i] < span_end:
+            continue
+        span_end = ends[i]
+        yield starts[i], ends[i], exact[i]
+
+
+def highlight_text(text, matches, chunk_size=1000, out=None, chunk_break=CHUNK_BREAK):
+    """生成带高亮标记的文本，支持分段处理
+
+    原文会做 HTML 转义，每 chunk_size 个字符插入一次换行（chunk_break）以提高长文本可读性。
+    传入 out（任何有 write 方法的对象）时直接写入，不在内存中拼出完整结果。
+    matches 可以是匹配字典列表或 MatchStore，锚点索引为匹配按位置排序后的下标。
+    """
+    # 按位置排序的副本，不改动调用方的列表（MatchStore 始终按位置有序）
+    if not isinstance(matches, MatchStore):
+        matches = sorted(matches, key=lambda x: x['start'])
+    with span('highlight', chars=len(text), matches=len(matches)):
+        pieces = iter_highlighted(text, matches, chunk_size, chunk_break=chunk_break)
+        if out is None:
+            return ''.join(pieces)
+        for piece in pieces:
+            out.write(piece)
+        return None
+
+
+def _first_match_from(matches, position):
+    """二分查找第一个起点不小于 position 的匹配下标（matches 已按起点排序）"""
+    if isinstance(matches, MatchStore):
+        return matches.index_at(position)
+    lo, hi = 0, len(matches)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if matches[mid]['start'] < position:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def page_count(text, page_size):
+    """按每页 page_size 个字符分页后的总页数（至少 1 页）"""
+    return max(1, -(-len(text) // page_size))
+
+
+def page_of_match(matches, match_index, page_size):
+    """第 match_index 个匹配所在的页码"""
+    return matches[match_index]['start'] // page_size
+
+
+def highlight_page(text, matches, page, page_size, chunk_size=1000):
+    """只生成第 page 页的高亮文本，耗时只与页面大小有关
+
+    matches 需已按起点排序。锚点编号与整篇高亮一致；起点在上一页、
+    跨页延续的匹配在本页不再高亮。page_size 取 chunk_size 的整数倍时
+    分段换行与整篇高亮位置相同。
+    """
+    start = page * page_size
+    end = min(len(text), start + page_size)
+    with span('highlight_page', chars=end - start) as counters:
+        first = _first_match_from(matches, start)
+        last = _first_match_from(matches, end)
+        counters['matches'] = last - first
+        return ''.join(iter_highlighted(text, matches, chunk_size, start, end, first, last))
 
 
 def get_unique_keywords(matches):
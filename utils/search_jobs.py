@@ -0,0 +1,158 @@
+import threading
+import time
+from contextlib import nullcontext
+
+from utils.compiled_keywords import compile_keywords
+from utils.instrumentation import collect, profile, profile_data, span
+from utils.match_store import MatchStore
+from utils.normalization import DEFAULT_NORMALIZATION
+from utils.search_engine import ChunkedScanner
+
+# 后台搜索每次扫描的字符数：每块扫描完后更新进度、检查是否已取消
+JOB_CHUNK_SIZE = 256 * 1024
+
+# 任务状态
+JOB_STATES = ('pending', 'running', 'done', 'cancelled', 'failed')
+
+
+class SearchJob:
+    """后台搜索任务
+
+    在后台线程中把文本分块交给 ChunkedScanner，结果与 search_keywords 完全一致。
+    搜索过程中可随时查询进度、读取已经确定的部分结果，或调用 cancel 取消
+    （最迟在当前块扫描完后停止）。
+    """
+
+    def __init__(self, text, keywords, case_sensitive=True, use_fuzzy=False, fuzzy_threshold=80,
+                 fuzzy_mode='auto', fuzzy_scorer='auto', chunk_size=JOB_CHUNK_SIZE,
+                 collect_events=False, profile_search=False, normalization=DEFAULT_NORMALIZATION,
+                 whole_word=False):
+        self.text = text
+        self.keywords = keywords
+        self.case_sensitive = case_sensitive
+        self.use_fuzzy = use_fuzzy
+        self.fuzzy_threshold = fuzzy_threshold
+        self.fuzzy_mode = fuzzy_mode
+        self.fuzzy_scorer = fuzzy_scorer
+        self.normalization = normalization
+        self.whole_word = whole_word
+        self.chunk_size = chunk_size
+        self.collect_events = collect_events
+        self.profile_search = profile_search
+        self.state = 'pending'
+        self.error = None
+        # 后台线程中各阶段的计时事件与剖析结果（.prof 文件内容）
+        self.events = []
+        self.profile_data = None
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='search-job', daemon=True)
+        self._started = None
+        self._finished = None
+        self._keyword_total = 0
+        self._chars_scanned = 0
+        # 已经确定的匹配，按确定的先后顺序
+        self._matches = []
+        self._keyword_counts = {}
+        self._store = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def finished(self):
+        return self.state in ('done', 'cancelled', 'failed')
+
+    def wait(self, timeout=None):
+        """等待任务结束，返回是否已结束"""
+        self._thread.join(timeout)
+        return self.finished
+
+    def progress(self):
+        """当前进度：状态、关键词总数与已匹配的关键词数、已扫描与总字符数、已确定的匹配数、耗时"""
+        with self._lock:
+            end = self._finished or time.perf_counter()
+            return {
+                'state': self.state,
+                'keywords': self._keyword_total,
+                'keywords_found': sum(1 for n in self._keyword_counts.values() if n),
+                'chars_scanned': self._chars_scanned,
+                'chars_total': len(self.text),
+                'matches': len(self._matches),
+                'seconds': end - self._started if self._started is not None else 0.0
+            }
+
+    def partial_matches(self, start=0):
+        """已经确定的匹配中从第 start 个开始的部分（按确定的先后顺序），用于增量显示"""
+        with self._lock:
+            return self._matches[start:]
+
+    def keyword_counts(self):
+        """到目前为止每个关键词的匹配次数"""
+        with self._lock:
+            return dict(self._keyword_counts)
+
+    def result(self):
+        """返回 (MatchStore, {关键词: 次数})，与 search_keywords(as_store=True) 相同"""
+        if self.state == 'failed':
+            raise self.error
+        if self.state != 'done':
+            raise RuntimeError(f"Search job is {self.state}")
+        return self._store, dict(self._keyword_counts)
+
+    def _run(self):
+        self.state = 'running'
+        try:
+            events_scope = collect() if self.collect_events else nullcontext([])
+            profiler_scope = profile() if self.profile_search else nullcontext()
+            with events_scope as events, profiler_scope as profiler:
+                state = self._search()
+            self.events = events
+            if profiler is not None:
+                self.profile_data = profile_data(profiler)
+        except Exception as e:
+            self.error = e
+            state = 'failed'
+        with self._lock:
+            self._finished = time.perf_counter()
+            self.state = state
+
+    def _search(self):
+        text = self.text
+        with span('search_job', chars=len(text)) as counters:
+            compiled = compile_keywords(
+                self.keywords, self.case_sensitive, self.use_fuzzy, self.fuzzy_threshold, self.fuzzy_mode,
+                self.normalization, self.whole_word
+            )
+            scanner = ChunkedScanner(compiled, self.fuzzy_scorer)
+            with self._lock:
+                self._keyword_total = len(compiled.keywords)
+                self._keyword_counts = dict(scanner.keyword_counts)
+            for start in range(0, len(text), self.chunk_size):
+                if self._cancel.is_set():
+                    counters['cancelled'] = True
+                    return 'cancelled'
+                batch = scanner.feed(text[start:start + self.chunk_size])
+                self._publish(batch, scanner)
+            if self._cancel.is_set():
+                counters['cancelled'] = True
+                return 'cancelled'
+            self._publish(scanner.feed('', final=True), scanner)
+
+            # 各块的结果分批确定，最后按与整体搜索相同的顺序排列
+            rank = {keyword: i for i, keyword in enumerate(compiled.keywords)}
+            matches = sorted(self._matches, key=lambda x: (x['start'], rank[x['keyword']], x['type'] != 'exact'))
+            self._store = MatchStore.from_matches(matches, compiled.keywords)
+            counters['matches'] = len(matches)
+            return 'done'
+
+    def _publish(self, batch, scanner):
+        with self._lock:
+            self._matches.extend(batch)
+            self._chars_scanned = scanner.chars_scanned
+            self._keyword_counts = dict(scanner.keyword_counts)
@@ -0,0 +1,152 @@
+import codecs
+import unicodedata
+
+# 识别编码时检查的字节数
+SAMPLE_SIZE = 64 * 1024
+
+# 按顺序检查的 BOM（UTF-32 LE 的 BOM 以 UTF-16 LE 的 BOM 开头，需先检查）
+_BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+# 没有 BOM 且不是合法 UTF-8 时尝试的中文编码：GB18030 兼容 GBK/GB2312，cp950 为 Windows 的 Big5
+FALLBACK_ENCODINGS = ('gb18030', 'cp950')
+
+# 各编码常用汉字所在的首字节范围（GB2312 一级汉字、Big5 常用字），用于在都能解码时判断哪个更合理
+_COMMON_LEAD_BYTES = {
+    'gb18030': ('gb2312', 0xB0, 0xD7),
+    'cp950': ('cp950', 0xA4, 0xC6),
+}
+# 计算常用字比例时最多检查的汉字数
+_MAX_SCORED_CHARS = 4096
+
+
+def _decodes(sample, encoding, complete):
+    """sample 能否按 encoding 严格解码；不完整的样本允许末尾截断半个字符"""
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(sample, complete)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def _common_ratio(sample, encoding):
+    """按 encoding 解码后，汉字中属于该编码常用字区的比例"""
+    common_encoding, low, high = _COMMON_LEAD_BYTES[encoding]
+    text = codecs.getincrementaldecoder(encoding)().decode(sample)
+    total = common = 0
+    for char in text:
+        if '一' <= char <= '鿿':
+            total += 1
+            try:
+                common += low <= char.encode(common_encoding)[0] <= high
+            except UnicodeEncodeError:
+                pass
+            if total >= _MAX_SCORED_CHARS:
+                break
+    return common / total if total else 0
+
+
+def _unlikely_utf8(sample):
+    """按 UTF-8 解码后，非 ASCII 字符大多是控制字符、扩展拉丁/音标或未分配码位
+
+    双字节中文编码的内容偶尔恰好是合法的 UTF-8（如 GBK 的“前缀”），解码结果就是这类字符。
+    """
+    text = codecs.getincrementaldecoder('utf-8')().decode(sample)
+    total = unlikely = 0
+    for char in text:
+        if char >= '\x80':
+            total += 1
+            unlikely += '\u0180' <= char <= '\u036f' or unicodedata.category(char) in ('Cc', 'Cn')
+            if total >= _MAX_SCORED_CHARS:
+                break
+    return total and unlikely * 2 > total
+
+
+def _detect(sample, complete):
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    utf8 = _decodes(sample, 'utf-8', complete)
+    if utf8 and not _unlikely_utf8(sample):
+        return 'utf-8'
+    candidates = [encoding for encoding in FALLBACK_ENCODINGS if _decodes(sample, encoding, complete)]
+    if not candidates:
+        # 都无法严格解码时按 UTF-8 解码，无法识别的字节替换为 U+FFFD
+        return 'utf-8'
+    ratios = {encoding: _common_ratio(sample, encoding) for encoding in candidates}
+    best = max(candidates, key=ratios.get)
+    if utf8 and ratios[best] < 0.5:
+        return 'utf-8'
+    return best
+
+
+def detect_encoding(content, sample_size=SAMPLE_SIZE):
+    """根据开头 sample_size 字节识别编码：先看 BOM，再验证 UTF-8，最后在 GB18030 与 Big5 中选择"""
+    view = memoryview(content)
+    return _detect(bytes(view[:sample_size]), len(view) <= sample_size)
+
+
+def decode_text(content, encoding=None):
+    """把字节内容（bytes 或 memoryview）解码为文本，返回 (文本, 编码)
+
+    直接从缓冲区解码，不复制整个内容。未指定编码时自动识别；识别结果在样本之后
+    无法解码时依次改用其他候选编码，仍然失败则把无法解码的字节替换为 U+FFFD。
+    """
+    if encoding is not None:
+        return str(content, encoding), encoding
+    encoding = detect_encoding(content)
+    try:
+        return str(content, encoding), encoding
+    except UnicodeDecodeError:
+        pass
+    for candidate in FALLBACK_ENCODINGS:
+        if candidate != encoding:
+            try:
+                return str(content, candidate), candidate
+            except UnicodeDecodeError:
+                pass
+    return str(content, encoding, 'replace'), encoding
+
+
+def iter_decoded(chunks, encoding=None, errors=None):
+    """增量解码字节块（bytes 或 memoryview），产生文本块；多字节字符可以跨块
+
+    未指定编码时按开头至少 SAMPLE_SIZE 字节识别，此后无法解码的字节替换为 U+FFFD
+    （流式读取无法回头换用其他编码）；指定编码时默认严格解码。
+    """
+    if errors is None:
+        errors = 'strict' if encoding else 'replace'
+    decoder = codecs.getincrementaldecoder(encoding)(errors) if encoding else None
+    pending = []
+    pending_size = 0
+    for chunk in chunks:
+        if decoder is None:
+            pending.append(bytes(chunk))
+            pending_size += len(chunk)
+            if pending_size < SAMPLE_SIZE:
+                continue
+            chunk = b''.join(pending)
+            pending = []
+            decoder = codecs.getincrementaldecoder(_detect(chunk, False))(errors)
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    if decoder is None:
+        chunk = b''.join(pending)
+        decoder = codecs.getincrementaldecoder(_detect(chunk, True))(errors)
+        text = decoder.decode(chunk, True)
+    else:
+        text = decoder.decode(b'', True)
+    if text:
+        yield text
+
+
+def iter_decoded_buffer(content, chunk_size=1024 * 1024, encoding=None):
+    """按 chunk_size 字节切片（memoryview，不复制）增量解码整个缓冲区，产生文本块"""
+    view = memoryview(content)
+    return iter_decoded((view[i:i + chunk_size] for i in range(0, len(view), chunk_size)), encoding)
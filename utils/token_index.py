@@ -0,0 +1,54 @@
+import re
+from array import array
+
+# 按空白分出的词（按词模糊匹配的比较单位）
+_TOKEN_PATTERN = re.compile(r'\S+')
+# 连续的构词字符：字母、数字和下划线，但不包括不以空格分词的中日文字符，
+# 这些字符各自成词，它们之间总是词边界
+_WORD_RUN = re.compile(r'[^\W\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+
+
+class TokenIndex:
+    """文档级分词索引，每个文档（或文本块）只构建一次
+
+    - starts / ends：按空白分出的每个词在文本中的起止位置（紧凑数组，按位置排序）；
+    - words：去重后按字典序排列的词，occurrences(word) 给出它的全部出现；
+    - boundaries：词边界表，第 i 个字节非零表示位置 i 不在某个单词内部。
+    模糊匹配、整词过滤等直接查表，不再重新扫描文本。词边界表在第一次用到时才构建。
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.starts = array('q')
+        self.ends = array('q')
+        occurrences = {}
+        for i, match in enumerate(_TOKEN_PATTERN.finditer(text)):
+            self.starts.append(match.start())
+            self.ends.append(match.end())
+            occurrences.setdefault(match.group(), array('q')).append(i)
+        self.words = sorted(occurrences)
+        self._occurrences = occurrences
+        self._boundaries = None
+
+    def __len__(self):
+        return len(self.starts)
+
+    def occurrences(self, word):
+        """词的全部出现 [(起点, 终点)]，按位置排序"""
+        return [(self.starts[i], self.ends[i]) for i in self._occurrences.get(word, ())]
+
+    @property
+    def boundaries(self):
+        if self._boundaries is None:
+            boundaries = bytearray(b'\x01') * (len(self.text) + 1)
+            for match in _WORD_RUN.finditer(self.text):
+                start, end = match.span()
+                if end - start > 1:
+                    boundaries[start + 1:end] = bytes(end - start - 1)
+            self._boundaries = boundaries
+        return self._boundaries
+
+    def is_whole_word(self, start, end):
+        """text[start:end] 的两端是否都是词边界（不从某个单词中间开始或结束）"""
+        boundaries = self.boundaries
+        return bool(boundaries[start] and boundaries[end])